@@ -1,5 +1,26 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from utils import hash_command
+
+# Identical alerts (same command hash, verdict and reason) inside this many
+# seconds are collapsed into one banner plus a summary when the window closes
+DEDUP_WINDOW = 60.0
+
+# Secure Coding: Bound the dedup state so an attacker cannot exhaust memory
+MAX_TRACKED_ALERTS = 10000
+
+# Token bucket per verdict class: sustained banners per second and burst size
+RATE_LIMITS = {
+    "malicious": (5.0, 20),
+    "suspicious": (2.0, 10),
+}
+DEFAULT_RATE_LIMIT = (2.0, 10)
+
+
 # Function: Displays alert information to the console when a threat is detected
-def send_alert(cmd, result):
+def print_alert(cmd, result):
     verdict = result.get("verdict", "unknown").upper()
     reason = result.get("reason", "No reason provided")
 
@@ -11,3 +32,176 @@ def send_alert(cmd, result):
     print(f"[COMMAND] {safe_cmd}")
     print(f"[REASON]  {reason}")
     print("=============\n")
+
+
+# Function: Reports how many alerts were held back while a window was open
+def print_summary(cmd, result, repeats, rate_limited, window):
+    verdict = result.get("verdict", "unknown").upper()
+    print("=== ALERT SUMMARY ===")
+    if cmd is not None:
+        safe_cmd = cmd.replace("\n", " ").replace("\r", " ").strip()
+        print(f"[REPEATED] {repeats} more {verdict} alerts for the same command in {window:.0f}s")
+        print(f"[COMMAND] {safe_cmd}")
+        print(f"[REASON]  {result.get('reason', 'No reason provided')}")
+    else:
+        print(f"[RATE-LIMITED] {rate_limited} {verdict} alerts suppressed in {window:.0f}s")
+    print("=====================\n")
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last = now
+
+    def consume(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class _Window:
+    __slots__ = ("opened", "cmd", "result", "repeats")
+
+    def __init__(self, opened, cmd, result):
+        self.opened = opened
+        self.cmd = cmd
+        self.result = result
+        self.repeats = 0
+
+
+# Alert Aggregator: Sits in front of the console. The first alert of a kind is
+# shown immediately; repeats inside the window are only counted, and new
+# kinds are rate-limited per verdict. Counts are reported when windows close.
+class AlertAggregator:
+    def __init__(self, window=DEDUP_WINDOW, max_tracked=MAX_TRACKED_ALERTS,
+                 rate_limits=None, printer=print_alert, summary_printer=print_summary,
+                 clock=time.monotonic):
+        self.window = window
+        self.max_tracked = max_tracked
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.printer = printer
+        self.summary_printer = summary_printer
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._windows = OrderedDict()     # key -> _Window, oldest first
+        self._buckets = {}
+        self._rate_limited = {}           # verdict -> [window opened, count]
+        self._reaper = None
+        self._stop = threading.Event()
+
+        self.shown = 0
+        self.suppressed = 0
+
+    def _bucket(self, verdict, now):
+        bucket = self._buckets.get(verdict)
+        if bucket is None:
+            rate, capacity = self.rate_limits.get(verdict, DEFAULT_RATE_LIMIT)
+            bucket = self._buckets[verdict] = TokenBucket(rate, capacity, now)
+        return bucket
+
+    def submit(self, cmd, result):
+        """Show, count or rate-limit one alert; returns True if it was printed."""
+        verdict = result.get("verdict", "unknown")
+        key = (hash_command(cmd), verdict, result.get("reason", ""))
+
+        with self._lock:
+            now = self.clock()
+            self._close_expired(now)
+
+            entry = self._windows.get(key)
+            if entry is not None:
+                entry.repeats += 1
+                self.suppressed += 1
+                return False
+
+            if not self._bucket(verdict, now).consume(now):
+                limited = self._rate_limited.setdefault(verdict, [now, 0])
+                limited[1] += 1
+                self.suppressed += 1
+                return False
+
+            self._windows[key] = _Window(now, cmd, result)
+            # Evict the oldest window early (reporting it) rather than grow unbounded
+            while len(self._windows) > self.max_tracked:
+                self._report(self._windows.popitem(last=False)[1])
+
+            self.shown += 1
+            self.printer(cmd, result)
+            return True
+
+    def _report(self, entry):
+        if entry.repeats:
+            self.summary_printer(entry.cmd, entry.result, entry.repeats, 0, self.window)
+
+    def _close_expired(self, now):
+        # Windows are stored in opening order, so expired ones are at the front
+        while self._windows:
+            entry = next(iter(self._windows.values()))
+            if now - entry.opened < self.window:
+                break
+            self._windows.popitem(last=False)
+            self._report(entry)
+
+        for verdict, (opened, count) in list(self._rate_limited.items()):
+            if now - opened >= self.window:
+                del self._rate_limited[verdict]
+                self.summary_printer(None, {"verdict": verdict}, 0, count, self.window)
+
+    def tick(self):
+        """Close any windows that have expired, printing their summaries."""
+        with self._lock:
+            self._close_expired(self.clock())
+
+    def flush(self):
+        """Close every open window now, e.g. at shutdown."""
+        with self._lock:
+            while self._windows:
+                self._report(self._windows.popitem(last=False)[1])
+            for verdict, (_, count) in self._rate_limited.items():
+                self.summary_printer(None, {"verdict": verdict}, 0, count, self.window)
+            self._rate_limited.clear()
+
+    def start_reaper(self, interval=1.0):
+        """Report closed windows even when no new alerts arrive."""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while not self._stop.wait(interval):
+                self.tick()
+
+        self._reaper = threading.Thread(target=reap, name="alert-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            return {"shown": self.shown, "suppressed": self.suppressed,
+                    "open_windows": len(self._windows)}
+
+
+# Default aggregator used by send_alert, created on first alert
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator():
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = AlertAggregator()
+                _aggregator.start_reaper()
+                # Report suppressed counts that are still pending at exit
+                atexit.register(_aggregator.flush)
+    return _aggregator
+
+
+# Function: Sends an alert through deduplication and per-verdict rate limiting
+def send_alert(cmd, result):
+    get_aggregator().submit(cmd, result)
@@ -0,0 +1,219 @@
+import asyncio
+import glob
+import hashlib
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from detector import analyze_command, get_engine
+from dispatch import dispatch_alert
+from tailer import LogTailer, PollingWatcher
+
+# File pattern used when a directory is given as the source
+DEFAULT_GLOB = "*.log"
+
+# Per-source limits: queued lines before the reader pauses, lines per detection batch
+QUEUE_SIZE = 1000
+BATCH_SIZE = 200
+READ_LIMIT = 1 << 20    # bytes read from one source per turn
+
+# Seconds between reads of an idle source, and between scans for new sources
+POLL_INTERVAL = 0.1
+RESCAN_INTERVAL = 2.0
+
+
+def resolve_sources(pattern):
+    """Expand a directory or glob pattern into a sorted list of log files."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, DEFAULT_GLOB)
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def analyze_batch(cmds):
+    """Executor job: analyze a batch of commands from one source."""
+    return [analyze_command(cmd) for cmd in cmds]
+
+
+# Default verdict handler: same output as monitor_file, tagged with the source
+def print_verdict(source, cmd, result):
+    print(f"[{source}] >> {cmd}")
+    print(f"[Verdict] {result['verdict'].upper()} | [Reason] {result['reason']}\n")
+
+    # Log and alert if command is not safe; sinks deliver in the background
+    if result['verdict'] != "legitimate":
+        dispatch_alert(cmd, result)
+
+
+# Multi-Source Monitor: One reader and one detector task per log file. Each
+# source has its own bounded queue, so a noisy file only ever fills its own
+# queue and then stops reading, and the executor interleaves batches from
+# all sources so none of them starves.
+class MultiSourceMonitor:
+    def __init__(self, pattern, on_verdict=print_verdict, executor=None, max_workers=4,
+                 queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL,
+                 rescan_interval=RESCAN_INTERVAL, offset_dir=None, start_at_end=True):
+        self.pattern = pattern
+        self.on_verdict = on_verdict
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.offset_dir = offset_dir
+        self.start_at_end = start_at_end
+
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers,
+                                                        thread_name_prefix="detector")
+        self._stop = None
+        self._sources = {}
+        self._tasks = []
+        self.processed = {}
+
+    @property
+    def sources(self):
+        return sorted(self._sources)
+
+    def _offset_file(self, path):
+        if not self.offset_dir:
+            return None
+        key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+        return os.path.join(self.offset_dir, f"{os.path.basename(path)}.{key}.offset.json")
+
+    def stop(self):
+        """Request a graceful shutdown: stop reading, finish queued lines, close files."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self, ready=None):
+        self._stop = asyncio.Event()
+        if self.offset_dir:
+            os.makedirs(self.offset_dir, exist_ok=True)
+        # Pick up rule/signature/keyword edits without restarting
+        get_engine().start_watcher()
+
+        try:
+            self._add_new_sources(initial=True)
+            if ready is not None:
+                ready.set()
+
+            while not self._stop.is_set():
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.rescan_interval)
+                except asyncio.TimeoutError:
+                    self._add_new_sources()
+        finally:
+            # Readers exit first; detectors then drain whatever is still queued
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            if self._own_executor:
+                self._executor.shutdown(wait=True)
+
+    def _add_new_sources(self, initial=False):
+        for path in resolve_sources(self.pattern):
+            if path in self._sources:
+                continue
+            # Files appearing after startup are read from the beginning
+            tailer = LogTailer(path, offset_file=self._offset_file(path),
+                               start_at_end=self.start_at_end if initial else False,
+                               watcher=PollingWatcher(path))
+            try:
+                tailer.open()
+            except OSError as e:
+                print(f"[!] Cannot watch {path}: {e}")
+                continue
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self._sources[path] = tailer
+            self.processed[path] = 0
+            self._tasks.append(asyncio.create_task(self._read_source(path, tailer, queue)))
+            self._tasks.append(asyncio.create_task(self._detect_source(path, tailer, queue)))
+
+    async def _read_source(self, path, tailer, queue):
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._stop.is_set():
+                # File I/O runs on the default thread pool, never on the event loop
+                lines = await loop.run_in_executor(None, tailer.read_lines, READ_LIMIT)
+                if not lines:
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for line in lines:
+                    cmd = line.strip()
+                    if cmd:
+                        # Backpressure: waits here while this source's queue is full
+                        await queue.put(cmd)
+                # Offset just past these lines, committed once they are analyzed
+                await queue.put(tailer.position)
+        finally:
+            await queue.put(None)
+
+    async def _detect_source(self, path, tailer, queue):
+        loop = asyncio.get_running_loop()
+        done = False
+        try:
+            while not done:
+                done = await self._detect_batch(path, tailer, queue, loop)
+        finally:
+            # Saves the committed offset: only lines that were analyzed count as read
+            await loop.run_in_executor(None, tailer.close)
+
+    async def _detect_batch(self, path, tailer, queue, loop):
+        """Analyze the next batch from the queue; returns True once the reader is done."""
+        items = [await queue.get()]
+        while len(items) < self.batch_size and not queue.empty():
+            items.append(queue.get_nowait())
+        done = items[-1] is None
+        # Commands, plus tailer positions that end each read
+        batch = [item for item in items if isinstance(item, str)]
+        positions = [item for item in items if isinstance(item, tuple)]
+
+        if batch:
+            try:
+                results = await loop.run_in_executor(self._executor, analyze_batch, batch)
+            except Exception as e:
+                # Secure Coding: Report and keep consuming so the reader never blocks forever
+                print(f"[ERROR] {path}: detection failed for {len(batch)} commands: {e}")
+                return done
+            for cmd, result in zip(batch, results):
+                result["source"] = path
+                try:
+                    self.on_verdict(path, cmd, result)
+                except Exception as e:
+                    # Secure Coding: A failing handler must not kill the source
+                    print(f"[ERROR] {path}: {e}")
+            self.processed[path] += len(batch)
+
+        if positions:
+            # Every line before the last position in this batch has now been handled
+            await loop.run_in_executor(None, tailer.commit, positions[-1])
+        return done
+
+
+def monitor_sources(pattern, **options):
+    """Blocking entry point: watch every matching log until Ctrl+C / SIGTERM."""
+    monitor = MultiSourceMonitor(pattern, **options)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, monitor.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        print(f"Monitoring {pattern} for new commands...\n")
+        await monitor.run()
+
+    asyncio.run(main())
+    return monitor
+
+
+# Entry point: python async_monitor.py <directory-or-glob>
+if __name__ == "__main__":
+    # Secure Coding: Checks for command-line argument presence to avoid index error
+    if len(sys.argv) < 2:
+        print("Usage: python async_monitor.py <directory-or-glob>")
+        sys.exit(1)
+    monitor_sources(sys.argv[1], offset_dir="logs/offsets")
+    print("\n[!] Monitoring stopped.")
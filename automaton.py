@@ -0,0 +1,162 @@
+from collections import deque
+
+
+# Multi-pattern matcher: Aho-Corasick automaton over a fixed set of keywords.
+# Built once at load time, then finds every keyword occurring in a text in a
+# single pass, no matter how many keywords were added.
+class KeywordAutomaton:
+    def __init__(self, keywords=None):
+        # Parallel per-state tables: outgoing edges, failure link, and the ids
+        # of every keyword ending at this state (including via failure links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._keywords = []
+        self._always = ()
+        self._built = False
+
+        # Given keywords up front, build immediately; otherwise add() then build()
+        if keywords is not None:
+            for keyword in keywords:
+                self.add(keyword)
+            self.build()
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def tables(self):
+        """The built automaton as plain lists/dicts/tuples, e.g. for a config snapshot."""
+        if not self._built:
+            raise RuntimeError("Build the automaton before exporting it")
+        return (self._goto, self._fail, self._out, self._keywords)
+
+    @classmethod
+    def from_tables(cls, tables):
+        """Recreate a built automaton from tables() output without rebuilding it."""
+        automaton = cls()
+        automaton._goto, automaton._fail, automaton._out, automaton._keywords = tables
+        automaton._always = automaton._out[0]
+        automaton._built = True
+        return automaton
+
+    @property
+    def keywords(self):
+        return tuple(self._keywords)
+
+    def add(self, keyword):
+        """Register a keyword and return its id (insertion order)."""
+        if self._built:
+            raise RuntimeError("Cannot add keywords after the automaton is built")
+
+        keyword_id = len(self._keywords)
+        self._keywords.append(keyword)
+
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (keyword_id,)
+        return keyword_id
+
+    def build(self):
+        """Compute failure links; must be called once after the last add()."""
+        if self._built:
+            return self
+
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        # An empty keyword "occurs" in every text, like `"" in text` does
+        self._always = out[0]
+        self._built = True
+        return self
+
+    def find_ids(self, text):
+        """Return the set of keyword ids that occur anywhere in `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self._always)
+        state = 0
+
+        for ch in text:
+            edges = goto[state]
+            while ch not in edges and state:
+                state = fail[state]
+                edges = goto[state]
+            state = edges.get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+
+        return found
+
+    def find(self, text):
+        """Return the set of keywords that occur anywhere in `text`."""
+        keywords = self._keywords
+        return {keywords[i] for i in self.find_ids(text)}
+
+
+# Distinct tokens remembered per TokenIndex before the memo starts over
+TOKEN_MEMO_SIZE = 65536
+
+# Secure Coding: Long one-off tokens (payloads) are scanned but never memoized
+MAX_MEMO_TOKEN_LENGTH = 256
+
+
+def key_piece(keyword):
+    """Longest whitespace-free piece of a keyword ("" if it has none).
+
+    Any text containing the keyword has this piece inside one of its
+    whitespace-separated tokens, so it can be looked up token by token.
+    """
+    pieces = keyword.split()
+    return max(pieces, key=len) if pieces else ""
+
+
+# Token Index: An automaton over whitespace-free keys, queried one token at a
+# time. Commands reuse a small vocabulary (executables, switches, hosts), so
+# the keys found in each distinct token are memoized and most tokens cost a
+# single dict lookup instead of a character-by-character scan.
+class TokenIndex:
+    def __init__(self, automaton, memo_size=TOKEN_MEMO_SIZE):
+        self.automaton = automaton
+        self.memo_size = memo_size
+        self._memo = {}
+
+    def token_ids(self, token):
+        """Key ids occurring inside one token, memoized."""
+        ids = self._memo.get(token)
+        if ids is None:
+            ids = tuple(self.automaton.find_ids(token))
+            if len(token) <= MAX_MEMO_TOKEN_LENGTH:
+                if len(self._memo) >= self.memo_size:
+                    self._memo.clear()
+                self._memo[token] = ids
+        return ids
+
+    def find_ids(self, tokens):
+        """Return the set of key ids occurring inside any of `tokens`."""
+        memo = self._memo
+        found = set()
+        for token in tokens:
+            ids = memo.get(token)
+            if ids is None:
+                ids = self.token_ids(token)
+            found.update(ids)
+        return found
@@ -0,0 +1,282 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+import detector
+from command import ParsedCommand
+from utils import hash_command
+
+# Columns of the verdict table returned by analyze_commands
+RESULT_COLUMNS = ["command", "verdict", "reason", "stage", "score"]
+
+# Distinct commands analyzed per chunk, bounding the token and hit tables
+CHUNK_SIZE = 200000
+
+# Up to this many index keys, a batch's vocabulary is searched one key at a
+# time with NumPy string operations; beyond it, token by token through the
+# key automaton
+VECTORIZE_MAX_KEYS = 96
+
+# Tokens are grouped by length into fixed-width arrays of at most this many
+# characters; longer tokens (payloads) always go through the automaton
+VECTOR_TOKEN_WIDTHS = (8, 32, 256)
+
+BEHAVIOR_REASONS = {
+    "malicious": "Behavior-Based: high-risk keywords",
+    "suspicious": "Behavior-Based: medium-risk keywords",
+    "legitimate": "Behavior-Based: benign or low-risk keywords",
+}
+
+
+def _as_series(commands):
+    if not isinstance(commands, pd.Series):
+        if not isinstance(commands, (list, tuple, np.ndarray)):
+            commands = list(commands)
+        commands = pd.Series(commands, dtype=object)
+
+    # Secure Coding: Reject missing commands instead of scoring the text "nan"
+    if commands.isna().any():
+        raise ValueError("[SECURITY] analyze_commands received missing commands; drop them first")
+    return commands.astype(str)
+
+
+def _csr(lists):
+    """Flatten a list of id lists into CSR (indptr, indices) arrays."""
+    lengths = np.fromiter(map(len, lists), dtype=np.intp, count=len(lists))
+    indptr = np.zeros(len(lists) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter(chain.from_iterable(lists), dtype=np.intp, count=int(indptr[-1]))
+    return indptr, indices
+
+
+def _expand(rows, ids, table):
+    """Follow (row, id) pairs through a CSR table to (row, target id) pairs."""
+    indptr, indices = table
+    starts = indptr[ids]
+    counts = indptr[ids + 1] - starts
+    total = int(counts.sum())
+    # Position of every output pair within its source id's slice
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(rows, counts), indices[np.repeat(starts, counts) + offsets]
+
+
+def _unique_pairs(rows, ids, width):
+    """Distinct (row, id) pairs, sorted by row and then id."""
+    keys = np.unique(rows.astype(np.int64) * max(width, 1) + ids)
+    return keys // max(width, 1), keys % max(width, 1)
+
+
+def _vocabulary_hits(vocabulary, token_index):
+    """(token position, key id) for every key of `token_index` inside a distinct token."""
+    keys = token_index.automaton.keywords
+    if len(keys) > VECTORIZE_MAX_KEYS:
+        return _automaton_hits(np.arange(len(vocabulary)), vocabulary, token_index)
+
+    lengths = np.fromiter(map(len, vocabulary), dtype=np.intp, count=len(vocabulary))
+    tokens, ids = [], []
+    lower_bound = -1
+    for width in VECTOR_TOKEN_WIDTHS:
+        group = np.flatnonzero((lengths > lower_bound) & (lengths <= width))
+        lower_bound = width
+        if not len(group):
+            continue
+        texts = np.array(vocabulary[group], dtype=f"U{width}")
+        for key_id, key in enumerate(keys):
+            found = group[np.char.find(texts, key) >= 0]
+            tokens.append(found)
+            ids.append(np.full(len(found), key_id, dtype=np.intp))
+
+    longer = np.flatnonzero(lengths > lower_bound)
+    if len(longer):
+        found, found_ids = _automaton_hits(longer, vocabulary[longer], token_index)
+        tokens.append(found)
+        ids.append(found_ids)
+    if not tokens:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(tokens), np.concatenate(ids)
+
+
+def _automaton_hits(positions, tokens, token_index):
+    table = _csr([token_index.token_ids(token) for token in tokens])
+    return np.repeat(positions, np.diff(table[0])), table[1]
+
+
+# Token Table: Every distinct token of a chunk, with the rows it occurs in.
+# Keys are searched for once per distinct token instead of once per token of
+# every command, and the matches spread back to rows as sparse pairs.
+class _TokenTable:
+    def __init__(self, lower):
+        token_lists = [cmd_lower.split() for cmd_lower in lower]
+        lengths = np.fromiter(map(len, token_lists), dtype=np.intp, count=len(token_lists))
+        self.rows = np.repeat(np.arange(len(token_lists)), lengths)
+        codes, vocabulary = pd.factorize(
+            pd.Series(list(chain.from_iterable(token_lists)), dtype=object))
+        self.codes = codes.astype(np.intp)
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+
+    def pairs(self, token_index, width):
+        """Distinct (row, key id) pairs for the keys of `token_index` found in each row."""
+        tokens, ids = _vocabulary_hits(self.vocabulary, token_index)
+        # Key ids per distinct token as a CSR table
+        order = np.argsort(tokens, kind="stable")
+        indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(tokens, minlength=len(self.vocabulary)), out=indptr[1:])
+        rows, ids = _expand(self.rows, self.codes, (indptr, ids[order]))
+        return _unique_pairs(rows, ids, width)
+
+
+def _rule_candidates(state, table, uniques):
+    """
+    Rows that may match a rule, with the rule anchor ids found in each (None:
+    look them up); every other row is certainly rule-free.
+    """
+    ruleset = state.ruleset
+    count = len(uniques)
+    if ruleset.has_generic_rules:
+        return zip(range(count), [None] * count)
+
+    rows, anchor_ids = table.pairs(ruleset.token_index, len(ruleset.token_index.automaton))
+    candidates = {}
+    for row, anchor_id in zip(rows.tolist(), anchor_ids.tolist()):
+        candidates.setdefault(row, []).append(anchor_id)
+    # Secure Coding: Non-ASCII rows bypass the prefilter, as in CompiledRuleset.candidates
+    for row in np.flatnonzero(~np.fromiter(map(str.isascii, uniques), dtype=bool, count=count)):
+        candidates.setdefault(int(row), [])
+    return sorted(candidates.items())
+
+
+def _keyword_hits(table, lower, rows, keyword_scorer):
+    """
+    Behavior scores and hit labels of the given rows, from sparse keyword hits.
+
+    Returns:
+        tuple: (scores array, hit label list per row), both in `rows` order
+    """
+    piece_keywords, always, confirm, positions = keyword_scorer.keyword_tables()
+    profile = keyword_scorer.profile
+    keyword_count = len(positions)
+    selected = np.zeros(len(lower), dtype=bool)
+    selected[rows] = True
+
+    # Keyword ids per row: through the pieces found in its tokens, plus the
+    # keywords that have no whitespace-free piece
+    hit_rows, piece_ids = table.pairs(keyword_scorer.token_index, len(piece_keywords))
+    keep = selected[hit_rows]
+    hit_rows, keyword_ids = _expand(hit_rows[keep], piece_ids[keep], _csr(piece_keywords))
+    if always:
+        hit_rows = np.concatenate([hit_rows, np.repeat(rows, len(always))])
+        keyword_ids = np.concatenate([keyword_ids, np.tile(np.asarray(always, dtype=np.intp), len(rows))])
+    hit_rows, keyword_ids = _unique_pairs(hit_rows, keyword_ids, keyword_count)
+
+    # Keywords longer than their piece are confirmed against the whole command
+    if confirm:
+        needs_check = np.isin(keyword_ids, list(confirm))
+        for k in np.flatnonzero(needs_check):
+            needs_check[k] = confirm[int(keyword_ids[k])] not in lower[hit_rows[k]]
+        hit_rows, keyword_ids = hit_rows[~needs_check], keyword_ids[~needs_check]
+
+    # Profile entries of the matched keywords, sorted in profile order per row
+    hit_rows, hit_positions = _expand(hit_rows, keyword_ids, _csr(positions))
+    hit_rows, hit_positions = _unique_pairs(hit_rows, hit_positions, len(profile))
+
+    # Row i of the batch owns hits[bounds[i]:bounds[i + 1]]
+    order = np.full(len(lower), -1, dtype=np.intp)
+    order[rows] = np.arange(len(rows))
+    hit_slots = order[hit_rows]
+    bounds = np.searchsorted(hit_slots, np.arange(len(rows) + 1))
+
+    # Summed left to right from 0.0 like KeywordScorer.score, so floats match
+    # bit for bit; the extra first column and the padding add 0.0
+    deltas = np.array([delta for _, _, delta in profile] + [0.0], dtype=float)
+    lengths = np.diff(bounds)
+    width = int(lengths.max()) + 1 if len(lengths) else 1
+    columns = np.arange(width)
+    padded = np.full((len(rows), width), len(profile), dtype=np.intp)
+    padded[(columns >= 1) & (columns <= lengths[:, None])] = hit_positions
+    scores = np.cumsum(deltas[padded], axis=1)[:, -1]
+
+    labels = np.array([label for _, label, _ in profile], dtype=object)
+    hit_labels = labels[hit_positions].tolist()
+    return scores, [hit_labels[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _analyze_unique(uniques, state):
+    """Verdict, reason, stage and score arrays for distinct commands."""
+    lower = [cmd.lower() for cmd in uniques]
+    table = _TokenTable(lower)
+    count = len(uniques)
+
+    verdict = np.empty(count, dtype=object)
+    reason = np.empty(count, dtype=object)
+    stage = np.empty(count, dtype=object)
+    score = np.full(count, np.nan)
+
+    # Stage 1: rule-based, regexes only for rows holding some rule's anchor
+    for i, anchor_ids in _rule_candidates(state, table, uniques):
+        rule = state.ruleset.match(ParsedCommand(uniques[i], lower[i]), anchor_ids=anchor_ids)
+        if rule:
+            result = detector.rule_result(rule)
+            verdict[i], reason[i], stage[i] = result["verdict"], result["reason"], "rule"
+
+    # Stage 2: signature-based, only for rows no rule decided
+    for i in np.flatnonzero(pd.isna(stage)):
+        cmd_hash = hash_command(uniques[i])
+        match = state.signature_store.lookup(cmd_hash)
+        if match:
+            result = detector.signature_result(match, cmd_hash)
+            verdict[i], reason[i], stage[i] = result["verdict"], result["reason"], "signature"
+
+    # Stage 3: near-duplicates of known bad commands, when an index is loaded
+    if state.similarity_index is not None:
+        for i in np.flatnonzero(pd.isna(stage)):
+            match = state.similarity_index.lookup(uniques[i])
+            if match:
+                result = detector.similarity_result(*match)
+                verdict[i], reason[i], stage[i] = result["verdict"], result["reason"], "similarity"
+
+    # Stage 4: behavior-based fallback with sparse keyword hits and vectorized bucketing
+    pending = np.flatnonzero(pd.isna(stage))
+    if len(pending):
+        scores, hits = _keyword_hits(table, lower, pending, state.keyword_scorer)
+        buckets = np.select(
+            [scores >= detector.MALICIOUS_THRESHOLD, scores >= detector.SUSPICIOUS_THRESHOLD],
+            ["malicious", "suspicious"],
+            default="legitimate",
+        )
+        verdict[pending] = buckets.astype(object)
+        reason[pending] = [f"{BEHAVIOR_REASONS[b]} {h}" for b, h in zip(buckets, hits)]
+        stage[pending] = "behavior"
+        score[pending] = scores
+
+    return verdict, reason, stage, score
+
+
+# Batch Detection Engine: Scores many commands at once and returns a columnar
+# verdict table that matches analyze_command row for row. Repeated commands
+# are analyzed once, in chunks of CHUNK_SIZE distinct commands; rule
+# prefiltering and keyword scoring search each chunk's distinct tokens, so
+# only rule candidates reach the regexes.
+def analyze_commands(commands, engine=None, chunk_size=CHUNK_SIZE):
+    series = _as_series(commands)
+
+    # One config snapshot for the whole batch, even if a reload happens meanwhile
+    state = (engine or detector.get_engine()).state
+
+    # Repeated commands are only analyzed once
+    codes, uniques = pd.factorize(series)
+    uniques = np.asarray(uniques, dtype=object)
+    columns = [np.empty(0, dtype=object)] * 3 + [np.empty(0)]
+    if len(uniques):
+        parts = [_analyze_unique(uniques[start:start + chunk_size], state)
+                 for start in range(0, len(uniques), chunk_size)]
+        columns = [np.concatenate(column) for column in zip(*parts)]
+    verdict, reason, stage, score = columns
+
+    return pd.DataFrame({
+        "command": series.to_numpy(dtype=object),
+        "verdict": verdict[codes],
+        "reason": reason[codes],
+        "stage": stage[codes],
+        "score": score[codes],
+    }, index=series.index, columns=RESULT_COLUMNS)
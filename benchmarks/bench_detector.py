@@ -0,0 +1,370 @@
+"""
+Benchmark suite for the detection stages and end-to-end modes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_detector                       # quick default matrix
+    python -m benchmarks.bench_detector --commands 100000 1000000 --config-sizes 1000 100000
+    python -m benchmarks.bench_detector --save-baseline       # store results as the baseline
+    python -m benchmarks.bench_detector --baseline benchmarks/baseline.json
+
+Each scenario times match_rule_patterns, match_signature, behavior_score and
+analyze_command separately (plus the batch API), and reports throughput and
+p50/p99 latency as JSON. Memory is measured in a separate pass per stage: each
+stage runs on a fresh engine under tracemalloc and the peak growth of the
+traced heap is reported. Synthetic commands hit the synthetic rules, signatures
+and keywords at controlled rates (--hit-rates), and the hit fractions actually
+seen are reported. Against a baseline, any stage whose throughput dropped by
+more than the tolerance is flagged and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command import parse_command  # noqa: E402
+from detector import DetectorEngine, CONFIG_FILES  # noqa: E402
+from utils import hash_command  # noqa: E402
+
+DATASET = "data/cmd_huge_known_commented_updated.csv"
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+# Latencies kept per stage for percentiles (reservoir sample beyond this)
+LATENCY_SAMPLES = 100000
+
+# Fraction of synthetic commands built to hit a synthetic rule, an exact
+# signature, and (independently) a synthetic behavior keyword
+HIT_RATES = {"rule": 0.1, "signature": 0.05, "keyword": 0.3}
+
+# Commands checked when reporting the hit fractions actually seen
+HIT_SAMPLE = 100000
+
+LOLBINS = ["powershell", "certutil", "bitsadmin", "wmic", "schtasks", "regsvr32",
+           "rundll32", "mshta", "cmd.exe", "net", "reg", "sc", "msiexec", "cscript"]
+BENIGN = ["dir", "ping 8.8.8.8", "ipconfig /all", "whoami", "tasklist", "hostname",
+          "netstat -an", "systeminfo", "echo hello", "type nul"]
+FLAGS = ["-enc", "-urlcache", "-split", "-f", "/transfer", "/create", "/c", "/s", "/u",
+         "process", "call", "http://10.10.10.10/a.exe", "payload.b64", "-nop", "-w hidden"]
+
+
+def load_dataset_commands():
+    import pandas as pd
+    df = pd.read_csv(DATASET).dropna(subset=["prompt", "Label"])
+    return df["prompt"].astype(str).tolist()
+
+
+def synthetic_commands(count, targets=None, hit_rates=HIT_RATES, seed=1):
+    """
+    Mix of benign one-liners and LOLBin command lines with random arguments.
+
+    With the `targets` of a synthetic config, a hit_rates["signature"] share of
+    the commands are exact signature commands, a hit_rates["rule"] share carry
+    a synthetic rule's tool and flag, and independently a hit_rates["keyword"]
+    share get a synthetic behavior keyword appended.
+    """
+    rng = random.Random(seed)
+    commands = []
+    for i in range(count):
+        roll = rng.random()
+        if targets and roll < hit_rates["signature"]:
+            commands.append(rng.choice(targets["signatures"]))
+            continue
+        if targets and roll < hit_rates["signature"] + hit_rates["rule"]:
+            tool, flag = rng.choice(targets["rules"])
+            cmd = f"{tool} {flag} file{rng.randint(0, 10**6)}.txt"
+        elif rng.random() < 0.5:
+            cmd = rng.choice(BENIGN)
+        else:
+            args = " ".join(rng.choice(FLAGS) for _ in range(rng.randint(1, 4)))
+            cmd = f"{rng.choice(LOLBINS)} {args} file{rng.randint(0, 10**6)}.txt"
+        if targets and rng.random() < hit_rates["keyword"]:
+            cmd = f"{cmd} {rng.choice(targets['keywords'])}"
+        commands.append(cmd)
+    return commands
+
+
+def unique_commands(base, count, seed=4):
+    """Dataset commands with a per-row suffix, so almost every row is distinct (like real exports)."""
+    rng = random.Random(seed)
+    return [f"{rng.choice(base)} id{i}" for i in range(count)]
+
+
+def synthetic_config(directory, size, seed=2):
+    """
+    Write rules/signatures/keyword files with `size` entries each on top of the real ones.
+
+    Returns:
+        tuple: (config file paths, targets for synthetic_commands: the (tool, flag)
+                of each synthetic rule, the signature commands and the keywords)
+    """
+    rng = random.Random(seed)
+    with open(CONFIG_FILES["rules"]) as f:
+        rules = json.load(f)
+    with open(CONFIG_FILES["signatures"]) as f:
+        signatures = json.load(f)
+    with open(CONFIG_FILES["behavior"]) as f:
+        behavior = json.load(f)
+    with open(CONFIG_FILES["benign"]) as f:
+        benign = json.load(f)
+
+    targets = {"rules": [], "signatures": [], "keywords": []}
+    for i in range(max(0, size - len(rules))):
+        tool, flag = f"{rng.choice(LOLBINS)}{i}", rng.choice(FLAGS)
+        rules.append({"pattern": f"{tool}.*{flag}",
+                      "verdict": rng.choice(["malicious", "suspicious"])})
+        targets["rules"].append((tool, flag))
+    for i in range(size):
+        cmd = f"{rng.choice(LOLBINS)} {rng.choice(FLAGS)} sig-{seed}-{i}.bin"
+        signatures["malicious_hashes" if i % 2 else "suspicious_hashes"].append(hash_command(cmd))
+        targets["signatures"].append(cmd)
+    for i in range(max(0, size - len(behavior))):
+        keyword = f"kw{i:x}{rng.choice(FLAGS)}"
+        behavior[keyword] = round(rng.uniform(0.05, 0.3), 2)
+        targets["keywords"].append(keyword)
+
+    paths = {}
+    for name, data in (("rules", rules), ("signatures", signatures),
+                       ("behavior", behavior), ("benign", benign)):
+        paths[name] = os.path.join(directory, os.path.basename(CONFIG_FILES[name]))
+        with open(paths[name], "w") as f:
+            json.dump(data, f)
+    return paths, targets
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def time_stage(func, commands, rng):
+    """Call func on every command; return throughput and latency percentiles."""
+    latencies = array("d")
+    clock = time.perf_counter_ns
+    start = clock()
+    for n, cmd in enumerate(commands):
+        t0 = clock()
+        func(cmd)
+        elapsed = clock() - t0
+        if n < LATENCY_SAMPLES:
+            latencies.append(elapsed)
+        else:
+            slot = rng.randint(0, n)
+            if slot < LATENCY_SAMPLES:
+                latencies[slot] = elapsed
+    total = (clock() - start) / 1e9
+
+    ordered = sorted(latencies)
+    return {
+        "calls": len(commands),
+        "seconds": round(total, 6),
+        "throughput_per_s": round(len(commands) / total, 1) if total else 0.0,
+        "p50_us": round(percentile(ordered, 0.50) / 1000, 3),
+        "p99_us": round(percentile(ordered, 0.99) / 1000, 3),
+    }
+
+
+def time_batch(engine, commands):
+    from batch import analyze_commands
+    start = time.perf_counter()
+    analyze_commands(commands, engine=engine)
+    total = time.perf_counter() - start
+    return {
+        "calls": len(commands),
+        "seconds": round(total, 6),
+        "throughput_per_s": round(len(commands) / total, 1) if total else 0.0,
+    }
+
+
+def build_engine(config_files):
+    # Cache disabled so analyze_command measures real detection work
+    return DetectorEngine(config_files, signature_index_dir=None, cache_size=0)
+
+
+def stage_functions(engine):
+    """Per-stage callables over a whole command list, by result name."""
+    from batch import analyze_commands
+    state = engine.state
+
+    def per_row(func):
+        return lambda commands: [func(cmd) for cmd in commands]
+    return {
+        "match_rule_patterns": per_row(lambda cmd: engine.match_rule_patterns(cmd, state)),
+        "match_signature": per_row(lambda cmd: engine.match_signature(cmd, state)),
+        "behavior_score": per_row(lambda cmd: engine.behavior_score(cmd, state)),
+        "analyze_command": per_row(engine.analyze),
+        "analyze_commands": lambda commands: analyze_commands(commands, engine=engine),
+    }
+
+
+def traced_peak_mb(config_files, stage, commands):
+    """
+    Peak growth of the traced Python heap (MB) while one stage runs over commands.
+
+    The stage gets a fresh engine, so caches warmed by other stages do not hide
+    its own allocations. Engine construction happens before tracing starts.
+    """
+    func = stage_functions(build_engine(config_files))[stage]
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func(commands)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round((peak - base) / (1024 * 1024), 2)
+
+
+def hit_fractions(state, commands):
+    """Share of (up to HIT_SAMPLE) commands matching a rule, a signature and a keyword."""
+    sample = commands[:HIT_SAMPLE]
+    rule = signature = keyword = 0
+    for cmd in sample:
+        command = parse_command(cmd)
+        rule += state.ruleset.match(command) is not None
+        signature += bool(state.signature_store.lookup(command.digest))
+        keyword += bool(state.keyword_scorer.score(command)[1])
+    n = len(sample) or 1
+    return {"rule": round(rule / n, 4), "signature": round(signature / n, 4),
+            "keyword": round(keyword / n, 4)}
+
+
+def run_scenario(name, commands, config_files, include_batch=True, measure_memory=True):
+    print(f"[*] {name}: {len(commands)} commands", flush=True)
+    build_start = time.perf_counter()
+    engine = build_engine(config_files)
+    build_seconds = time.perf_counter() - build_start
+    state = engine.state
+
+    rng = random.Random(3)
+    stages = {
+        "match_rule_patterns": lambda cmd: engine.match_rule_patterns(cmd, state),
+        "match_signature": lambda cmd: engine.match_signature(cmd, state),
+        "behavior_score": lambda cmd: engine.behavior_score(cmd, state),
+        "analyze_command": engine.analyze,
+    }
+    results = {name: time_stage(func, commands, rng) for name, func in stages.items()}
+    if include_batch:
+        results["analyze_commands"] = time_batch(engine, commands)
+
+    # Separate pass: tracemalloc slows allocation-heavy code, so it never
+    # overlaps the timed runs
+    if measure_memory:
+        for stage in results:
+            results[stage]["peak_traced_mb"] = traced_peak_mb(config_files, stage, commands)
+
+    return {
+        "commands": len(commands),
+        "rules": len(state.rules),
+        "keywords": len(state.keyword_scorer),
+        "signatures": len(state.signature_store.malicious) + len(state.signature_store.suspicious),
+        "hit_fractions": hit_fractions(state, commands),
+        "build_seconds": round(build_seconds, 3),
+        "stages": results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions."""
+    regressions = []
+    for scenario, data in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        for stage, metrics in data["stages"].items():
+            old = base["stages"].get(stage, {}).get("throughput_per_s")
+            new = metrics.get("throughput_per_s")
+            if old and new is not None and new < old * (1 - tolerance):
+                regressions.append(
+                    f"{scenario}/{stage}: {new:.0f}/s vs baseline {old:.0f}/s "
+                    f"({(1 - new / old):.0%} slower)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MalCommandGuard detection benchmarks")
+    parser.add_argument("--commands", type=int, nargs="+", default=[100000],
+                        help="synthetic corpus sizes (e.g. 100000 1000000 10000000)")
+    parser.add_argument("--config-sizes", type=int, nargs="+", default=[1000],
+                        help="rules/signatures/keywords per synthetic config (e.g. 1000 1000000)")
+    parser.add_argument("--skip-dataset", action="store_true", help="skip the bundled CSV scenario")
+    parser.add_argument("--no-batch", action="store_true", help="skip the analyze_commands batch API")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the per-stage tracemalloc pass")
+    parser.add_argument("--hit-rates", type=float, nargs=3, metavar=("RULE", "SIGNATURE", "KEYWORD"),
+                        default=[HIT_RATES["rule"], HIT_RATES["signature"], HIT_RATES["keyword"]],
+                        help="share of synthetic commands hitting a synthetic rule, signature "
+                             "and keyword (default %(default)s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"also write the results to {DEFAULT_BASELINE}")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput drop before flagging (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": {},
+    }
+    hit_rates = dict(zip(("rule", "signature", "keyword"), args.hit_rates))
+    measure_memory = not args.no_memory
+
+    if not args.skip_dataset:
+        dataset = load_dataset_commands()
+        results["scenarios"]["dataset"] = run_scenario(
+            "dataset", dataset, dict(CONFIG_FILES), not args.no_batch, measure_memory)
+        # Mostly distinct rows: the batch API cannot lean on deduplication here
+        for count in args.commands:
+            name = f"dataset-unique-{count}cmds"
+            results["scenarios"][name] = run_scenario(
+                name, unique_commands(dataset, count), dict(CONFIG_FILES), not args.no_batch,
+                measure_memory)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.config_sizes:
+            config_dir = os.path.join(tmp, f"config-{size}")
+            os.makedirs(config_dir)
+            config_files, targets = synthetic_config(config_dir, size)
+            for count in args.commands:
+                name = f"synthetic-{count}cmds-{size}cfg"
+                results["scenarios"][name] = run_scenario(
+                    name, synthetic_commands(count, targets, hit_rates), config_files,
+                    not args.no_batch, measure_memory)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[+] Results written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(DEFAULT_BASELINE), exist_ok=True)
+        with open(DEFAULT_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[+] Baseline saved to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            return 1
+        print("[+] No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def files_fingerprint(paths):
+    """Cheap change marker for a set of files: (mtime_ns, size) per path."""
+    fingerprint = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprint.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+# Verdict Cache: Bounded LRU map from command to verdict. The engine owns
+# invalidation: when it swaps in a reloaded config it calls reset() with the
+# new generation, which drops every entry and refuses late results computed
+# against the old one.
+class VerdictCache:
+    def __init__(self, maxsize=10000, max_key_length=4096):
+        self.maxsize = maxsize
+        # Secure Coding: Never let huge one-off commands pin memory in the cache
+        self.max_key_length = max_key_length
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Entries computed against an older config generation are not stored
+        self._generation = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, cmd):
+        """Return the cached verdict for `cmd`, or None on a miss."""
+        if self.maxsize <= 0 or len(cmd) > self.max_key_length:
+            return None
+        with self._lock:
+            result = self._entries.get(cmd)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cmd)
+            self.hits += 1
+            return result
+
+    def put(self, cmd, result, generation=None):
+        if self.maxsize <= 0 or len(cmd) > self.max_key_length:
+            return
+        with self._lock:
+            if generation is not None and self._generation is not None and generation < self._generation:
+                return
+            self._entries[cmd] = result
+            self._entries.move_to_end(cmd)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def reset(self, generation):
+        """Drop all entries and refuse late results from older generations."""
+        with self._lock:
+            self._entries.clear()
+            self._generation = generation
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,209 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import detector
+from batch import analyze_commands
+from command import ParsedCommand
+from evaluate import normalize_label
+from scoring import BENIGN_DISCOUNT
+
+# Default grid; the current settings (0.6 / 0.3 / 0.1 / x1) are always included
+MALICIOUS_THRESHOLDS = np.round(np.arange(0.30, 1.001, 0.05), 6)
+SUSPICIOUS_THRESHOLDS = np.round(np.arange(0.05, 0.601, 0.05), 6)
+BENIGN_DISCOUNTS = np.round(np.arange(0.0, 0.301, 0.05), 6)
+WEIGHT_SCALES = np.round(np.arange(0.5, 1.501, 0.1), 6)
+
+VERDICTS = ("malicious", "suspicious", "legitimate")
+
+
+# Calibration Corpus: Every labeled row analyzed once. Verdicts decided by
+# rules, signatures or similarity do not depend on the behavior settings and
+# stay fixed; behavior-decided rows keep a sparse row x keyword hit matrix.
+class CalibrationCorpus:
+    def __init__(self, commands, labels, engine=None):
+        state = (engine or detector.get_engine()).state
+        results = analyze_commands(commands, engine)
+        labels = np.asarray(labels, dtype=object)
+
+        behavior = (results["stage"] == "behavior").to_numpy()
+        self.fixed_verdicts = results["verdict"].to_numpy()[~behavior]
+        self.fixed_labels = labels[~behavior]
+        self.labels = labels[behavior]
+
+        # Columns are profile positions (risky keywords, then benign ones), so
+        # each CSR row lists its hits in the order detector adds them up
+        scorer = state.keyword_scorer
+        rows, columns = [], []
+        for row, cmd in enumerate(results["command"][behavior]):
+            for position, _, _ in scorer.matches(ParsedCommand(cmd)):
+                rows.append(row)
+                columns.append(position)
+        self.hits = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, columns)),
+            shape=(len(self.labels), len(scorer.profile)),
+        )
+        self.hits.sort_indices()
+
+        # Benign keywords follow the risky ones in the profile
+        deltas = np.array([delta for _, _, delta in scorer.profile], dtype=float)
+        self.benign = np.arange(len(deltas)) >= len(state.behavior_scores)
+        self.weights = np.where(self.benign, 0.0, deltas)
+
+        # Hit positions padded to a dense (rows x most hits) matrix; -1 pads
+        lengths = np.diff(self.hits.indptr)
+        width = int(lengths.max()) if len(lengths) else 0
+        self._padded = np.full((len(self.labels), width), -1, dtype=np.intp)
+        mask = np.arange(width) < lengths[:, None]
+        self._padded[mask] = self.hits.indices
+
+    @classmethod
+    def from_csv(cls, csv_path, engine=None):
+        df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
+        return cls(df["prompt"], df["Label"].map(normalize_label).tolist(), engine)
+
+    def scores(self, weight_scale, benign_discount):
+        """Behavior score of every behavior-decided row under one weight setting."""
+        # Summed left to right like detector does, so the current settings
+        # reproduce its scores bit for bit (trailing pads add 0.0)
+        terms = np.where(self.benign, -benign_discount, self.weights * weight_scale)
+        terms = np.append(terms, 0.0)[self._padded]
+        if not terms.shape[1]:
+            return np.zeros(len(self.labels))
+        return np.cumsum(terms, axis=1)[:, -1]
+
+
+def _at_least(sorted_scores, thresholds):
+    """How many of the sorted scores are >= each threshold."""
+    return len(sorted_scores) - np.searchsorted(sorted_scores, thresholds, side="left")
+
+
+def sweep(corpus, malicious_thresholds=MALICIOUS_THRESHOLDS,
+          suspicious_thresholds=SUSPICIOUS_THRESHOLDS, benign_discounts=BENIGN_DISCOUNTS,
+          weight_scales=WEIGHT_SCALES):
+    """
+    Score every grid point with the same metrics as evaluate.compute_metrics.
+
+    Returns:
+        DataFrame: one row per (malicious, suspicious) threshold pair with
+                   suspicious < malicious, per benign discount and weight scale
+    """
+    tm = np.asarray(malicious_thresholds, dtype=float)
+    ts = np.asarray(suspicious_thresholds, dtype=float)
+    classes = sorted(set(corpus.labels) | set(corpus.fixed_labels) | set(corpus.fixed_verdicts)
+                     | set(VERDICTS))
+    total = len(corpus.labels) + len(corpus.fixed_labels)
+
+    # Constant part of the confusion counts: rows decided before behavior scoring
+    true_count = {c: int((corpus.labels == c).sum() + (corpus.fixed_labels == c).sum()) for c in classes}
+    fixed_pred = {c: int((corpus.fixed_verdicts == c).sum()) for c in classes}
+    fixed_tp = {c: int(((corpus.fixed_verdicts == c) & (corpus.fixed_labels == c)).sum()) for c in classes}
+    row_labels = sorted(set(corpus.labels))
+    label_masks = {label: corpus.labels == label for label in row_labels}
+
+    frames = []
+    for scale in weight_scales:
+        for discount in benign_discounts:
+            scores = corpus.scores(scale, discount)
+            pred = {c: np.full((len(tm), len(ts)), fixed_pred[c]) for c in classes}
+            tp = {c: np.full((len(tm), len(ts)), fixed_tp[c]) for c in classes}
+
+            for label in row_labels:
+                ranked = np.sort(scores[label_masks[label]])
+                malicious = _at_least(ranked, tm)[:, None]
+                # >= min(suspicious, malicious) is the larger of the two counts
+                flagged = np.maximum(malicious, _at_least(ranked, ts)[None, :])
+                counts = {
+                    "malicious": np.broadcast_to(malicious, flagged.shape),
+                    "suspicious": flagged - malicious,
+                    "legitimate": len(ranked) - flagged,
+                }
+                for verdict, count in counts.items():
+                    pred[verdict] = pred[verdict] + count
+                if label in counts:
+                    tp[label] = tp[label] + counts[label]
+
+            # Macro averages over the classes that occur in labels or predictions,
+            # with 0 for undefined ratios (sklearn's zero_division=0)
+            included = [(pred[c] + true_count[c]) > 0 for c in classes]
+            n_included = np.sum(included, axis=0)
+            precision = sum(np.divide(tp[c], pred[c], out=np.zeros(pred[c].shape), where=pred[c] > 0)
+                            for c in classes)
+            recall = sum(tp[c] / true_count[c] if true_count[c] else np.zeros(tp[c].shape)
+                         for c in classes)
+            f1 = sum(np.divide(2 * tp[c], pred[c] + true_count[c], out=np.zeros(pred[c].shape),
+                               where=(pred[c] + true_count[c]) > 0) for c in classes)
+            accuracy = sum(tp[c] for c in classes) / total
+
+            grid_m, grid_s = np.meshgrid(tm, ts, indexing="ij")
+            valid = grid_s < grid_m
+            frames.append(pd.DataFrame({
+                "malicious_threshold": grid_m[valid],
+                "suspicious_threshold": grid_s[valid],
+                "benign_discount": discount,
+                "weight_scale": scale,
+                "accuracy": accuracy[valid],
+                "precision": (precision / n_included)[valid],
+                "recall": (recall / n_included)[valid],
+                "f1": (f1 / n_included)[valid],
+            }))
+
+    results = pd.concat(frames, ignore_index=True)
+    return results.sort_values(["f1", "accuracy"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+def current_settings():
+    return {
+        "malicious_threshold": detector.MALICIOUS_THRESHOLD,
+        "suspicious_threshold": detector.SUSPICIOUS_THRESHOLD,
+        "benign_discount": BENIGN_DISCOUNT,
+        "weight_scale": 1.0,
+    }
+
+
+def _with_current(values, current):
+    return np.unique(np.append(np.asarray(values, dtype=float), current))
+
+
+# Entry point: python calibrate.py [csv] [--output sweep.csv] [--top 10]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep behavior thresholds and weights over a labeled CSV")
+    parser.add_argument("csv_path", nargs="?", default="data/cmd_huge_known_commented_updated.csv")
+    parser.add_argument("--output", help="write every grid point to this CSV")
+    parser.add_argument("--top", type=int, default=10, help="grid points to print")
+    args = parser.parse_args()
+
+    try:
+        corpus = CalibrationCorpus.from_csv(args.csv_path)
+    except (OSError, KeyError) as e:
+        print(f"[ERROR] Could not load calibration corpus: {e}")
+        sys.exit(1)
+
+    current = current_settings()
+    start = time.perf_counter()
+    results = sweep(
+        corpus,
+        _with_current(MALICIOUS_THRESHOLDS, current["malicious_threshold"]),
+        _with_current(SUSPICIOUS_THRESHOLDS, current["suspicious_threshold"]),
+        _with_current(BENIGN_DISCOUNTS, current["benign_discount"]),
+        _with_current(WEIGHT_SCALES, current["weight_scale"]),
+    )
+    elapsed = time.perf_counter() - start
+    print(f"[+] Scored {len(results)} configurations over {corpus.hits.shape[0]} behavior-decided "
+          f"and {len(corpus.fixed_labels)} fixed rows in {elapsed:.2f}s")
+
+    is_current = np.logical_and.reduce([np.isclose(results[k], v) for k, v in current.items()])
+    baseline = results[is_current].head(1)
+    pd.set_option("display.width", 120)
+    print("\n=== Current settings ===")
+    print(baseline.to_string(index=False))
+    print(f"\n=== Top {args.top} by F1 ===")
+    print(results.head(args.top).to_string(index=False))
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"\n[+] Full sweep written to {args.output}")
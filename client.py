@@ -0,0 +1,114 @@
+import json
+import socket
+import threading
+
+from service import SOCKET_PATH, FRAME_MARKER, FRAME_HEADER, encode_frame
+
+
+class DetectionError(Exception):
+    pass
+
+
+def _check_line(cmd):
+    # Secure Coding: A newline or NUL would split or reframe the request on the wire
+    if not cmd.strip() or any(ch in cmd for ch in "\r\n\x00"):
+        raise ValueError("newline requests need a non-empty single-line command; "
+                         "use analyze_many() for arbitrary strings")
+    return cmd.encode("utf-8") + b"\n"
+
+
+# Detection Client: Blocking client for the detection service. One connection
+# is opened on first use and reused for every request until close().
+class DetectionClient:
+    def __init__(self, path=SOCKET_PATH, host=None, port=None, timeout=30.0):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        if self._sock is not None:
+            return
+        if self.port is not None:
+            sock = socket.create_connection((self.host or "127.0.0.1", self.port), self.timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = None
+            self._reader = None
+
+    def _read_line(self):
+        line = self._reader.readline()
+        if not line:
+            raise DetectionError("connection closed by detection service")
+        record = json.loads(line)
+        if "error" in record and "verdict" not in record:
+            raise DetectionError(record["error"])
+        return record
+
+    def analyze(self, cmd):
+        """Verdict record for one command: {"command", "verdict", "reason"}."""
+        self._connect()
+        self._sock.sendall(_check_line(cmd))
+        return self._read_line()
+
+    def analyze_many(self, cmds):
+        """Verdict records for a batch, sent as one length-prefixed frame."""
+        self._connect()
+        self._sock.sendall(encode_frame(list(cmds)))
+        marker = self._reader.read(1)
+        if marker != FRAME_MARKER:
+            # The service answers protocol errors with a JSON line
+            rest = self._reader.readline()
+            if not marker:
+                raise DetectionError("connection closed by detection service")
+            raise DetectionError(json.loads(marker + rest).get("error", "unexpected reply"))
+        (length,) = FRAME_HEADER.unpack(self._reader.read(FRAME_HEADER.size))
+        return json.loads(self._reader.read(length))
+
+    def stream(self, cmds):
+        """Pipeline many single-line commands; yields verdicts in request order."""
+        self._connect()
+        cmds = list(cmds)
+        payloads = [_check_line(cmd) for cmd in cmds]
+        errors = []
+
+        # Send from a thread while reading here, so neither side waits on a full buffer
+        def send():
+            try:
+                for payload in payloads:
+                    self._sock.sendall(payload)
+            except OSError as e:
+                errors.append(e)
+
+        sender = threading.Thread(target=send, name="detection-client-send", daemon=True)
+        sender.start()
+        received = 0
+        try:
+            for _ in cmds:
+                yield self._read_line()
+                received += 1
+        finally:
+            if received < len(cmds):
+                # Unread replies would be mistaken for later answers: drop the connection
+                self._sock.shutdown(socket.SHUT_RDWR)
+                self.close()
+            sender.join()
+        if errors:
+            raise DetectionError(f"send failed: {errors[0]}")
@@ -0,0 +1,42 @@
+from utils import hash_command
+
+
+def executable_name(token):
+    """Bare program name of a command's first token: no quotes, directory or .exe."""
+    name = token.strip("\"'")
+    name = name.rsplit("\\", 1)[-1].rsplit("/", 1)[-1]
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name
+
+
+# Parsed Command: Everything the detection stages derive from the raw text,
+# computed once per command and shared by all of them. The digest is only
+# computed if the signature stage actually runs.
+class ParsedCommand:
+    __slots__ = ("raw", "lower", "is_ascii", "tokens", "executable", "args", "_digest")
+
+    def __init__(self, raw, lower=None):
+        self.raw = raw
+        self.lower = raw.lower() if lower is None else lower
+        self.is_ascii = raw.isascii()
+        # Whitespace-separated tokens of the lowercased command
+        self.tokens = self.lower.split()
+        self.executable = executable_name(self.tokens[0]) if self.tokens else ""
+        self.args = self.tokens[1:]
+        self._digest = None
+
+    @property
+    def digest(self):
+        """MD5 of the raw command, as stored in signatures.json."""
+        if self._digest is None:
+            self._digest = hash_command(self.raw)
+        return self._digest
+
+    def __repr__(self):
+        return f"ParsedCommand({self.raw!r})"
+
+
+def parse_command(cmd):
+    """Return `cmd` as a ParsedCommand, parsing it only if needed."""
+    return cmd if isinstance(cmd, ParsedCommand) else ParsedCommand(cmd)
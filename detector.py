@@ -1,89 +1,398 @@
 import json
-import re
 import os
-from utils import hash_command
+import threading
+import time
+from command import parse_command
+from ruleset import CompiledRuleset
+from signature_store import load_signature_store, file_sha256, wants_mapped_index
+from snapshot import load_snapshot, SNAPSHOT_FILE
+from scoring import KeywordScorer
+from cache import VerdictCache, files_fingerprint
+from stats import DetectorStats
 
-# Secure Coding: Ensure all required config files exist before loading
-required_files = [
-    "data/rules.json",
-    "data/signatures.json",
-    "data/behavior_scoring.json",
-    "data/benign_keywords.json"
-]
+# Detection config files, keyed by the component they feed
+CONFIG_FILES = {
+    "rules": "data/rules.json",
+    "signatures": "data/signatures.json",
+    "behavior": "data/behavior_scoring.json",
+    "benign": "data/benign_keywords.json",
+}
 
-for path in required_files:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"[SECURITY] Required config missing: {path}")
+# Secure Coding: All of these must exist before the engine loads
+required_files = list(CONFIG_FILES.values())
 
-# Load detection rules, signatures, behavior scores, and benign keywords
-with open("data/rules.json") as f:
-    RULES = json.load(f)
+# Optional memory-mapped signature index built by `python signature_store.py`
+SIGNATURE_INDEX_DIR = "data/signature_index"
 
-with open("data/signatures.json") as f:
-    SIGNATURES = json.load(f)
+# Precompiled, memory-mapped copy of CONFIG_FILES. Loading (and reloading) the
+# config rebuilds it whenever it no longer matches the JSON files.
+USE_SNAPSHOT = True
 
-with open("data/behavior_scoring.json") as f:
-    BEHAVIOR_SCORES = json.load(f)
+# Optional near-duplicate index built by `python similarity.py <labeled.csv>`,
+# and the Jaccard similarity a command needs to inherit a known verdict
+SIMILARITY_INDEX_FILE = "data/similarity_index.npz"
+SIMILARITY_THRESHOLD = 0.8
 
-with open("data/benign_keywords.json") as f:
-    BENIGN_KEYWORDS = json.load(f)
+# Behavior score cut-offs for the malicious and suspicious verdicts
+MALICIOUS_THRESHOLD = 0.6
+SUSPICIOUS_THRESHOLD = 0.3
 
+# Maximum number of cached verdicts (0 disables the cache)
+VERDICT_CACHE_SIZE = 10000
 
-# Rule-Based Detection: Check if command matches any known attack pattern
-def match_rule_patterns(cmd):
-    for rule in RULES:
-        pattern = rule["pattern"]
-        if re.search(pattern, cmd, re.IGNORECASE):
-            return {
-                "verdict": rule["verdict"],
-                "reason": f"Rule-Based: matched '{pattern}'"
-            }
-    return None
+# Seconds between checks of the config files for changes
+RELOAD_CHECK_INTERVAL = 1.0
 
+# Collect per-stage timings and hit counters (opt-in; can be toggled at runtime)
+STATS_ENABLED = False
 
-# Signature-Based Detection: Match hash of the command with known malicious/suspicious hashes
-def match_signature(cmd):
-    # Secure Coding: Use hashing to avoid direct content comparison and tampering
-    cmd_hash = hash_command(cmd)
-    if cmd_hash in SIGNATURES.get("malicious_hashes", []):
+
+# Detector State: Everything compiled from one consistent set of config
+# files. Never mutated after construction, so it can be swapped atomically.
+class DetectorState:
+    def __init__(self, rules, signature_store, behavior_scores, benign_keywords,
+                 content_hashes, generation=0, similarity_index=None, snapshot=None):
+        self.rules = rules
+        self.behavior_scores = behavior_scores
+        self.benign_keywords = benign_keywords
+        self.content_hashes = content_hashes
+        self.generation = generation
+
+        # Compile the rules once: regexes plus the literal prefilter used to skip them.
+        # From a config snapshot the prefilter and keyword automaton come precompiled.
+        if snapshot is not None:
+            self.ruleset = CompiledRuleset(rules, snapshot.literals, snapshot.ruleset_tables)
+        else:
+            self.ruleset = CompiledRuleset(rules)
+        # Hash lookups go through a set or the on-disk index instead of scanning lists
+        self.signature_store = signature_store
+        # MinHash/LSH index of known bad commands, or None when not built
+        self.similarity_index = similarity_index
+        # Risky and benign keywords share one automaton for single-pass scoring
+        self.keyword_scorer = KeywordScorer(behavior_scores, benign_keywords,
+                                            snapshot.scorer_tables if snapshot else None)
+
+
+def content_hashes(config_files, similarity_index_file=None, known=None):
+    """SHA-256 of every config file, plus the similarity index when present."""
+    known = known or {}
+    hashes = {name: known.get(name) or file_sha256(path) for name, path in config_files.items()}
+    if similarity_index_file and os.path.exists(similarity_index_file):
+        hashes["similarity"] = file_sha256(similarity_index_file)
+    return hashes
+
+
+def load_state(config_files=None, signature_index_dir=SIGNATURE_INDEX_DIR, generation=0,
+               similarity_index_file=SIMILARITY_INDEX_FILE,
+               similarity_threshold=SIMILARITY_THRESHOLD, snapshot_file=None):
+    """Read and compile all config files (or their snapshot) into a new DetectorState."""
+    config_files = config_files or CONFIG_FILES
+
+    # Secure Coding: Ensure all required config files exist before loading
+    for path in config_files.values():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"[SECURITY] Required config missing: {path}")
+
+    snapshot = load_snapshot(config_files, snapshot_file) if snapshot_file else None
+    # A current snapshot already knows the content hashes of the JSON it was built from
+    hashes = content_hashes(config_files, similarity_index_file,
+                            known=snapshot.sources if snapshot else None)
+
+    if snapshot is not None:
+        rules = snapshot.rules
+        behavior_scores = snapshot.behavior_scores
+        benign_keywords = snapshot.benign_keywords
+        signature_store = snapshot.signature_store
+        # A separately built index (with Bloom filters) for a large feed still takes precedence
+        if wants_mapped_index(signature_index_dir):
+            signature_store = load_signature_store(config_files["signatures"], signature_index_dir)
+    else:
+        with open(config_files["rules"]) as f:
+            rules = json.load(f)
+        with open(config_files["behavior"]) as f:
+            behavior_scores = json.load(f)
+        with open(config_files["benign"]) as f:
+            benign_keywords = json.load(f)
+        signature_store = load_signature_store(config_files["signatures"], signature_index_dir)
+
+    similarity_index = None
+    if "similarity" in hashes:
+        # Imported here so NumPy is only loaded when the index is in use
+        from similarity import SimilarityIndex
+        similarity_index = SimilarityIndex.load(similarity_index_file, similarity_threshold)
+
+    return DetectorState(rules, signature_store, behavior_scores, benign_keywords,
+                         hashes, generation, similarity_index, snapshot)
+
+
+# Detector Engine: Holds the compiled state and swaps in a freshly loaded one
+# whenever the config files change, without blocking in-flight analyses
+class DetectorEngine:
+    def __init__(self, config_files=None, signature_index_dir=SIGNATURE_INDEX_DIR,
+                 cache_size=VERDICT_CACHE_SIZE, check_interval=RELOAD_CHECK_INTERVAL,
+                 stats_enabled=STATS_ENABLED, similarity_index_file=SIMILARITY_INDEX_FILE,
+                 snapshot_file=None):
+        # The shared snapshot only describes the default config files
+        if snapshot_file is None and config_files is None and USE_SNAPSHOT:
+            snapshot_file = SNAPSHOT_FILE
+        self.snapshot_file = snapshot_file
+        self.config_files = dict(config_files or CONFIG_FILES)
+        self.signature_index_dir = signature_index_dir
+        self.similarity_index_file = similarity_index_file
+        self.check_interval = check_interval
+        self.last_error = None
+        self.reloads = 0
+
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._failed_fingerprint = None
+        self._watcher = None
+        self._stop = threading.Event()
+
+        # The optional similarity index is watched like the config files
+        self._watched_files = list(self.config_files.values())
+        if similarity_index_file:
+            self._watched_files.append(similarity_index_file)
+
+        self._fingerprint = files_fingerprint(self._watched_files)
+        self._state = self._load(generation=0)
+        self._next_check = time.monotonic() + check_interval
+        self._cache = VerdictCache(cache_size)
+        self.stats = DetectorStats(enabled=stats_enabled)
+
+        # Stage order of _run_stages; behavior always decides, so it comes last
+        self._stages = (
+            ("rule", self._rule_stage),
+            ("signature", self._signature_stage),
+            ("similarity", self._similarity_stage),
+            ("behavior", self._behavior_stage),
+        )
+        self._stages_without_similarity = tuple(s for s in self._stages if s[0] != "similarity")
+
+    @property
+    def state(self):
+        return self._state
+
+    def _load(self, generation):
+        return load_state(self.config_files, self.signature_index_dir, generation,
+                          self.similarity_index_file, snapshot_file=self.snapshot_file)
+
+    # Rule-Based Detection: Check if command matches any known attack pattern.
+    # Every stage takes the raw command or a ParsedCommand shared between stages.
+    def match_rule_patterns(self, cmd, state=None):
+        return self._rule_stage(parse_command(cmd), state or self._state)[0]
+
+    # Signature-Based Detection: Match hash of the command with known malicious/suspicious hashes
+    def match_signature(self, cmd, state=None):
+        return self._signature_stage(parse_command(cmd), state or self._state)[0]
+
+    # Similarity-Based Detection: Near-duplicates of known bad commands (edited spacing, case, IPs, names)
+    def match_similarity(self, cmd, state=None):
+        return self._similarity_stage(parse_command(cmd), state or self._state)[0]
+
+    # Behavior-Based Detection: Add risk points based on keyword scoring logic
+    def behavior_score(self, cmd, state=None):
+        return self._behavior_stage(parse_command(cmd), state or self._state)[0]
+
+    # Each stage returns (result or None, what matched), the latter for the hit counters
+
+    def _rule_stage(self, command, state):
+        # First match in rules.json order wins; rules whose literals are absent are skipped
+        rule = state.ruleset.match(command)
+        if rule:
+            return rule_result(rule), rule.pattern
+        return None, None
+
+    def _signature_stage(self, command, state):
+        # Secure Coding: Use hashing to avoid direct content comparison and tampering
+        cmd_hash = command.digest
+        match = state.signature_store.lookup(cmd_hash)
+        if match:
+            return signature_result(match, cmd_hash), match
+        return None, None
+
+    def _similarity_stage(self, command, state):
+        if state.similarity_index is None:
+            return None, None
+        match = state.similarity_index.lookup(command.raw)
+        if match:
+            return similarity_result(*match), None
+        return None, None
+
+    def _behavior_stage(self, command, state):
+        # Add score for risky behavior keywords and, in the same pass,
+        # Secure Coding: reduce score for known benign terms to avoid false positives
+        score, hits = state.keyword_scorer.score(command)
+        return score_result(score, hits), hits
+
+    # Main Detection Engine: Combines all detection methods
+    def analyze(self, cmd):
+        self._poll_config()
+
+        # Read the state once so every stage sees the same config
+        state = self._state
+        if self.stats.enabled:
+            return self._analyze_timed(cmd, state)
+        result = self._cache.get(cmd)
+        if result is None:
+            result = self._run_stages(cmd, state)
+            self._cache.put(cmd, result, generation=state.generation)
+        # Hand out a copy so callers cannot alter the cached verdict
+        return dict(result)
+
+    def _analyze_timed(self, cmd, state):
+        # Same flow as analyze(), with _run_stages reporting each stage it ran
+        clock = time.perf_counter_ns
+        start = clock()
+        result = self._cache.get(cmd)
+        if result is not None:
+            self.stats.record(clock() - start, result, cached=True)
+            return dict(result)
+
+        trace = []
+        result = self._run_stages(cmd, state, trace)
+        self._cache.put(cmd, result, generation=state.generation)
+        self.stats.record(clock() - start, result, trace)
+        return dict(result)
+
+    def _run_stages(self, cmd, state, trace=None):
+        """
+        Run rule, signature, similarity and behavior detection until one decides.
+
+        With a `trace` list, (stage, elapsed ns, what matched) is appended for
+        every stage that ran; without one nothing is timed.
+        """
+        # Parse once; every stage reuses the lowercased text, tokens and digest
+        command = parse_command(cmd)
+        # The similarity stage only runs when an index is built
+        stages = self._stages if state.similarity_index is not None else self._stages_without_similarity
+        for stage, run in stages:
+            if trace is None:
+                result, _ = run(command, state)
+            else:
+                started = time.perf_counter_ns()
+                result, detail = run(command, state)
+                trace.append((stage, time.perf_counter_ns() - started, detail))
+            if result:
+                return result
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the verdict cache."""
+        return self._cache.stats()
+
+    def stats_snapshot(self):
+        """Per-stage latencies and per-rule/signature/keyword hit counts."""
+        snapshot = self.stats.snapshot()
+        snapshot["cache"] = self._cache.stats()
+        snapshot["generation"] = self._state.generation
+        return snapshot
+
+    def _poll_config(self):
+        # Stat the config files at most once per interval; reload off-thread
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        if self._reloading or files_fingerprint(self._watched_files) in (
+                self._fingerprint, self._failed_fingerprint):
+            return
+        self._reloading = True
+        threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            self.reload_if_changed()
+        finally:
+            self._reloading = False
+
+    def reload_if_changed(self, force=False):
+        """Reload when file metadata and content changed; returns True if swapped."""
+        with self._reload_lock:
+            fingerprint = files_fingerprint(self._watched_files)
+            if not force and fingerprint in (self._fingerprint, self._failed_fingerprint):
+                return False
+            try:
+                # Files touched but identical in content keep the current state
+                if not force:
+                    hashes = content_hashes(self.config_files, self.similarity_index_file)
+                    if hashes == self._state.content_hashes:
+                        self._fingerprint = fingerprint
+                        return False
+
+                state = self._load(generation=self._state.generation + 1)
+            except Exception as e:
+                # Secure Coding: A missing or half-written config keeps the last good state
+                self.last_error = e
+                self._failed_fingerprint = fingerprint
+                print(f"[!] Config reload failed, keeping current rules: {e}")
+                return False
+
+            # Atomic swap: analyses pick up either the old or the new state, never a mix
+            self._state = state
+            self._fingerprint = fingerprint
+            self._cache.reset(state.generation)
+            self.last_error = None
+            self.reloads += 1
+            return True
+
+    def start_watcher(self, interval=None):
+        """Check for config changes on a background thread, even while idle."""
+        if self._watcher and self._watcher.is_alive():
+            return self._watcher
+        interval = interval or self.check_interval
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+
+def rule_result(rule):
+    return {
+        "verdict": rule.verdict,
+        "reason": f"Rule-Based: matched '{rule.pattern}'"
+    }
+
+
+def signature_result(match, cmd_hash):
+    if match == "malicious":
         return {
             "verdict": "malicious",
             "reason": f"Signature-Based: hash match {cmd_hash}"
         }
-    if cmd_hash in SIGNATURES.get("suspicious_hashes", []):
-        return {
-            "verdict": "suspicious",
-            "reason": f"Signature-Based: suspicious hash match {cmd_hash}"
-        }
-    return None
-
+    return {
+        "verdict": "suspicious",
+        "reason": f"Signature-Based: suspicious hash match {cmd_hash}"
+    }
 
-# Behavior-Based Detection: Add risk points based on keyword scoring logic
-def behavior_score(cmd):
-    score = 0.0
-    hits = []
 
-    cmd_lower = cmd.lower()
+def similarity_result(similarity, known_cmd, verdict):
+    # Secure Coding: Quote a bounded, single-line copy of the known command
+    quoted = known_cmd.replace("\n", " ").replace("\r", " ")[:100]
+    return {
+        "verdict": verdict,
+        "reason": f"Similarity-Based: {similarity:.2f} similar to known {verdict} command '{quoted}'"
+    }
 
-    # Add score for risky behavior keywords
-    for keyword, weight in BEHAVIOR_SCORES.items():
-        if keyword in cmd_lower:
-            score += weight
-            hits.append(keyword)
 
-    # Secure Coding: Reduce score for known benign terms to avoid false positives
-    for safe_word in BENIGN_KEYWORDS:
-        if safe_word in cmd_lower:
-            score -= 0.1
-            hits.append(f"-{safe_word}")
-
-    # Verdict based on final score
-    if score >= 0.6:
+# Verdict based on final score
+def score_result(score, hits):
+    if score >= MALICIOUS_THRESHOLD:
         return {
             "verdict": "malicious",
             "reason": f"Behavior-Based: high-risk keywords {hits}"
         }
-    elif score >= 0.3:
+    elif score >= SUSPICIOUS_THRESHOLD:
         return {
             "verdict": "suspicious",
             "reason": f"Behavior-Based: medium-risk keywords {hits}"
@@ -95,17 +404,75 @@ def behavior_score(cmd):
         }
 
 
-# Main Detection Engine: Combines all detection methods
+# Default engine shared by the module-level functions, created on first use
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                _default_engine = DetectorEngine()
+    return _default_engine
+
+
+def set_engine(engine):
+    """Replace the default engine used by analyze_command and friends."""
+    global _default_engine
+    _default_engine = engine
+
+
+def match_rule_patterns(cmd):
+    return get_engine().match_rule_patterns(cmd)
+
+
+def match_signature(cmd):
+    return get_engine().match_signature(cmd)
+
+
+def match_similarity(cmd):
+    return get_engine().match_similarity(cmd)
+
+
+def behavior_score(cmd):
+    return get_engine().behavior_score(cmd)
+
+
 def analyze_command(cmd):
-    # First try rule-based detection
-    result = match_rule_patterns(cmd)
-    if result:
-        return result
-
-    # Then check against known signatures
-    result = match_signature(cmd)
-    if result:
-        return result
-
-    # Fallback to behavior-based analysis
-    return behavior_score(cmd)
+    return get_engine().analyze(cmd)
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of the default engine's verdict cache."""
+    return get_engine().cache_stats()
+
+
+def stats_snapshot():
+    """Detection timings and hit counters of the default engine."""
+    return get_engine().stats_snapshot()
+
+
+def set_stats_enabled(enabled):
+    """Turn stats collection on or off for the default engine."""
+    get_engine().stats.enabled = enabled
+
+
+# Backwards compatibility: the old module-level config globals now read
+# through to the default engine's current state
+_STATE_ATTRIBUTES = {
+    "RULES": "rules",
+    "BEHAVIOR_SCORES": "behavior_scores",
+    "BENIGN_KEYWORDS": "benign_keywords",
+    "RULESET": "ruleset",
+    "SIGNATURE_STORE": "signature_store",
+    "SIMILARITY_INDEX": "similarity_index",
+    "KEYWORD_SCORER": "keyword_scorer",
+}
+
+
+def __getattr__(name):
+    if name in _STATE_ATTRIBUTES:
+        return getattr(get_engine().state, _STATE_ATTRIBUTES[name])
+    raise AttributeError(f"module 'detector' has no attribute {name!r}")
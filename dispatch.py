@@ -0,0 +1,600 @@
+import abc
+import atexit
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from alerter import get_aggregator
+from logger import AlertWriter, LOG_FILE, format_entry, get_writer
+
+# Optional sink configuration: a JSON list of sink specs (see build_sink).
+# Without it alerts go to the console and to alerts.log, as before.
+ALERT_SINKS_FILE = "data/alert_sinks.json"
+DEFAULT_SINKS = [
+    {"type": "console", "overflow": "drop_oldest", "batch_delay": 0.0},
+    {"type": "file", "path": LOG_FILE, "overflow": "block"},
+]
+
+# Where sinks with the "spill" overflow policy park alerts their queue cannot hold
+SPILL_DIR = "logs/spill"
+
+# Per-sink defaults
+QUEUE_SIZE = 10000
+BATCH_SIZE = 100
+BATCH_DELAY = 0.2              # seconds to wait for a batch to fill up
+MAX_RETRIES = 5
+BACKOFF = 0.5                  # first retry delay; doubles per attempt
+MAX_BACKOFF = 30.0
+MAX_SPILL_BYTES = 100 * 1024 * 1024
+
+# Seconds close() waits for sinks to drain at shutdown
+CLOSE_TIMEOUT = 5.0
+
+# Seconds the file sink waits for a batch to reach the disk before retrying
+FILE_FLUSH_TIMEOUT = 10.0
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+
+# Syslog severities per verdict (RFC 5424), sent with the security/auth facility
+SYSLOG_FACILITY = 4
+SYSLOG_SEVERITY = {"malicious": 2, "suspicious": 4}
+SYSLOG_APP = "malcommandguard"
+
+# Secure Coding: Bound what a single alert can put on the wire
+MAX_MESSAGE_COMMAND = 1024
+
+
+class Alert:
+    __slots__ = ("cmd", "result", "created")
+
+    def __init__(self, cmd, result, created=None):
+        self.cmd = cmd
+        self.result = result
+        self.created = time.time() if created is None else created
+
+    def record(self):
+        """Plain JSON-serializable form, as sent to JSONL files and webhooks."""
+        return {
+            "time": datetime.fromtimestamp(self.created, timezone.utc).isoformat(),
+            "verdict": self.result.get("verdict", "unknown"),
+            "reason": self.result.get("reason", ""),
+            "command": self.cmd,
+        }
+
+    def dumps(self):
+        return json.dumps({"cmd": self.cmd, "result": self.result, "created": self.created})
+
+    @classmethod
+    def loads(cls, line):
+        data = json.loads(line)
+        return cls(data["cmd"], data["result"], data["created"])
+
+
+# Alert Sink: Delivers a batch of alerts somewhere. deliver() raises on
+# failure; the worker in front of the sink retries the whole batch.
+class AlertSink(abc.ABC):
+    kind = "sink"
+
+    @abc.abstractmethod
+    def deliver(self, alerts):
+        """Deliver a list of Alerts; raise to have the batch retried."""
+
+    def close(self):
+        pass
+
+
+# Console: the deduplicating, rate-limited banner printer from alerter.py
+class ConsoleSink(AlertSink):
+    kind = "console"
+
+    def __init__(self, aggregator=None):
+        self.aggregator = aggregator
+
+    def deliver(self, alerts):
+        aggregator = self.aggregator or get_aggregator()
+        for alert in alerts:
+            aggregator.submit(alert.cmd, alert.result)
+
+
+# File: alerts.log lines through the rotating AlertWriter from logger.py
+class FileSink(AlertSink):
+    kind = "file"
+
+    def __init__(self, path=LOG_FILE, **writer_options):
+        # Share log_alert's writer for the default log, so one thread owns the file
+        self._own_writer = path != LOG_FILE or bool(writer_options)
+        self.writer = AlertWriter(path, **writer_options) if self._own_writer else get_writer()
+
+    def deliver(self, alerts):
+        for alert in alerts:
+            if not self.writer.write(format_entry(alert.cmd, alert.result, alert.created)):
+                raise RuntimeError(f"alert writer for {self.writer.path} is closed")
+        # Only acknowledge the batch once it is on disk
+        if not self.writer.flush(FILE_FLUSH_TIMEOUT):
+            raise TimeoutError(f"alerts not written to {self.writer.path} within {FILE_FLUSH_TIMEOUT}s")
+
+    def close(self):
+        if self._own_writer:
+            self.writer.close()
+
+
+# JSONL: one alert record per line, for log shippers
+class JsonlSink(AlertSink):
+    kind = "jsonl"
+
+    def __init__(self, path="logs/alerts.jsonl"):
+        self.path = path
+        self._file = None
+
+    def deliver(self, alerts):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Secure Coding: Append mode never overwrites earlier alerts
+            self._file = open(self.path, "a", encoding="utf-8")
+        # json.dumps escapes newlines and control characters inside commands
+        self._file.write("".join(json.dumps(alert.record()) + "\n" for alert in alerts))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Syslog: RFC 5424 datagrams to a local Unix socket (e.g. /dev/log) or UDP host:port
+class SyslogSink(AlertSink):
+    kind = "syslog"
+
+    def __init__(self, address="/dev/log", facility=SYSLOG_FACILITY, app=SYSLOG_APP):
+        self.address = tuple(address) if isinstance(address, list) else address
+        self.facility = facility
+        self.app = app
+        self.hostname = socket.gethostname()
+        self._socket = None
+
+    def _connect(self):
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def format(self, alert):
+        record = alert.record()
+        priority = self.facility * 8 + SYSLOG_SEVERITY.get(record["verdict"], 6)
+        # Secure Coding: One line per message, with the command bounded
+        command = record["command"].replace("\n", " ").replace("\r", " ")[:MAX_MESSAGE_COMMAND]
+        return (f"<{priority}>1 {record['time']} {self.hostname} {self.app} {os.getpid()} - - "
+                f"{record['verdict'].upper()}: {command} | {record['reason']}").encode("utf-8", "replace")
+
+    def deliver(self, alerts):
+        if self._socket is None:
+            self._socket = self._connect()
+        try:
+            for alert in alerts:
+                self._socket.send(self.format(alert))
+        except OSError:
+            # Reconnect on the retry, e.g. after the receiver restarted
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+# Webhook: POSTs each batch as {"alerts": [...]} JSON
+class WebhookSink(AlertSink):
+    kind = "webhook"
+
+    def __init__(self, url, timeout=5.0, headers=None):
+        # Secure Coding: Only plain HTTP(S) targets, never file:// or other handlers
+        if not url.startswith(("http://", "https://")):
+            raise ValueError(f"[SECURITY] Webhook URL must be http(s): {url}")
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def deliver(self, alerts):
+        # urllib.request pulls in http.client and email; only webhook users pay for it
+        import urllib.request
+
+        body = json.dumps({"alerts": [alert.record() for alert in alerts]}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        # Non-2xx responses raise HTTPError, which triggers a retry
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+SINK_TYPES = {
+    "console": ConsoleSink,
+    "file": FileSink,
+    "jsonl": JsonlSink,
+    "syslog": SyslogSink,
+    "webhook": WebhookSink,
+}
+
+
+def register_sink(kind, sink_class):
+    """Make a custom AlertSink subclass available to sink specs as `kind`."""
+    SINK_TYPES[kind] = sink_class
+
+
+# Sink Worker: A bounded queue and a thread in front of one sink. The
+# detection thread only ever enqueues; batching, retries with exponential
+# backoff and the overflow policy all happen here, so a slow or broken sink
+# delays nobody but itself.
+class SinkWorker:
+    def __init__(self, sink, name=None, queue_size=QUEUE_SIZE, overflow="block",
+                 batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, max_backoff=MAX_BACKOFF, spill_dir=SPILL_DIR,
+                 max_spill_bytes=MAX_SPILL_BYTES):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}; use one of {OVERFLOW_POLICIES}")
+        self.sink = sink
+        self.name = name or sink.kind
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_spill_bytes = max_spill_bytes
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stop = threading.Event()
+        self._in_flight = []
+
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.spilled = 0
+        self.last_error = None
+        self.last_delivery_lag = 0.0
+
+        # Spill file: alerts that did not fit, kept in order and replayed first.
+        # Left over from an earlier run, it is picked up again.
+        self._spill_path = None
+        self._spill_file = None
+        self._spill_read = 0
+        self._spill_pending = 0
+        if overflow == "spill":
+            self._spill_path = os.path.join(spill_dir, f"{self.name}.jsonl")
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spill_file = open(self._spill_path, "a+b")
+            self._spill_file.seek(0)
+            self._spill_pending = sum(1 for _ in self._spill_file)
+
+        self._thread = threading.Thread(target=self._run, name=f"alert-sink-{self.name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, alert):
+        """Queue one alert according to the overflow policy; False if it was dropped."""
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+
+            if self.overflow == "spill" and (self._spill_pending or len(self._queue) >= self.queue_size):
+                # Once spilling, newer alerts queue behind the spilled ones to keep order
+                return self._spill(alert)
+
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.queue_size and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        self.dropped += 1
+                        return False
+
+            self._queue.append(alert)
+            self._cond.notify_all()
+            return True
+
+    def _spill(self, alert):
+        line = (alert.dumps() + "\n").encode("utf-8")
+        try:
+            if self._spill_file.seek(0, os.SEEK_END) + len(line) > self.max_spill_bytes:
+                self.dropped += 1
+                return False
+            self._spill_file.write(line)
+            self._spill_file.flush()
+        except OSError as e:
+            print(f"[ERROR] Could not spill alert for sink {self.name}: {e}")
+            self.dropped += 1
+            return False
+        self._spill_pending += 1
+        self.spilled += 1
+        self._cond.notify_all()
+        return True
+
+    def _refill(self):
+        # Move the oldest spilled alerts back into the (empty) memory queue
+        self._spill_file.seek(self._spill_read)
+        while self._spill_pending and len(self._queue) < self.queue_size:
+            line = self._spill_file.readline()
+            if not line:
+                self._spill_pending = 0
+                break
+            self._spill_pending -= 1
+            try:
+                self._queue.append(Alert.loads(line))
+            except (ValueError, KeyError, TypeError):
+                # Secure Coding: A damaged spill line is counted and skipped, never executed
+                self.dropped += 1
+        self._spill_read = self._spill_file.tell()
+        if not self._spill_pending:
+            self._spill_file.truncate(0)
+            self._spill_read = 0
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._spill_pending and not self._closed:
+                self._cond.wait()
+            if not self._queue and self._spill_pending:
+                self._refill()
+            if not self._queue:
+                return None
+
+            # Give a batch a moment to fill up, unless shutting down
+            deadline = time.monotonic() + self.batch_delay
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            count = min(self.batch_size, len(self._queue))
+            self._in_flight = [self._queue.popleft() for _ in range(count)]
+            # Wake producers blocked on a full queue
+            self._cond.notify_all()
+            return self._in_flight
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._deliver(batch)
+            with self._cond:
+                self._in_flight = []
+                self._cond.notify_all()
+
+    def _deliver(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self.sink.deliver(batch)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                attempt += 1
+                # At shutdown a failing sink gets no further retries
+                if attempt > self.max_retries or self._stop.is_set():
+                    self.failed += len(batch)
+                    print(f"[ERROR] Alert sink {self.name} gave up on {len(batch)} alerts: {self.last_error}")
+                    return
+                self.retries += 1
+                self._stop.wait(min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+                continue
+
+            self.delivered += len(batch)
+            self.batches += 1
+            self.last_delivery_lag = time.time() - batch[0].created
+            return
+
+    def flush(self, timeout=None):
+        """Wait until everything queued or spilled so far was handed to the sink."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._spill_pending or self._in_flight:
+                if not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(0.05 if remaining is None else min(remaining, 0.05))
+        return True
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Deliver what is queued (within `timeout`), then stop the worker and the sink."""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if not drained:
+            # Cut retry backoff short; whatever is left over is counted as failed
+            self._stop.set()
+        self._thread.join(timeout)
+        try:
+            self.sink.close()
+        finally:
+            if self._spill_file is not None:
+                self._spill_file.close()
+
+    def metrics(self):
+        with self._cond:
+            pending = list(self._in_flight[:1]) + list(self._queue)[:1]
+            oldest = min((alert.created for alert in pending), default=None)
+            return {
+                "sink": self.sink.kind,
+                "overflow": self.overflow,
+                "queued": len(self._queue),
+                "in_flight": len(self._in_flight),
+                "spill_pending": self._spill_pending,
+                "delivered": self.delivered,
+                "batches": self.batches,
+                "retries": self.retries,
+                "spilled": self.spilled,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                # Age of the oldest alert not yet delivered (spilled ones excluded)
+                "lag_seconds": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+                "last_delivery_lag_seconds": round(self.last_delivery_lag, 3),
+                "last_error": self.last_error,
+            }
+
+
+_WORKER_OPTIONS = ("name", "queue_size", "overflow", "batch_size", "batch_delay", "max_retries",
+                   "backoff", "max_backoff", "spill_dir", "max_spill_bytes")
+
+
+def build_sink(spec):
+    """
+    Create a SinkWorker from a spec such as
+    {"type": "webhook", "url": "http://127.0.0.1:9000/alerts", "overflow": "spill"}.
+
+    Worker options (queue_size, overflow, batch_size, ...) are taken out of the
+    spec; every other key is passed to the sink class.
+    """
+    spec = dict(spec)
+    kind = spec.pop("type")
+    if kind not in SINK_TYPES:
+        raise ValueError(f"Unknown alert sink type {kind!r}")
+    options = {key: spec.pop(key) for key in _WORKER_OPTIONS if key in spec}
+    return SinkWorker(SINK_TYPES[kind](**spec), **options)
+
+
+def check_sink_names(names):
+    """Raise ValueError on repeated sink names; they key skip lists, metrics and spill files."""
+    seen = set()
+    for name in names:
+        if name in seen:
+            raise ValueError(f"Duplicate alert sink name {name!r}; give each sink a unique \"name\"")
+        seen.add(name)
+
+
+# Alert Dispatcher: Fans every alert out to all sink workers
+class AlertDispatcher:
+    def __init__(self, workers=()):
+        self.workers = list(workers)
+        check_sink_names(worker.name for worker in self.workers)
+
+    @classmethod
+    def from_specs(cls, specs):
+        # Checked before any worker starts, so no spill file is opened twice
+        check_sink_names(spec.get("name") or spec.get("type") for spec in specs)
+        return cls(build_sink(spec) for spec in specs)
+
+    def add_sink(self, sink, **options):
+        name = options.get("name") or sink.kind
+        check_sink_names([worker.name for worker in self.workers] + [name])
+        worker = SinkWorker(sink, **options)
+        self.workers.append(worker)
+        return worker
+
+    def submit(self, cmd, result, skip=()):
+        """Hand one alert to every sink whose name is not in `skip`."""
+        alert = Alert(cmd, result)
+        for worker in self.workers:
+            if worker.name not in skip:
+                worker.offer(alert)
+
+    def flush(self, timeout=None, sinks=None):
+        """Wait for every sink, or only those named in `sinks`, to catch up."""
+        return all([worker.flush(timeout) for worker in self.workers
+                    if sinks is None or worker.name in sinks])
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        for worker in self.workers:
+            worker.close(timeout)
+
+    def metrics(self):
+        """Per-sink queue depth, lag, delivery, retry and drop counters."""
+        return {worker.name: worker.metrics() for worker in self.workers}
+
+
+def load_sink_specs(path=ALERT_SINKS_FILE):
+    if not os.path.exists(path):
+        return DEFAULT_SINKS
+    try:
+        with open(path) as f:
+            specs = json.load(f)
+        if not isinstance(specs, list):
+            raise ValueError("expected a list of sink specs")
+        return specs
+    except ValueError as e:
+        print(f"[!] Ignoring alert sink config {path}: {e}")
+        return DEFAULT_SINKS
+
+
+# Default dispatcher used by dispatch_alert, created on first alert
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                try:
+                    _dispatcher = AlertDispatcher.from_specs(load_sink_specs())
+                except (TypeError, ValueError) as e:
+                    print(f"[!] Ignoring alert sink config {ALERT_SINKS_FILE}: {e}")
+                    _dispatcher = AlertDispatcher.from_specs(DEFAULT_SINKS)
+                # Deliver what is still queued on a clean exit
+                atexit.register(_dispatcher.close)
+    return _dispatcher
+
+
+# Function: Sends a flagged command to every configured alert sink without waiting for them
+def dispatch_alert(cmd, result, skip=()):
+    get_dispatcher().submit(cmd, result, skip)
+
+
+def flush_dispatch(timeout=CLOSE_TIMEOUT, sinks=None):
+    """Wait (up to `timeout`) until queued alerts reached their sinks (or only `sinks`)."""
+    if _dispatcher is not None:
+        return _dispatcher.flush(timeout, sinks)
+    return True
+
+
+def dispatch_metrics():
+    """Per-sink metrics of the default dispatcher ({} before the first alert)."""
+    return _dispatcher.metrics() if _dispatcher is not None else {}
+
+
+def run_webhook_stub(port=8787, host="127.0.0.1"):
+    """Local HTTP receiver that prints posted alerts, for trying out a webhook sink."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = min(int(self.headers.get("Content-Length", 0)), 16 * 1024 * 1024)
+            alerts = json.loads(self.rfile.read(length) or b"{}").get("alerts", [])
+            for alert in alerts:
+                print(f"[webhook] {alert.get('verdict', '').upper()}: {alert.get('command')}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer((host, port), Handler)
+    print(f"[*] Webhook stub listening on http://{host}:{port}/")
+    server.serve_forever()
+
+
+# Entry point: python dispatch.py webhook-stub [port]
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "webhook-stub":
+        run_webhook_stub(int(sys.argv[2]) if len(sys.argv) > 2 else 8787)
+    else:
+        print(json.dumps(load_sink_specs(), indent=2))
@@ -0,0 +1,215 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+import detector
+import scoring
+from batch import analyze_commands
+from command import ParsedCommand
+from stats import STAGES
+
+# Persistent per-command results of previous evaluation runs
+EVAL_CACHE_FILE = "data/eval_cache.sqlite"
+
+# Bumped whenever the table layout or the meaning of a stage key changes
+CACHE_FORMAT = "1"
+
+# Digests per SELECT ... IN (...) query, below SQLite's variable limit
+QUERY_BATCH = 500
+
+# Engine method that runs each stage against an explicit state
+STAGE_METHODS = {
+    "rule": "match_rule_patterns",
+    "signature": "match_signature",
+    "similarity": "match_similarity",
+    "behavior": "behavior_score",
+}
+
+_KEY_COLUMNS = [f"{stage}_key" for stage in STAGES]
+
+
+def stage_keys(state):
+    """
+    Content key of everything each stage depends on, in STAGES order.
+
+    A verdict decided at some stage only depends on the keys of that stage and
+    the ones before it (which found nothing); later stages never ran.
+    """
+    hashes = state.content_hashes
+    similarity = hashes.get("similarity", "")
+    if state.similarity_index is not None:
+        similarity += f":{state.similarity_index.threshold}"
+    return (
+        hashes["rules"],
+        hashes["signatures"],
+        similarity,
+        f"{hashes['behavior']}:{hashes['benign']}:{scoring.BENIGN_DISCOUNT}:"
+        f"{detector.MALICIOUS_THRESHOLD}:{detector.SUSPICIOUS_THRESHOLD}",
+    )
+
+
+# Eval Cache: SQLite table of the last result computed for every distinct
+# command, together with the stage keys it was computed under
+class EvalCache:
+    def __init__(self, path=EVAL_CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None or row[0] != CACHE_FORMAT:
+            # Results written by another format are simply recomputed
+            self._db.execute("DROP TABLE IF EXISTS results")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('format', ?)", (CACHE_FORMAT,))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results (digest TEXT PRIMARY KEY, verdict TEXT, "
+            f"reason TEXT, stage TEXT, {', '.join(f'{c} TEXT' for c in _KEY_COLUMNS)})"
+        )
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get_many(self, digests):
+        """Return {digest: (verdict, reason, stage, keys)} for the cached digests."""
+        found = {}
+        digests = list(digests)
+        columns = ", ".join(["digest", "verdict", "reason", "stage"] + _KEY_COLUMNS)
+        for start in range(0, len(digests), QUERY_BATCH):
+            batch = digests[start:start + QUERY_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            query = f"SELECT {columns} FROM results WHERE digest IN ({placeholders})"
+            for digest, verdict, reason, stage, *keys in self._db.execute(query, batch):
+                found[digest] = (verdict, reason, stage, tuple(keys))
+        return found
+
+    def put_many(self, rows):
+        """Store (digest, verdict, reason, stage, keys) rows in one transaction."""
+        placeholders = ", ".join("?" * (4 + len(_KEY_COLUMNS)))
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO results VALUES ({placeholders})",
+                ((digest, verdict, reason, stage, *keys) for digest, verdict, reason, stage, keys in rows),
+            )
+
+    def close(self):
+        self._db.close()
+
+
+def rerun(engine, state, cmd, cached, changed):
+    """
+    Recompute one cached result, starting at the first stage whose key changed.
+
+    Stages before it are unchanged and found nothing last time. Once a rerun
+    stage finds nothing and no later stage up to the cached one changed, the
+    cached result still holds and is returned as is.
+    """
+    command = ParsedCommand(cmd)
+    decided = STAGES.index(cached[2])
+    first = changed.index(True)
+
+    for position in range(first, len(STAGES)):
+        stage = STAGES[position]
+        result = getattr(engine, STAGE_METHODS[stage])(command, state)
+        # The behavior stage always produces a verdict, so the loop ends here at the latest
+        if result:
+            return result["verdict"], result["reason"], stage
+        if position < decided and not any(changed[position + 1:decided + 1]):
+            return cached[:3]
+
+
+def evaluate_incremental(commands, cache, engine=None):
+    """
+    Score commands, reusing cached results a config change cannot affect.
+
+    Args:
+        commands: Sequence of command strings
+        cache: EvalCache holding the previous run
+        engine: DetectorEngine to use (defaults to the shared one)
+
+    Returns:
+        tuple: (results DataFrame with command, verdict, reason, stage,
+                previous_verdict and previous_reason, counts dict with
+                computed, rerun and reused distinct commands)
+    """
+    engine = engine or detector.get_engine()
+    # One config state for the whole run, like analyze_commands
+    state = engine.state
+    keys = stage_keys(state)
+
+    codes, uniques = pd.factorize(pd.Series(commands, dtype=object).astype(str))
+    digests = [ParsedCommand(cmd).digest for cmd in uniques]
+    cached = cache.get_many(digests)
+
+    count = len(uniques)
+    results = [None] * count
+    previous = [(None, None)] * count
+    missing = []
+    updates = []
+    counts = {"computed": 0, "rerun": 0, "reused": 0}
+
+    for i, (cmd, digest) in enumerate(zip(uniques, digests)):
+        entry = cached.get(digest)
+        if entry is None:
+            missing.append(i)
+            continue
+        previous[i] = entry[:2]
+        changed = [old != new for old, new in zip(entry[3], keys)]
+        if not any(changed[:STAGES.index(entry[2]) + 1]):
+            results[i] = entry[:3]
+            counts["reused"] += 1
+            continue
+        results[i] = rerun(engine, state, cmd, entry, changed)
+        counts["rerun"] += 1
+        updates.append((digest, *results[i], keys))
+
+    # Commands never seen before go through the vectorized batch engine
+    if missing:
+        table = analyze_commands([uniques[i] for i in missing], engine)
+        for i, verdict, reason, stage in zip(missing, table["verdict"], table["reason"], table["stage"]):
+            results[i] = (verdict, reason, stage)
+            updates.append((digests[i], verdict, reason, stage, keys))
+        counts["computed"] = len(missing)
+
+    if updates:
+        cache.put_many(updates)
+
+    verdicts, reasons, stages = zip(*results) if results else ((), (), ())
+    previous_verdicts, previous_reasons = zip(*previous) if previous else ((), ())
+    frame = pd.DataFrame({
+        "verdict": verdicts,
+        "reason": reasons,
+        "stage": stages,
+        "previous_verdict": previous_verdicts,
+        "previous_reason": previous_reasons,
+    }, dtype=object)
+    frame = frame.iloc[codes].reset_index(drop=True)
+    frame.insert(0, "command", uniques.take(codes))
+    return frame, counts
+
+
+def flipped_verdicts(results, labels):
+    """
+    Rows whose verdict differs from the previous run, with the effect on accuracy.
+
+    Returns:
+        DataFrame: command, label, previous/current verdict and reason, and
+                   effect ("fixed", "broken" or "changed")
+    """
+    report = results.assign(label=list(labels))
+    report = report[report["previous_verdict"].notna() & (report["previous_verdict"] != report["verdict"])]
+    was_correct = report["previous_verdict"] == report["label"]
+    is_correct = report["verdict"] == report["label"]
+    effect = pd.Series("changed", index=report.index)
+    effect[is_correct & ~was_correct] = "fixed"
+    effect[was_correct & ~is_correct] = "broken"
+    return report.assign(effect=effect)[
+        ["command", "label", "previous_verdict", "verdict", "previous_reason", "reason", "effect"]
+    ]
@@ -1,5 +1,9 @@
+import argparse
+import sys
 import pandas as pd
-from detector import analyze_command
+from concurrent.futures import ProcessPoolExecutor
+from batch import analyze_commands
+from eval_cache import EvalCache, EVAL_CACHE_FILE, evaluate_incremental, flipped_verdicts
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 
 
@@ -11,38 +15,96 @@ def normalize_label(label):
     return label
 
 
-def run_evaluation(csv_path, verbose=True):
+# Rows per task handed to each worker process
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def _predict_chunk(commands):
+    """Worker entry point: score one chunk of commands."""
+    return analyze_commands(commands)["verdict"].tolist()
+
+
+def predict_verdicts(commands, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     """
-    Main evaluation function that returns metrics and optionally prints detailed results.
+    Score commands serially or spread over a process pool.
     
     Args:
-        csv_path: Path to the CSV file
-        verbose: If True, prints individual predictions; if False, only prints summary
+        commands: pandas Series of commands
+        workers: Number of worker processes (1 runs in-process)
+        chunk_size: Rows per worker task
     
     Returns:
-        tuple: (accuracy, precision, recall, f1, correct_count, total_count)
+        list: Predicted verdicts in input order (identical to a serial run)
+    """
+    if workers <= 1 or len(commands) <= chunk_size:
+        return _predict_chunk(commands)
+
+    chunks = [commands.iloc[i:i + chunk_size] for i in range(0, len(commands), chunk_size)]
+    y_pred = []
+    # Executor.map yields results in submission order, so chunks stay aligned
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for verdicts in pool.map(_predict_chunk, chunks):
+            y_pred.extend(verdicts)
+    return y_pred
+
+
+def collect_predictions(csv_path, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Load the labeled dataset and run detection over it exactly once.
+    
+    Returns:
+        tuple: (dataframe, y_true, y_pred)
     """
     df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
     
-    y_true = []
-    y_pred = []
+    y_true = df["Label"].map(normalize_label).tolist()
+    y_pred = predict_verdicts(df["prompt"], workers=workers, chunk_size=chunk_size)
+    return df, y_true, y_pred
+
+
+def collect_incremental(csv_path, cache_path=EVAL_CACHE_FILE):
+    """
+    Like collect_predictions, but only rescoring rows a config change can affect.
     
-    if verbose:
-        print("=== Evaluating MalCommandGuard ===\n")
-    
-    for index, row in df.iterrows():
-        cmd = row["prompt"]
-        actual = normalize_label(row["Label"])
-        predicted = analyze_command(cmd)["verdict"]
-        
-        y_true.append(actual)
-        y_pred.append(predicted)
-        
-        if verbose:
-            print(f"[{index+1}] CMD: {cmd}")
-            print(f" → Predicted: {predicted.upper()} | Actual: {actual.upper()}\n")
-    
-    # Calculate metrics
+    Results are kept per distinct command in an SQLite cache; see eval_cache.py.
+    
+    Returns:
+        tuple: (dataframe, y_true, y_pred, flipped) where flipped lists the rows
+               whose verdict changed since the previous run
+    """
+    df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
+    y_true = df["Label"].map(normalize_label).tolist()
+    
+    with EvalCache(cache_path) as cache:
+        results, counts = evaluate_incremental(df["prompt"], cache)
+    print(f"[*] Incremental evaluation: {counts['computed']} new, {counts['rerun']} rescored, "
+          f"{counts['reused']} reused distinct commands")
+    
+    flipped = flipped_verdicts(results, y_true)
+    return df, y_true, results["verdict"].tolist(), flipped
+
+
+def print_flipped_verdicts(flipped, diff_path=None):
+    """Summarize verdicts that changed since the previous run; optionally save them as CSV."""
+    effects = flipped["effect"].value_counts()
+    print(f"[*] {len(flipped)} verdicts flipped since the previous run "
+          f"({effects.get('fixed', 0)} fixed, {effects.get('broken', 0)} broken, "
+          f"{effects.get('changed', 0)} changed)")
+    for _, row in flipped.head(20).iterrows():
+        print(f"  [{row['effect'].upper()}] {row['previous_verdict']} -> {row['verdict']} "
+              f"(label {row['label']}): {row['command']}")
+    if diff_path:
+        flipped.to_csv(diff_path, index=False)
+        print(f"[+] Flipped verdict report written to {diff_path}")
+
+
+def compute_metrics(y_true, y_pred):
+    """
+    Calculate summary metrics from already computed predictions.
+    
+    Returns:
+        tuple: (accuracy, precision, recall, f1, correct_count, total_count)
+    """
     accuracy = accuracy_score(y_true, y_pred)
     precision = precision_score(y_true, y_pred, average='macro', zero_division=0)
     recall = recall_score(y_true, y_pred, average='macro', zero_division=0)
@@ -54,6 +116,34 @@ def run_evaluation(csv_path, verbose=True):
     return accuracy, precision, recall, f1, correct_count, total_count
 
 
+def print_individual_results(df, y_true, y_pred):
+    """Print each command with its predicted and actual verdict."""
+    print("=== Evaluating MalCommandGuard ===\n")
+    for index, cmd, actual, predicted in zip(df.index, df["prompt"], y_true, y_pred):
+        print(f"[{index+1}] CMD: {cmd}")
+        print(f" → Predicted: {predicted.upper()} | Actual: {actual.upper()}\n")
+
+
+def run_evaluation(csv_path, verbose=True, workers=1):
+    """
+    Main evaluation function that returns metrics and optionally prints detailed results.
+    
+    Args:
+        csv_path: Path to the CSV file
+        verbose: If True, prints individual predictions; if False, only prints summary
+        workers: Number of detection worker processes
+    
+    Returns:
+        tuple: (accuracy, precision, recall, f1, correct_count, total_count)
+    """
+    df, y_true, y_pred = collect_predictions(csv_path, workers=workers)
+    
+    if verbose:
+        print_individual_results(df, y_true, y_pred)
+    
+    return compute_metrics(y_true, y_pred)
+
+
 def print_summary_results(accuracy, precision, recall, f1, correct_count, total_count):
     """Print results in the desired summary format."""
     print(f"✅ Summary: Accuracy = {accuracy:.2%} ({correct_count}/{total_count} correct)")
@@ -74,7 +164,8 @@ def print_detailed_results(csv_path, y_true, y_pred):
     print(confusion_matrix(y_true, y_pred))
 
 
-def evaluate_model(csv_path, show_individual=False, show_detailed=False):
+def evaluate_model(csv_path, show_individual=False, show_detailed=False, workers=1,
+                   cache_path=None, diff_path=None):
     """
     Main evaluation function with flexible output options.
     
@@ -82,28 +173,30 @@ def evaluate_model(csv_path, show_individual=False, show_detailed=False):
         csv_path: Path to the CSV file
         show_individual: If True, shows individual command predictions
         show_detailed: If True, shows classification report and confusion matrix
+        workers: Number of detection worker processes (1 runs serially)
+        cache_path: Reuse and update this per-row result cache (incremental mode)
+        diff_path: With cache_path, write the flipped verdicts to this CSV
     
     Returns:
         dict: Dictionary with all metrics
     """
-    # Run evaluation
-    accuracy, precision, recall, f1, correct, total = run_evaluation(csv_path, verbose=show_individual)
+    # Run detection once; every report below reuses these predictions
+    if cache_path:
+        df, y_true, y_pred, flipped = collect_incremental(csv_path, cache_path)
+        print_flipped_verdicts(flipped, diff_path)
+    else:
+        df, y_true, y_pred = collect_predictions(csv_path, workers=workers)
+    
+    if show_individual:
+        print_individual_results(df, y_true, y_pred)
+    
+    accuracy, precision, recall, f1, correct, total = compute_metrics(y_true, y_pred)
     
     # Always show summary
     print_summary_results(accuracy, precision, recall, f1, correct, total)
     
     # Optionally show detailed metrics
     if show_detailed:
-        # We need to re-run to get y_true and y_pred for detailed output
-        df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
-        y_true, y_pred = [], []
-        
-        for _, row in df.iterrows():
-            actual = normalize_label(row["Label"])
-            predicted = analyze_command(row["prompt"])["verdict"]
-            y_true.append(actual)
-            y_pred.append(predicted)
-        
         print_detailed_results(csv_path, y_true, y_pred)
     
     return {
@@ -116,7 +209,21 @@ def evaluate_model(csv_path, show_individual=False, show_detailed=False):
     }
 
 
-if __name__ == "__main__":
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # python evaluate.py <csv> [--incremental [--cache PATH] [--diff flips.csv]] [--workers N]
+    parser = argparse.ArgumentParser(description="Evaluate detection accuracy on a labeled CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rescore rows affected by config changes since the last run")
+    parser.add_argument("--cache", default=EVAL_CACHE_FILE, help="per-row result cache")
+    parser.add_argument("--diff", help="write verdicts flipped since the last run to this CSV")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--detailed", action="store_true")
+    args = parser.parse_args()
+    evaluate_model(args.csv_path, show_detailed=args.detailed, workers=args.workers,
+                   cache_path=args.cache if args.incremental else None, diff_path=args.diff)
+
+elif __name__ == "__main__":
     # Example usage with different output options:
     
     # Option 1: Just summary (what you want)
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import detector
+from command import parse_command
+from stats import stage_of
+
+# Sketch state of the monitor, reloaded on restart
+FREQUENCY_STATE_FILE = "logs/frequency_state.npz"
+
+# Seconds between checkpoints of the sketch state while monitoring
+CHECKPOINT_INTERVAL = 60.0
+
+# Score added to a behavior verdict, matching the dataset's Frequency (0.2)
+# and History (0.05) weight columns
+FREQUENCY_WEIGHT = 0.2
+HISTORY_WEIGHT = 0.05
+
+# Sliding windows: recent activity is compared against the longer baseline
+SHORT_WINDOW = 60.0
+LONG_WINDOW = 3600.0
+WINDOW_SLOTS = 12
+
+# Count-min sketch size; memory is fixed at slots x depth x width counters per window
+SKETCH_WIDTH = 8192
+SKETCH_DEPTH = 4
+
+# A command bursts when seen this often in the short window and this many
+# times faster than its long-window rate
+BURST_MIN_COUNT = 20
+BURST_RATIO = 5.0
+
+# An executable is rare when seen at most this often in the long window,
+# once at least WARMUP_COMMANDS commands were observed there. Both counts are
+# taken in the same scope: per source when the command has one.
+RARE_MAX_COUNT = 1
+WARMUP_COMMANDS = 500
+
+# Bumped whenever the checkpoint layout or the keys counted change
+STATE_VERSION = 2
+
+
+def sketch_columns(keys, depth, width):
+    """Column of each key in each sketch row (keys x depth), by double hashing a 128-bit digest."""
+    columns = np.empty((len(keys), depth), dtype=np.intp)
+    for k, key in enumerate(keys):
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        columns[k] = [(h1 + i * h2) % width for i in range(depth)]
+    return columns
+
+
+# Sliding Count-Min Sketch: One count-min sketch per time slot in a ring;
+# slots older than the window are cleared as time moves on. Estimates never
+# undercount, and memory does not grow with the number of distinct keys.
+class SlidingCountMin:
+    def __init__(self, window, slots=WINDOW_SLOTS, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.window = window
+        self.slots = slots
+        self.width = width
+        self.depth = depth
+        self.slot_seconds = window / slots
+        self.table = np.zeros((slots, depth, width), dtype=np.uint32)
+        self.totals = np.zeros(slots, dtype=np.int64)
+        self.slot_ids = np.full(slots, -1, dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def advance(self, now):
+        """Move to the slot covering `now`, clearing slots that left the window."""
+        current = int(now // self.slot_seconds)
+        newest = int(self.slot_ids.max())
+        # A clock stepping backwards keeps counting into the newest slot
+        if current <= newest:
+            return newest % self.slots
+
+        stale = (self.slot_ids >= 0) & (self.slot_ids <= current - self.slots)
+        if stale.any():
+            self.table[stale] = 0
+            self.totals[stale] = 0
+            self.slot_ids[stale] = -1
+        position = current % self.slots
+        self.table[position] = 0
+        self.totals[position] = 0
+        self.slot_ids[position] = current
+        return position
+
+    def add(self, position, columns):
+        """Count one occurrence of each key (rows of `columns`) in the given slot."""
+        # add.at, unlike +=, counts keys that share a cell once each
+        np.add.at(self.table[position], (self._rows, columns), 1)
+        self.totals[position] += 1
+
+    def estimate(self, columns):
+        """Upper-bound count of each key over the whole window."""
+        counts = self.table[:, self._rows, columns].sum(axis=0, dtype=np.int64)
+        return counts.min(axis=-1)
+
+    def total(self):
+        return int(self.totals.sum())
+
+
+# Frequency Tracker: Streaming memory of the monitor feed. Every command
+# updates sketches of the command itself and its executable, overall and per
+# source; bursts and rarely seen executables raise the behavior score.
+class FrequencyTracker:
+    def __init__(self, short_window=SHORT_WINDOW, long_window=LONG_WINDOW, slots=WINDOW_SLOTS,
+                 width=SKETCH_WIDTH, depth=SKETCH_DEPTH, started=None):
+        self.short = SlidingCountMin(short_window, slots, width, depth)
+        self.long = SlidingCountMin(long_window, slots, width, depth)
+        self.started = time.time() if started is None else started
+        self._lock = threading.Lock()
+
+    def params(self):
+        return {
+            "short_window": self.short.window,
+            "long_window": self.long.window,
+            "slots": self.short.slots,
+            "width": self.short.width,
+            "depth": self.short.depth,
+        }
+
+    def observe(self, cmd, source=None, now=None):
+        """
+        Count one command and return (score bonus, hit labels).
+
+        Args:
+            cmd: Raw command or ParsedCommand
+            source: Optional origin of the command (log file, host, client)
+            now: Wall-clock time of the observation (defaults to time.time())
+        """
+        command = parse_command(cmd)
+        now = time.time() if now is None else now
+        scopes = [""] if source is None else ["", f"src:{source}\0"]
+        depth, width = self.short.depth, self.short.width
+        # The command itself in every scope, then the executable and a running
+        # total of commands in the narrowest scope, so a quiet source is only
+        # judged on its own history once it has one
+        keys = [f"{scope}cmd:{command.digest}" for scope in scopes]
+        keys.append(f"{scopes[-1]}exe:{command.executable}")
+        keys.append(f"{scopes[-1]}total")
+        columns = sketch_columns(keys, depth, width)
+
+        with self._lock:
+            self.short.add(self.short.advance(now), columns)
+            self.long.add(self.long.advance(now), columns)
+
+            # Rates are compared over the time actually observed, so a fresh
+            # tracker does not see everything as a burst
+            elapsed = max(now - self.started, self.short.slot_seconds)
+            short_span = min(self.short.window, elapsed)
+            long_span = min(self.long.window, elapsed)
+
+            recent = self.short.estimate(columns[:-2])
+            baseline = self.long.estimate(columns)
+            expected = baseline[:-2] * (short_span / long_span)
+            bursting = bool(((recent >= BURST_MIN_COUNT) & (recent >= BURST_RATIO * expected)).any())
+            rare = baseline[-1] >= WARMUP_COMMANDS and baseline[-2] <= RARE_MAX_COUNT
+
+        bonus, labels = 0.0, []
+        if bursting:
+            bonus += FREQUENCY_WEIGHT
+            labels.append("frequency:burst")
+        if rare:
+            bonus += HISTORY_WEIGHT
+            labels.append("history:rare-executable")
+        return bonus, labels
+
+    def apply(self, cmd, result, source=None, engine=None, now=None):
+        """Observe `cmd` and fold the frequency/history bonus into a behavior verdict."""
+        bonus, labels = self.observe(cmd, source, now)
+        # Rule, signature and similarity verdicts are already decisive
+        if not bonus or stage_of(result) != "behavior":
+            return result
+
+        state = (engine or detector.get_engine()).state
+        score, hits = state.keyword_scorer.score(parse_command(cmd))
+        return detector.score_result(score + bonus, hits + labels)
+
+    def save(self, path=FREQUENCY_STATE_FILE):
+        """Checkpoint the sketches; replaces the previous checkpoint atomically."""
+        # Secure Coding: Plain arrays and JSON only, so loading never unpickles
+        with self._lock:
+            meta = json.dumps({"version": STATE_VERSION, "started": self.started, **self.params()})
+            arrays = {
+                "short_table": self.short.table.copy(), "short_totals": self.short.totals.copy(),
+                "short_slots": self.short.slot_ids.copy(),
+                "long_table": self.long.table.copy(), "long_totals": self.long.totals.copy(),
+                "long_slots": self.long.slot_ids.copy(),
+            }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, meta=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=FREQUENCY_STATE_FILE, **params):
+        """Restore a checkpoint; raises ValueError if it was written with other parameters."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            tracker = cls(started=meta.get("started"), **params)
+            if meta.get("version") != STATE_VERSION or any(
+                    meta.get(name) != value for name, value in tracker.params().items()):
+                raise ValueError(f"frequency state {path} was written with other sketch parameters")
+            for name, window in (("short", tracker.short), ("long", tracker.long)):
+                window.table[...] = data[f"{name}_table"]
+                window.totals[...] = data[f"{name}_totals"]
+                window.slot_ids[...] = data[f"{name}_slots"]
+        return tracker
+
+
+def load_tracker(path=FREQUENCY_STATE_FILE, **params):
+    """Resume from the checkpoint at `path` if usable, else start empty."""
+    if os.path.exists(path):
+        try:
+            return FrequencyTracker.load(path, **params)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[!] Ignoring frequency state {path}: {e}")
+    return FrequencyTracker(**params)
+
+
+def start_periodic_checkpoint(tracker, interval, path=FREQUENCY_STATE_FILE):
+    """Save `tracker` to `path` every `interval` seconds; returns a stop Event."""
+    stop = threading.Event()
+
+    def checkpoint():
+        while not stop.wait(interval):
+            try:
+                tracker.save(path)
+            except OSError as e:
+                print(f"[ERROR] Could not checkpoint frequency state to {path}: {e}")
+
+    threading.Thread(target=checkpoint, name="frequency-checkpoint", daemon=True).start()
+    return stop
@@ -1,15 +1,17 @@
 
 import sys
 import os
-from main import run_interactive_mode, run_csv_simulation
-from monitor import monitor_file
-from logviewer import display_logs, load_logs, filter_logs
-from evaluate import run_evaluation
+from dispatch import flush_dispatch
+
+# Each mode imports its modules when chosen, so the menu comes up without
+# loading pandas, numpy or scikit-learn
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def pause_and_return():
+    # Alerts still queued for the console or alerts.log arrive before the menu returns
+    flush_dispatch()
     input("\n[Press Enter to return to the main menu...]")
     clear_screen()
 
@@ -28,26 +30,29 @@ def launcher_menu():
         choice = input("Choose an option: ").strip()
 
         if choice == "1":
+            from main import run_interactive_mode
             run_interactive_mode()
             pause_and_return()
         elif choice == "2":
+            from main import run_csv_simulation
             run_csv_simulation("data/cmd_huge_known_commented_updated.csv")
             pause_and_return()
         elif choice == "3":
+            from monitor import monitor_file
             try:
                 monitor_file()
             except KeyboardInterrupt:
                 print("\n[!] Monitoring stopped by user.")
             pause_and_return()
         elif choice == "4":
+            from evaluate import run_evaluation
             run_evaluation("data/cmd_huge_known_commented_updated.csv")
             pause_and_return()
         elif choice == "5":
-            logs = load_logs()
+            from logviewer import display_logs, query_logs
             verdict = input("Filter by verdict (malicious/suspicious/legitimate) or leave blank: ").strip().lower()
             verdict = verdict if verdict in ["malicious", "suspicious", "legitimate"] else None
-            filtered = filter_logs(logs, verdict)
-            display_logs(filtered)
+            display_logs(query_logs(verdict=verdict))
             pause_and_return()
         elif choice == "6":
             print("Exiting MalCommandGuard. Goodbye!")
@@ -1,24 +1,235 @@
+import atexit
+import gzip
 import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
 
 # Set path for the log file
 LOG_FILE = "logs/alerts.log"
 
+# Buffered writing: flush after this many entries or this many seconds
+FLUSH_BATCH = 256
+FLUSH_INTERVAL = 0.2
+
+# Seconds between liveness checks of the writer thread while flush() waits
+FLUSH_POLL = 0.1
+
+# Rotation: roll over past MAX_BYTES (and/or every ROTATE_INTERVAL seconds),
+# keeping BACKUP_COUNT old segments, optionally gzip-compressed
+MAX_BYTES = 10 * 1024 * 1024
+ROTATE_INTERVAL = None
+BACKUP_COUNT = 5
+COMPRESS_ROTATED = False
+
 # Secure Coding: Ensure log directory exists to avoid file write errors
 os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
-# Function: Logs alerts to alerts.log when a command is flagged
-def log_alert(cmd, result):
+
+# Function: Formats one alert line exactly as it will appear in alerts.log
+# (at `created`, a time.time() value, when the alert was raised earlier)
+def format_entry(cmd, result, created=None):
     verdict = result.get("verdict", "unknown")
     reason = result.get("reason", "No reason provided")
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    moment = datetime.now() if created is None else datetime.fromtimestamp(created)
+    timestamp = moment.strftime("%Y-%m-%d %H:%M:%S")
 
     # Secure Coding: Truncate overly long commands to prevent log overflow or injection
     safe_cmd = cmd if len(cmd) <= 200 else cmd[:200] + "...[TRUNCATED]"
 
     # Format the log entry
-    log_entry = f"[{timestamp}] [{verdict.upper()}] Command: {safe_cmd} | Reason: {reason}\n"
+    return f"[{timestamp}] [{verdict.upper()}] Command: {safe_cmd} | Reason: {reason}\n"
+
+
+# Alert Writer: Entries are queued by the detection thread and written by a
+# background thread that keeps the file open, batches writes and rotates.
+class AlertWriter:
+    def __init__(self, path=LOG_FILE, flush_batch=FLUSH_BATCH, flush_interval=FLUSH_INTERVAL,
+                 max_bytes=MAX_BYTES, rotate_interval=ROTATE_INTERVAL,
+                 backup_count=BACKUP_COUNT, compress=COMPRESS_ROTATED, max_queue=100000):
+        self.path = path
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+
+        # Bounded so a stuck disk applies backpressure instead of eating memory;
+        # put() blocks rather than dropping, so no alert is ever lost
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._inode = None
+        self._opened_at = 0.0
+        self._closed = False
+        # Held across the closed check and the put, so nothing lands behind the
+        # shutdown sentinel; the writer thread never takes it, so a full queue still drains
+        self._close_lock = threading.Lock()
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="alert-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, entry):
+        """Queue one entry; returns False (and drops it) once the writer is closed."""
+        with self._close_lock:
+            if self._closed:
+                # e.g. a late alert from a daemon thread after the atexit close
+                self.dropped += 1
+                return False
+            self._queue.put(entry)
+            return True
+
+    def flush(self, timeout=None):
+        """Block until every entry queued so far is on disk; False if not done within `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        with self._close_lock:
+            closed = self._closed
+            if not closed:
+                try:
+                    self._queue.put(done, timeout=timeout)
+                except queue.Full:
+                    return False
+        if closed:
+            # close() writes everything queued before it; just wait for that
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+
+        # Wait in slices so a writer thread that died on an error does not hang us
+        while not done.wait(FLUSH_POLL):
+            if not self._thread.is_alive():
+                return done.is_set()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def close(self):
+        """Flush remaining entries and stop the writer thread."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Secure Coding: Append mode never overwrites existing alerts
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._opened_at = time.monotonic()
+
+    def _ensure_open(self):
+        if self._file is not None:
+            try:
+                # Reopen if the log was deleted or moved aside by someone else
+                if os.stat(self.path).st_ino == self._inode:
+                    return
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._open()
+
+    def _backup_name(self, index):
+        name = f"{self.path}.{index}"
+        return name + ".gz" if self.compress else name
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        for index in range(self.backup_count - 1, 0, -1):
+            src = self._backup_name(index)
+            if os.path.exists(src):
+                os.replace(src, self._backup_name(index + 1))
+
+        if self.backup_count > 0:
+            if self.compress:
+                with open(self.path, "rb") as src, gzip.open(self._backup_name(1), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup_name(1))
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _should_rotate(self, pending_bytes):
+        if self.rotate_interval and time.monotonic() - self._opened_at >= self.rotate_interval:
+            return self._file.tell() > 0
+        if self.max_bytes and self._file.tell() > 0:
+            return self._file.tell() + pending_bytes > self.max_bytes
+        return False
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        data = "".join(batch)
+        self._ensure_open()
+        if self._should_rotate(len(data.encode("utf-8"))):
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False   # flush interval elapsed
+
+            if isinstance(item, str):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.flush_batch:
+                    continue
+
+            # Size threshold, time threshold, explicit flush or shutdown
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                print(f"[ERROR] Could not write alerts to {self.path}: {e}")
+            batch = []
+            deadline = None
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+
+# Default writer shared by log_alert, started on first use
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AlertWriter()
+                # No alerts may be lost on a clean exit
+                atexit.register(_writer.close)
+    return _writer
+
+
+# Function: Logs alerts to alerts.log when a command is flagged
+def log_alert(cmd, result):
+    # Formatted now so the timestamp is the detection time, written in the background
+    get_writer().write(format_entry(cmd, result))
+
 
-    # Secure Coding: Use safe file writing with 'with open' block to ensure file is properly closed
-    with open(LOG_FILE, "a") as f:
-        f.write(log_entry)
+def flush_alerts(timeout=None):
+    """Block (up to `timeout` seconds) until all queued alerts are written to alerts.log."""
+    if _writer is not None:
+        return _writer.flush(timeout)
+    return True
@@ -1,33 +1,289 @@
+import hashlib
+import json
 import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
 
 LOG_FILE = "logs/alerts.log"
 
-def load_logs():
-    if not os.path.exists(LOG_FILE):
+# Sidecar index files live next to the log: <log>.idx plus one offset list per verdict
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 2
+
+# Compact record: one tuple per alert instead of one dict per line
+LogRecord = namedtuple("LogRecord", ["offset", "timestamp", "verdict", "details"])
+
+# Secure Coding: Only plain verdict names may become part of an index file name
+SAFE_VERDICT = re.compile(r"^[a-z]{1,32}$")
+
+
+def parse_line(line, offset=0):
+    """Parse one alerts.log line into a LogRecord, or None if malformed."""
+    parts = line.strip().split("] ")
+    if len(parts) < 3:
+        return None
+    timestamp = parts[0].strip("[")
+    verdict = parts[1].strip("[").lower()
+    details = "] ".join(parts[2:])
+    return LogRecord(offset, timestamp, verdict, details)
+
+
+def iter_logs(path=LOG_FILE, start=0, end=None):
+    """Stream records between two byte offsets without loading the whole file."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            if end is not None and offset >= end:
+                break
+            # A line still being written has no newline yet; leave it for next time
+            if not raw.endswith(b"\n"):
+                break
+            record = parse_line(raw.decode("utf-8", errors="replace"), offset)
+            if record:
+                yield record
+            offset += len(raw)
+
+
+def _bucket_key(timestamp):
+    # "YYYY-MM-DD HH": alerts are grouped per hour for time-range lookups
+    return timestamp[:13]
+
+
+# Log Index: byte offsets of each hour bucket and of every alert per verdict.
+# Refreshing only scans bytes appended since the last refresh; the index is
+# rebuilt when the log is rotated, replaced or truncated.
+class LogIndex:
+    def __init__(self, path=LOG_FILE):
+        self.path = path
+        self.meta_path = path + INDEX_SUFFIX
+        self.buckets = []          # [(hour key, first offset)] in file order
+        self.offsets = {}          # verdict -> array('Q') of line offsets
+        self.indexed_size = 0
+        self.inode = None
+        self.head = None
+        # False once a bucket starts earlier than the one before it (clock set back)
+        self.ordered = True
+
+    def _offsets_path(self, verdict):
+        return f"{self.meta_path}.{verdict}"
+
+    def _head_hash(self, f):
+        f.seek(0)
+        return hashlib.sha256(f.readline()).hexdigest()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                return False
+            offsets = {}
+            for verdict, count in meta["counts"].items():
+                if not SAFE_VERDICT.match(verdict):
+                    return False
+                values = array("Q")
+                with open(self._offsets_path(verdict), "rb") as f:
+                    values.fromfile(f, count)
+                offsets[verdict] = values
+        except (OSError, ValueError, KeyError, EOFError):
+            return False
+
+        self.buckets = [tuple(b) for b in meta["buckets"]]
+        self.offsets = offsets
+        self.indexed_size = meta["indexed_size"]
+        self.inode = meta["inode"]
+        self.head = meta["head"]
+        self.ordered = meta["ordered"]
+        return True
+
+    def _save(self, appended):
+        # Offset lists are append-only; the metadata records how many entries are
+        # valid. Anything past that (left by a save that died before writing the
+        # metadata) is cut off first, so the new entries land right after the valid ones.
+        for verdict, values in appended.items():
+            offsets_path = self._offsets_path(verdict)
+            valid = (len(self.offsets[verdict]) - len(values)) * values.itemsize
+            size = os.path.getsize(offsets_path) if os.path.exists(offsets_path) else 0
+            if size < valid:
+                # Shorter than the metadata says: rewrite the whole list
+                with open(offsets_path, "wb") as f:
+                    self.offsets[verdict].tofile(f)
+                continue
+            with open(offsets_path, "r+b" if size else "wb") as f:
+                f.truncate(valid)
+                f.seek(valid)
+                values.tofile(f)
+        meta = {
+            "version": INDEX_VERSION,
+            "inode": self.inode,
+            "head": self.head,
+            "indexed_size": self.indexed_size,
+            "buckets": self.buckets,
+            "ordered": self.ordered,
+            "counts": {verdict: len(values) for verdict, values in self.offsets.items()},
+        }
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _reset(self, inode, head):
+        prefix = os.path.basename(self.meta_path) + "."
+        directory = os.path.dirname(self.meta_path) or "."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and SAFE_VERDICT.match(name[len(prefix):]):
+                os.remove(os.path.join(directory, name))
+        self.buckets = []
+        self.offsets = {}
+        self.indexed_size = 0
+        self.inode = inode
+        self.head = head
+        self.ordered = True
+
+    def refresh(self):
+        """Bring the index up to date with the log; returns number of new records."""
+        if not os.path.exists(self.path):
+            return 0
+        if self.inode is None:
+            self._load()
+
+        appended = {}
+        added = 0
+        last_bucket = self.buckets[-1][0] if self.buckets else None
+
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            head = self._head_hash(f)
+            if st.st_ino != self.inode or st.st_size < self.indexed_size or head != self.head:
+                # Rotated, replaced or truncated: index the new file from scratch
+                self._reset(st.st_ino, head)
+            if st.st_size == self.indexed_size:
+                return 0
+
+            # Only scan what was appended since the last refresh
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            for raw in f:
+                # A line still being written is left for the next refresh
+                if not raw.endswith(b"\n"):
+                    break
+                record = parse_line(raw.decode("utf-8", errors="replace"), offset)
+                offset += len(raw)
+                if record is None:
+                    continue
+                verdict = record.verdict if SAFE_VERDICT.match(record.verdict) else "other"
+                self.offsets.setdefault(verdict, array("Q")).append(record.offset)
+                appended.setdefault(verdict, array("Q")).append(record.offset)
+                key = _bucket_key(record.timestamp)
+                if key != last_bucket:
+                    if last_bucket is not None and key < last_bucket:
+                        self.ordered = False
+                    self.buckets.append((key, record.offset))
+                    last_bucket = key
+                added += 1
+
+        self.indexed_size = offset
+        self._save(appended)
+        return added
+
+    def byte_range(self, start=None, end=None):
+        """
+        Map a timestamp range onto the byte range of the matching hour buckets.
+
+        The bisection assumes timestamps never decrease through the log. If they
+        did (e.g. the clock was set back), the whole log is returned for a scan.
+        """
+        keys = [key for key, _ in self.buckets]
+        lo = 0
+        hi = self.indexed_size
+        if not self.ordered:
+            return lo, hi
+        if start:
+            i = bisect_left(keys, _bucket_key(start))
+            lo = self.buckets[i][1] if i < len(keys) else self.indexed_size
+        if end:
+            # `end` is an inclusive prefix: stop at the first bucket past every
+            # key it covers, whether it names an hour, a day or less
+            i = bisect_right(keys, _bucket_key(end) + "\uffff")
+            hi = self.buckets[i][1] if i < len(keys) else self.indexed_size
+        return lo, hi
+
+
+def _read_at(f, offset):
+    f.seek(offset)
+    return parse_line(f.readline().decode("utf-8", errors="replace"), offset)
+
+
+def query_logs(start=None, end=None, verdict=None, tail=None, path=LOG_FILE):
+    """
+    Return alerts matching a time range, verdict and/or the last N entries.
+
+    Args:
+        start, end: Inclusive "YYYY-MM-DD HH:MM:SS" bounds (prefixes are fine)
+        verdict: Exact verdict name, e.g. "malicious"
+        tail: Only the newest N matching alerts
+
+    Returns:
+        list: LogRecord tuples in file order
+    """
+    if not os.path.exists(path):
         print("[!] No logs found.")
         return []
 
-    with open(LOG_FILE, "r") as f:
-        lines = f.readlines()
-
-    logs = []
-    for line in lines:
-        parts = line.strip().split("] ")
-        if len(parts) >= 3:
-            timestamp = parts[0].strip("[")
-            verdict = parts[1].strip("[").lower()
-            details = "] ".join(parts[2:])
-            logs.append({
-                "timestamp": timestamp,
-                "verdict": verdict,
-                "details": details
-            })
+    index = LogIndex(path)
+    index.refresh()
+    lo, hi = index.byte_range(start, end)
 
-    return logs
+    def in_time_range(record):
+        if start and record.timestamp < start:
+            return False
+        if end and record.timestamp[:len(end)] > end:
+            return False
+        return True
+
+    if verdict is None and not tail:
+        return [r for r in iter_logs(path, lo, hi) if in_time_range(r)]
+
+    # Candidate offsets from the per-verdict lists, restricted to the byte range
+    if verdict is not None:
+        lists = [index.offsets.get(verdict.lower(), array("Q"))]
+    else:
+        lists = list(index.offsets.values())
+    candidates = []
+    for values in lists:
+        i, j = bisect_left(values, lo), bisect_left(values, hi)
+        # With tail, the newest entries of each list are enough to pick from
+        if tail and not start and not end:
+            i = max(i, j - tail)
+        candidates.extend(values[i:j])
+    candidates.sort()
+
+    records = []
+    with open(path, "rb") as f:
+        # Walk backwards when only the newest N are wanted
+        for offset in (reversed(candidates) if tail else candidates):
+            record = _read_at(f, offset)
+            if record and in_time_range(record):
+                records.append(record)
+                if tail and len(records) >= tail:
+                    break
+    return records[::-1] if tail else records
+
+
+def load_logs():
+    if not os.path.exists(LOG_FILE):
+        print("[!] No logs found.")
+        return []
+    return list(iter_logs(LOG_FILE))
 
 def filter_logs(logs, verdict_filter=None):
     if verdict_filter:
-        logs = [log for log in logs if verdict_filter in log["verdict"]]
+        logs = [log for log in logs if verdict_filter in log.verdict]
     return logs
 
 def display_logs(logs):
@@ -37,22 +293,23 @@ def display_logs(logs):
 
     for log in logs:
         print("=" * 60)
-        print(f"[Time]   {log['timestamp']}")
-        print(f"[Verdict] {log['verdict'].upper()}")
-        print(f"[Details] {log['details']}")
+        print(f"[Time]   {log.timestamp}")
+        print(f"[Verdict] {log.verdict.upper()}")
+        print(f"[Details] {log.details}")
     print("=" * 60)
     print(f"[Total Alerts Shown: {len(logs)}]")
 
 def main():
-    logs = load_logs()
-
     verdict_filter = input("Filter by verdict? (malicious/suspicious/legitimate or leave blank): ").strip().lower()
     if verdict_filter not in ("malicious", "suspicious", "legitimate", ""):
         print("[!] Invalid filter. Showing all logs.")
-        verdict_filter = None
+        verdict_filter = ""
+
+    tail = input("Show only the latest N alerts? (number or leave blank): ").strip()
+    # Secure Coding: Only accept a positive integer for N
+    tail = int(tail) if tail.isdigit() and int(tail) > 0 else None
 
-    filtered_logs = filter_logs(logs, verdict_filter)
-    display_logs(filtered_logs)
+    display_logs(query_logs(verdict=verdict_filter or None, tail=tail))
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,6 @@
-import pandas as pd
+import time
 from detector import analyze_command
-from alerter import send_alert
-from logger import log_alert
+from dispatch import dispatch_alert, flush_dispatch
 
 # Function: Manual mode where user types one command at a time
 def run_interactive_mode():
@@ -23,8 +22,10 @@ def run_interactive_mode():
 
             # Sends alert and logs if not legitimate
             if result['verdict'] != 'legitimate':
-                send_alert(cmd, result)
-                log_alert(cmd, result)
+                dispatch_alert(cmd, result)
+                # Show the alert before prompting for the next command; slower
+                # sinks (file, webhook, ...) keep delivering in the background
+                flush_dispatch(sinks=("console",))
 
         except KeyboardInterrupt:
             print("\n[!] Exiting MalCommandGuard.")
@@ -35,27 +36,96 @@ def run_interactive_mode():
             print(f"[ERROR] {str(e)}")
 
 
-# Function: Reads a CSV of labeled commands to simulate scanning
-def run_csv_simulation(csv_path):
-    # Secure Coding: Drop rows with missing values to prevent exceptions
-    df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
-    print(f"Loaded {len(df)} commands from dataset...\n")
+# Streaming replay: rows analyzed per batch, and seconds between progress lines
+REPLAY_CHUNK_SIZE = 50000
+PROGRESS_INTERVAL = 2.0
 
-    for index, row in df.iterrows():
-        cmd = row['prompt']
-        actual = row['Label']
+# Columns written to a replay output file
+REPLAY_COLUMNS = ["command", "label", "verdict", "reason", "stage", "score"]
 
-        # Run the detection engine on each command
-        result = analyze_command(cmd)
-        predicted = result['verdict']
 
-        print(f">> {cmd}")
-        print(f"[PREDICTED] {predicted.upper()} | [ACTUAL] {actual.upper()}")
-        print(f"[REASON] {result['reason']}\n")
+def iter_labeled_chunks(csv_path, chunk_size=REPLAY_CHUNK_SIZE):
+    """Yield the prompt/Label columns of a CSV chunk by chunk, without missing rows."""
+    # pandas is only loaded by the replay modes, keeping manual mode quick to start
+    import pandas as pd
 
-        if predicted != "legitimate":
-            send_alert(cmd, result)
-            log_alert(cmd, result)
+    for chunk in pd.read_csv(csv_path, usecols=["prompt", "Label"], chunksize=chunk_size):
+        # Secure Coding: Drop rows with missing values to prevent exceptions
+        chunk = chunk.dropna(subset=["prompt", "Label"])
+        if len(chunk):
+            yield chunk
+
+
+def write_results(results, output, fmt, header):
+    if fmt == "jsonl":
+        data = results.to_json(orient="records", lines=True, force_ascii=False)
+        # Older pandas omits the newline after the last record of each chunk
+        output.write(data if data.endswith("\n") else data + "\n")
+    else:
+        results.to_csv(output, index=False, header=header)
+
+
+# Function: Reads a CSV of labeled commands to simulate scanning. The file is
+# streamed in chunks, each analyzed as one batch, so memory stays constant.
+def run_csv_simulation(csv_path, output_path=None, quiet=False, chunk_size=REPLAY_CHUNK_SIZE,
+                       progress_interval=PROGRESS_INTERVAL):
+    """
+    Replay a labeled CSV through the detector.
+
+    Args:
+        output_path: Optional .csv or .jsonl file receiving one verdict per row
+        quiet: Skip per-command output and alert banners; only print progress
+    """
+    from batch import analyze_commands
+
+    fmt = "jsonl" if output_path and output_path.endswith(".jsonl") else "csv"
+    output = open(output_path, "w", encoding="utf-8", newline="") if output_path else None
+    print(f"Replaying commands from {csv_path}...\n")
+
+    rows = 0
+    counts = {}
+    start = last_progress = time.monotonic()
+    try:
+        for chunk in iter_labeled_chunks(csv_path, chunk_size):
+            results = analyze_commands(chunk["prompt"])
+            for verdict, count in results["verdict"].value_counts().items():
+                counts[verdict] = counts.get(verdict, 0) + int(count)
+
+            if quiet:
+                # Only flagged rows are still alerted on; nothing goes to the console
+                flagged = results[results["verdict"] != "legitimate"]
+                for result in flagged[["command", "verdict", "reason"]].to_dict("records"):
+                    dispatch_alert(result["command"], result, skip=("console",))
+            else:
+                for cmd, actual, result in zip(chunk["prompt"], chunk["Label"], results.to_dict("records")):
+                    predicted = result["verdict"]
+
+                    print(f">> {cmd}")
+                    print(f"[PREDICTED] {predicted.upper()} | [ACTUAL] {actual.upper()}")
+                    print(f"[REASON] {result['reason']}\n")
+
+                    if predicted != "legitimate":
+                        dispatch_alert(cmd, result)
+
+            if output is not None:
+                results.insert(1, "label", chunk["Label"].to_numpy())
+                write_results(results[REPLAY_COLUMNS], output, fmt, header=rows == 0)
+
+            rows += len(chunk)
+            now = time.monotonic()
+            if quiet and now - last_progress >= progress_interval:
+                last_progress = now
+                print(f"[*] {rows:,} rows | {rows / (now - start):,.0f} rows/s | {counts}")
+    finally:
+        if output is not None:
+            output.close()
+        # Alerts are delivered in the background; let them land before the summary
+        flush_dispatch()
+
+    elapsed = time.monotonic() - start
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"[+] Replayed {rows:,} commands in {elapsed:.1f}s ({rate:,.0f} rows/s) | {counts}")
+    return rows, counts
 
 
 # Entry point: decides which mode to run (CSV simulation or manual)
@@ -63,6 +133,13 @@ if __name__ == "__main__":
     import sys
     # Secure Coding: Checks for command-line argument presence to avoid index error
     if len(sys.argv) > 1 and sys.argv[1] == "csv":
-        run_csv_simulation("data/cmd_huge_known_commented_updated.csv")
+        import argparse
+        parser = argparse.ArgumentParser(prog="main.py csv", description="Replay a labeled CSV")
+        parser.add_argument("csv_path", nargs="?", default="data/cmd_huge_known_commented_updated.csv")
+        parser.add_argument("--output", help="write verdicts to this .csv or .jsonl file")
+        parser.add_argument("--quiet", action="store_true", help="only print progress lines")
+        parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+        args = parser.parse_args(sys.argv[2:])
+        run_csv_simulation(args.csv_path, args.output, args.quiet, max(args.chunk_size, 1))
     else:
         run_interactive_mode()
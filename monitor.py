@@ -1,47 +1,177 @@
-import time
 import os
-from detector import analyze_command
-from alerter import send_alert
-from logger import log_alert
+import sys
+from collections import Counter
+from detector import analyze_command, get_engine
+from dispatch import dispatch_alert, dispatch_metrics
+from tailer import LogTailer
+from stats import stage_of, start_periodic_dump, write_snapshot
+from pipeline import DetectionPipeline
+from frequency import (load_tracker, start_periodic_checkpoint, FREQUENCY_STATE_FILE,
+                       CHECKPOINT_INTERVAL)
 
 # Path to the simulated live command log
 LOG_SOURCE = "live_commands.log"
 
+# Where the monitor remembers how far it has read, so restarts resume in place
+OFFSET_FILE = "logs/monitor_offset.json"
+
+# Optional periodic dump of detector timings/hit counters (None disables it)
+STATS_FILE = "logs/detector_stats.json"
+STATS_INTERVAL = None
+
+# Stateful frequency/history scoring of the feed, checkpointed across restarts
+# to FREQUENCY_STATE_FILE. Opt-in: it changes verdicts and writes state.
+FREQUENCY_ENABLED = False
+
+
+# Function: Analyzes one command from the feed, then prints, alerts and logs it.
+# With a FrequencyTracker, bursts and rarely seen executables add to the behavior score.
+def handle_command(cmd, frequency=None, source=None):
+    result = analyze_command(cmd)
+    if frequency is not None:
+        result = frequency.apply(cmd, result, source)
+    report_verdict(cmd, result)
+    return result
+
+
+# Function: Prints a verdict, and alerts and logs it if the command is not safe
+def report_verdict(cmd, result):
+    print(f">> {cmd}")
+    print(f"[Verdict] {result['verdict'].upper()} | [Reason] {result['reason']}\n")
+
+    # Log and alert if command is not safe; sinks deliver in the background
+    if result['verdict'] != "legitimate":
+        dispatch_alert(cmd, result)
+
+
 # Function: Continuously watches the live_commands.log file for new entries
-def monitor_file():
-    print(f"Monitoring {LOG_SOURCE} for new commands...\n")
+def monitor_file(log_source=LOG_SOURCE, offset_file=OFFSET_FILE, ready=None,
+                 stats_interval=STATS_INTERVAL, stats_file=STATS_FILE, workers=1,
+                 frequency_file=None):
+    print(f"Monitoring {log_source} for new commands...\n")
 
     # Secure Coding: Ensure the log source file exists before reading
-    if not os.path.exists(LOG_SOURCE):
-        raise FileNotFoundError(f"[SECURITY] Required log file not found: {LOG_SOURCE}")
+    if not os.path.exists(log_source):
+        raise FileNotFoundError(f"[SECURITY] Required log file not found: {log_source}")
+
+    # Sketches are restored from the last checkpoint and saved periodically
+    frequency = stop_checkpoint = None
+    if frequency_file is None and FREQUENCY_ENABLED:
+        frequency_file = FREQUENCY_STATE_FILE
+    if frequency_file:
+        frequency = load_tracker(frequency_file)
+        stop_checkpoint = start_periodic_checkpoint(frequency, CHECKPOINT_INTERVAL, frequency_file)
+
+    try:
+        if workers > 1:
+            return monitor_pipeline(log_source, offset_file, ready, workers, frequency,
+                                    stats_interval, stats_file)
+        return monitor_serial(log_source, offset_file, ready, stats_interval, stats_file, frequency)
+    finally:
+        if frequency is not None:
+            stop_checkpoint.set()
+            frequency.save(frequency_file)
+
+
+# Function: Tails the feed and analyzes it in this process
+def monitor_serial(log_source=LOG_SOURCE, offset_file=OFFSET_FILE, ready=None,
+                   stats_interval=STATS_INTERVAL, stats_file=STATS_FILE, frequency=None):
+
+    # Pick up rule/signature/keyword edits without restarting and losing our place
+    engine = get_engine()
+    engine.start_watcher()
+
+    # Snapshot where detection time goes (and how alert sinks keep up) every stats_interval seconds
+    def snapshot():
+        return {**engine.stats_snapshot(), "alert_sinks": dispatch_metrics()}
+
+    stop_stats = None
+    stats_were_enabled = engine.stats.enabled
+    if stats_interval:
+        # Stats are opt-in; collect them for as long as they are dumped
+        engine.stats.enabled = True
+        stop_stats = start_periodic_dump(snapshot, stats_interval, stats_file)
+
+    # Tail the file: resume from the saved offset, or jump to the end on first run.
+    # The tailer sleeps on inotify (polling elsewhere) and returns whole batches.
+    try:
+        with LogTailer(log_source, offset_file=offset_file) as tailer:
+            if ready is not None:
+                ready.set()
+
+            for lines in tailer.follow():
+                for line in lines:
+                    cmd = line.strip()
+                    if not cmd:
+                        continue
+                    handle_command(cmd, frequency, log_source)
+                # Saved only now, so a crash mid-batch rereads the unhandled lines
+                tailer.commit()
+    finally:
+        if stop_stats is not None:
+            stop_stats.set()
+            try:
+                # Final snapshot so a stopped monitor still leaves its numbers behind
+                write_snapshot(snapshot(), stats_file)
+            finally:
+                # The shared engine goes back to what it was before the monitor ran
+                engine.stats.enabled = stats_were_enabled
 
-    # Open the file in read mode and jump to the end
-    with open(LOG_SOURCE, "r") as f:
-        f.seek(0, 2)  # Move to end of file for tail-like behavior
+# Function: Same feed as monitor_file, analyzed by a pool of worker processes.
+# Verdicts, alerts and log records still come out in the original order.
+def monitor_pipeline(log_source=LOG_SOURCE, offset_file=OFFSET_FILE, ready=None, workers=None,
+                     frequency=None, stats_interval=STATS_INTERVAL, stats_file=STATS_FILE):
+    # Engine timings live in the worker processes, so the stats dump here holds
+    # what the writer sees: verdicts and deciding stages of emitted commands
+    verdicts = Counter()
+    final_stage = Counter()
+    pipeline = None
 
-        while True:
-            # Read new lines one at a time
-            line = f.readline()
+    def snapshot():
+        return {
+            "workers": workers,
+            "emitted": pipeline.emitted if pipeline is not None else 0,
+            "final_stage": dict(final_stage),
+            "verdicts": dict(verdicts),
+            "alert_sinks": dispatch_metrics(),
+        }
 
-            if not line:
-                time.sleep(1)  # Pause briefly to avoid CPU overuse
-                continue
+    # Frequency state depends on order, so it is applied by the ordered writer
+    def on_verdict(cmd, result):
+        if frequency is not None:
+            result = frequency.apply(cmd, result, log_source)
+        if stats_interval:
+            verdicts[result["verdict"]] += 1
+            final_stage[stage_of(result)] += 1
+        report_verdict(cmd, result)
 
-            cmd = line.strip()
-            if not cmd:
-                continue
+    stop_stats = None
+    if stats_interval:
+        stop_stats = start_periodic_dump(snapshot, stats_interval, stats_file)
 
-            # Analyze the new command
-            result = analyze_command(cmd)
+    # Each worker process loads the config and reloads it on change by itself
+    try:
+        with LogTailer(log_source, offset_file=offset_file) as tailer:
+            with DetectionPipeline(on_verdict, workers=workers) as pipeline:
+                if ready is not None:
+                    ready.set()
 
-            print(f">> {cmd}")
-            print(f"[Verdict] {result['verdict'].upper()} | [Reason] {result['reason']}\n")
+                # A crashed worker sets `failed`, which ends the loop; leaving the
+                # `with` block then raises PipelineError here
+                for lines in tailer.follow(stop=pipeline.failed):
+                    cmds = [cmd for cmd in (line.strip() for line in lines) if cmd]
+                    # The writer commits the offset once these verdicts are out
+                    position = tailer.position
+                    pipeline.submit(cmds, on_done=lambda position=position: tailer.commit(position))
+    finally:
+        if stop_stats is not None:
+            stop_stats.set()
+            write_snapshot(snapshot(), stats_file)
 
-            # Log and alert if command is not safe
-            if result['verdict'] != "legitimate":
-                send_alert(cmd, result)
-                log_alert(cmd, result)
 
-# Entry point to start monitoring
+# Entry point to start monitoring: python monitor.py [workers] [--frequency]
 if __name__ == "__main__":
-    monitor_file()
+    # Secure Coding: Only accept a positive worker count
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1
+    frequency_file = FREQUENCY_STATE_FILE if "--frequency" in sys.argv[1:] else None
+    monitor_file(workers=max(workers, 1), frequency_file=frequency_file)
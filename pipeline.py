@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from detector import analyze_command, get_engine
+
+# Commands per task sent to a worker process
+BATCH_SIZE = 500
+
+# Batches submitted but not yet emitted, per worker; bounds memory and makes
+# the reader wait when detection falls behind
+IN_FLIGHT_PER_WORKER = 4
+
+# Seconds between checks for a failed pipeline while the reader is blocked
+FAILURE_CHECK_INTERVAL = 0.2
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+def analyze_chunk(cmds):
+    """Worker entry point: analyze one batch with this process's engine."""
+    return [analyze_command(cmd) for cmd in cmds]
+
+
+def _init_worker():
+    # Load and compile the config once per process, before the first batch
+    get_engine()
+
+
+# Detection Pipeline: The caller is the reader stage and submits batches of
+# commands; a pool of worker processes analyzes them in parallel; a single
+# writer thread hands the verdicts to on_verdict strictly in input order.
+class DetectionPipeline:
+    def __init__(self, on_verdict, workers=None, batch_size=BATCH_SIZE, max_in_flight=None,
+                 worker=analyze_chunk, mp_context="spawn"):
+        self.on_verdict = on_verdict
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.worker = worker
+        self.emitted = 0
+        self.error = None
+        # Set once a worker or the writer has failed; readers should stop
+        self.failed = threading.Event()
+
+        # Secure Coding: spawn starts clean workers instead of forking our threads and locks
+        context = multiprocessing.get_context(mp_context)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                         initializer=_init_worker)
+        self._pending = queue.Queue(maxsize=max_in_flight or self.workers * IN_FLIGHT_PER_WORKER)
+        self._writer = threading.Thread(target=self._write, name="pipeline-writer", daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On an exception in the reader, drop pending work instead of finishing it
+        self.close(cancel=exc_type is not None)
+
+    def submit(self, cmds, on_done=None):
+        """
+        Queue commands for detection; blocks while too many batches are in flight.
+
+        `on_done()` is called by the writer once every verdict of these commands
+        (and of all earlier ones) has been handed to on_verdict, e.g. to commit a
+        tailer offset. It is not called if the pipeline fails first.
+        """
+        starts = range(0, len(cmds), self.batch_size)
+        if not cmds and on_done is not None:
+            starts = [0]
+        for start in starts:
+            batch = cmds[start:start + self.batch_size]
+            self._check()
+            last = start + self.batch_size >= len(cmds)
+            future = self._pool.submit(self.worker, batch) if batch else None
+            item = (batch, future, on_done if last else None)
+            while True:
+                try:
+                    self._pending.put(item, timeout=FAILURE_CHECK_INTERVAL)
+                    break
+                except queue.Full:
+                    self._check()
+
+    def _check(self):
+        if self.failed.is_set():
+            raise PipelineError(str(self.error)) from self.error
+
+    def _write(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            batch, future, on_done = item
+            if self.failed.is_set():
+                if future is not None:
+                    future.cancel()
+                continue
+            try:
+                results = future.result() if future is not None else []
+            except BrokenProcessPool as e:
+                self._fail(PipelineError(f"detector worker process died: {e}"))
+                continue
+            except Exception as e:
+                self._fail(PipelineError(f"detector worker failed: {e!r}"))
+                continue
+
+            for cmd, result in zip(batch, results):
+                try:
+                    self.on_verdict(cmd, result)
+                except Exception as e:
+                    # Secure Coding: A failing output handler must not stall the pipeline
+                    print(f"[ERROR] {e}")
+            self.emitted += len(batch)
+            if on_done is not None:
+                try:
+                    on_done()
+                except Exception as e:
+                    print(f"[ERROR] {e}")
+
+    def _fail(self, error):
+        print(f"[ERROR] {error}")
+        self.error = error
+        self.failed.set()
+
+    def close(self, cancel=False):
+        """Emit everything submitted (unless cancel), stop the workers, re-raise failures."""
+        if cancel:
+            self.failed.set()
+        self._pending.put(None)
+        self._writer.join()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self.error is not None:
+            raise PipelineError(str(self.error)) from self.error
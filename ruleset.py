@@ -0,0 +1,176 @@
+import re
+
+from automaton import KeywordAutomaton, TokenIndex, key_piece
+from command import ParsedCommand
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+# Literal Extraction: Collect substrings that must appear in any text the
+# pattern matches. Anything we cannot reason about simply ends the current run,
+# so the result is always a safe (possibly empty) necessary condition.
+def extract_literals(pattern, flags=re.IGNORECASE):
+    literals = []
+    run = []
+
+    def flush():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    def walk(items):
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                ch = chr(av)
+                # Secure Coding: Only ASCII characters are safe to compare after
+                # lowercasing; Unicode case folding has cross-script equivalents
+                if ch.isascii():
+                    run.append(ch.lower())
+                else:
+                    flush()
+            elif op is sre_constants.SUBPATTERN:
+                # A group consumes exactly its contents, so runs continue through it
+                walk(av[-1])
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+                flush()
+                walk(av[2])
+                flush()
+            else:
+                flush()
+
+    try:
+        walk(sre_parse.parse(pattern, flags))
+    except Exception:
+        # Invalid pattern or changed parser internals: no known literals
+        return []
+    flush()
+
+    # Keep order of appearance but drop duplicates
+    return list(dict.fromkeys(literals))
+
+
+# One entry of rules.json, compiled once at load time. Rules loaded with
+# precomputed literals (from a config snapshot, already validated when it was
+# built) compile their regex on first use instead, since most never run.
+class CompiledRule:
+    __slots__ = ("index", "pattern", "verdict", "_regex", "literals")
+
+    def __init__(self, index, pattern, verdict, literals=None):
+        self.index = index
+        self.pattern = pattern
+        self.verdict = verdict
+        if literals is None:
+            self._regex = re.compile(pattern, re.IGNORECASE)
+            self.literals = extract_literals(pattern)
+        else:
+            self._regex = None
+            self.literals = list(literals)
+
+    @property
+    def regex(self):
+        if self._regex is None:
+            self._regex = re.compile(self.pattern, re.IGNORECASE)
+        return self._regex
+
+    def __repr__(self):
+        return f"CompiledRule({self.index}, {self.pattern!r}, {self.verdict!r})"
+
+
+# Compiled Ruleset: Regexes are only evaluated for rules whose required
+# literals all occur in the command. Each rule is keyed on the longest
+# whitespace-free piece of its literals; the command's tokens (its executable
+# first) are looked up in a memoized index of those keys, so the per-command
+# cost follows the number of plausible rules rather than the size of rules.json.
+# Rules are still searched anywhere in the command, exactly like re.search, so
+# "cmd /c powershell -enc ..." reaches the powershell rules too.
+class CompiledRuleset:
+    def __init__(self, rules, literals=None, tables=None):
+        if literals is None:
+            literals = [None] * len(rules)
+        self.rules = [
+            CompiledRule(i, rule["pattern"], rule["verdict"], rule_literals)
+            for i, (rule, rule_literals) in enumerate(zip(rules, literals))
+        ]
+
+        # Prefilter restored from a config snapshot instead of rebuilt
+        if tables is not None:
+            self._generic, self._by_anchor, automaton_tables = tables
+            self._index = TokenIndex(KeywordAutomaton.from_tables(automaton_tables))
+            return
+
+        self._generic = []
+        self._by_anchor = []
+        anchor_ids = {}
+        automaton = KeywordAutomaton()
+
+        for rule in self.rules:
+            anchor = max((key_piece(literal) for literal in rule.literals), key=len, default="")
+            if not anchor:
+                self._generic.append(rule.index)
+                continue
+
+            anchor_id = anchor_ids.get(anchor)
+            if anchor_id is None:
+                anchor_id = automaton.add(anchor)
+                anchor_ids[anchor] = anchor_id
+                self._by_anchor.append([])
+            self._by_anchor[anchor_id].append(rule.index)
+
+        self._index = TokenIndex(automaton.build())
+
+    def __len__(self):
+        return len(self.rules)
+
+    def tables(self):
+        """Prefilter state for CompiledRuleset(rules, literals, tables)."""
+        return (self._generic, self._by_anchor, self._index.automaton.tables())
+
+    @property
+    def token_index(self):
+        """TokenIndex over the rule anchors (the literals every candidate rule needs)."""
+        return self._index
+
+    @property
+    def has_generic_rules(self):
+        """True if some rule has no anchor, so every command is a candidate."""
+        return bool(self._generic)
+
+    def candidates(self, cmd, cmd_lower=None, anchor_ids=None):
+        """
+        Return the rules that could match `cmd` (text or ParsedCommand), in rule order.
+
+        `anchor_ids` are the token_index ids already found in the command's
+        tokens (e.g. by the batch engine); they are looked up when omitted.
+        """
+        command = cmd if isinstance(cmd, ParsedCommand) else ParsedCommand(cmd, cmd_lower)
+
+        # Non-ASCII input can match ASCII literals case-insensitively (e.g. the
+        # Kelvin sign matches 'k'), so skip the prefilter entirely
+        if not command.is_ascii:
+            return self.rules
+
+        if anchor_ids is None:
+            anchor_ids = self._index.find_ids(command.tokens)
+        indices = list(self._generic)
+        for anchor_id in anchor_ids:
+            indices.extend(self._by_anchor[anchor_id])
+        indices.sort()
+
+        rules = self.rules
+        cmd_lower = command.lower
+        return [
+            rules[i] for i in indices
+            if all(literal in cmd_lower for literal in rules[i].literals)
+        ]
+
+    def match(self, cmd, cmd_lower=None, anchor_ids=None):
+        """Return the first rule (in rules.json order) matching `cmd`, or None."""
+        command = cmd if isinstance(cmd, ParsedCommand) else ParsedCommand(cmd, cmd_lower)
+        for rule in self.candidates(command, anchor_ids=anchor_ids):
+            if rule.regex.search(command.raw):
+                return rule
+        return None
@@ -0,0 +1,112 @@
+from automaton import KeywordAutomaton, TokenIndex, key_piece
+from command import ParsedCommand
+
+# Score reduction applied for every benign keyword found in a command
+BENIGN_DISCOUNT = 0.1
+
+
+# Keyword Scorer: Risky and benign keyword profiles compiled into one token
+# index, so a command is looked up token by token no matter how many terms
+# exist. Keywords spanning whitespace ("echo hello") are found through their
+# longest piece and then confirmed against the whole command.
+class KeywordScorer:
+    def __init__(self, behavior_scores, benign_keywords, tables=None):
+        # Each entry is (position, hit label, score delta); position preserves
+        # the original evaluation order: risky terms first, then benign terms
+        profile = [(keyword, keyword, weight) for keyword, weight in behavior_scores.items()]
+        profile += [(safe_word, f"-{safe_word}", -BENIGN_DISCOUNT) for safe_word in benign_keywords]
+        self.profile = profile
+
+        # Index and entries restored from a config snapshot instead of rebuilt
+        if tables is not None:
+            (automaton_tables, self._piece_keywords, self._always, self._confirm,
+             self._entries) = tables
+            self._index = TokenIndex(KeywordAutomaton.from_tables(automaton_tables))
+            return
+
+        automaton = KeywordAutomaton()
+        self._entries = []
+        self._piece_keywords = []
+        # Keywords without any whitespace-free piece are checked for every command
+        self._always = []
+        # Keyword id -> full keyword, for keywords that are more than their piece
+        self._confirm = {}
+        keyword_ids = {}
+        piece_ids = {}
+
+        for position, (keyword, label, delta) in enumerate(profile):
+            keyword_id = keyword_ids.get(keyword)
+            if keyword_id is None:
+                keyword_id = len(self._entries)
+                keyword_ids[keyword] = keyword_id
+                self._entries.append([])
+
+                piece = key_piece(keyword)
+                if piece != keyword:
+                    self._confirm[keyword_id] = keyword
+                if not piece:
+                    self._always.append(keyword_id)
+                else:
+                    piece_id = piece_ids.get(piece)
+                    if piece_id is None:
+                        piece_id = automaton.add(piece)
+                        piece_ids[piece] = piece_id
+                        self._piece_keywords.append([])
+                    self._piece_keywords[piece_id].append(keyword_id)
+            self._entries[keyword_id].append((position, label, delta))
+
+        self._index = TokenIndex(automaton.build())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def tables(self):
+        """Compiled state for KeywordScorer(behavior_scores, benign_keywords, tables)."""
+        return (self._index.automaton.tables(), self._piece_keywords, self._always,
+                self._confirm, self._entries)
+
+    @property
+    def token_index(self):
+        return self._index
+
+    def keyword_tables(self):
+        """
+        Lookup tables for matching many commands at once (see batch.py).
+
+        Returns:
+            tuple: (keyword ids per piece id, keyword ids checked for every
+                    command, {keyword id: keyword needing a full-text check},
+                    profile positions per keyword id)
+        """
+        positions = [[position for position, _, _ in entries] for entries in self._entries]
+        return self._piece_keywords, self._always, self._confirm, positions
+
+    def matches(self, command):
+        """Profile entries (position, hit label, delta) found in a command, in profile order."""
+        if isinstance(command, ParsedCommand):
+            cmd_lower, tokens = command.lower, command.tokens
+        else:
+            cmd_lower, tokens = command, command.split()
+
+        keyword_ids = set(self._always)
+        for piece_id in self._index.find_ids(tokens):
+            keyword_ids.update(self._piece_keywords[piece_id])
+
+        matched = []
+        confirm = self._confirm
+        for keyword_id in keyword_ids:
+            keyword = confirm.get(keyword_id)
+            if keyword is None or keyword in cmd_lower:
+                matched.extend(self._entries[keyword_id])
+        matched.sort()
+        return matched
+
+    def score(self, command):
+        """Return (score, hits) for a ParsedCommand or an already lowercased command."""
+        # Accumulate in the original order so float sums are bit-for-bit identical
+        score = 0.0
+        hits = []
+        for _, label, delta in self.matches(command):
+            score += delta
+            hits.append(label)
+        return score, hits
@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from detector import get_engine
+
+# Default Unix domain socket the daemon listens on
+SOCKET_PATH = "logs/detector.sock"
+
+# Length-prefixed batches: a NUL byte, a 4-byte big-endian length, then a JSON
+# array of commands. Anything else on the wire is one command per line.
+FRAME_MARKER = b"\x00"
+FRAME_HEADER = struct.Struct(">I")
+
+# Secure Coding: Cap request sizes so one client cannot exhaust memory
+MAX_LINE_BYTES = 64 * 1024
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+MAX_BATCH_COMMANDS = 10000
+
+# Requests parsed but not yet answered, per connection; when full the server
+# stops reading that socket, so a fast client is slowed down instead of buffered
+CONNECTION_QUEUE_SIZE = 64
+
+# Newline requests already waiting are analyzed together, up to this many
+LINE_BATCH_SIZE = 256
+
+
+# Queued after the last request of a connection
+CLOSED = ("closed", None)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def is_loopback(host):
+    """True for 'localhost' and loopback IP addresses."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def encode_frame(payload):
+    """Serialize a JSON-compatible payload as one length-prefixed frame."""
+    data = json.dumps(payload).encode("utf-8")
+    return FRAME_MARKER + FRAME_HEADER.pack(len(data)) + data
+
+
+def verdict_record(cmd, result):
+    return {"command": cmd, "verdict": result["verdict"], "reason": result["reason"]}
+
+
+def analyze_batch(engine, cmds):
+    """Executor job: run the detector over one batch of commands."""
+    return [verdict_record(cmd, engine.analyze(cmd)) for cmd in cmds]
+
+
+async def read_request(reader):
+    """Read one request: ("frame", [cmds]), ("line", cmd) or None at EOF."""
+    first = await reader.read(1)
+    if not first:
+        return None
+    if first == b"\n":
+        # A bare newline is an empty request; reading on would swallow the next one
+        return "line", ""
+
+    if first == FRAME_MARKER:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        (length,) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            raise ProtocolError(f"frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+        try:
+            cmds = json.loads(await reader.readexactly(length))
+        except ValueError as e:
+            raise ProtocolError(f"invalid JSON frame: {e}")
+        # Secure Coding: Only a bounded list of strings is accepted as a batch
+        if not isinstance(cmds, list) or not all(isinstance(c, str) for c in cmds):
+            raise ProtocolError("frame must be a JSON array of strings")
+        if len(cmds) > MAX_BATCH_COMMANDS:
+            raise ProtocolError(f"batch of {len(cmds)} commands exceeds {MAX_BATCH_COMMANDS}")
+        return "frame", cmds
+
+    try:
+        line = first + await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        # Last line without a trailing newline
+        line = first + e.partial
+    except asyncio.LimitOverrunError:
+        raise ProtocolError(f"line exceeds {MAX_LINE_BYTES} bytes")
+    return "line", line.decode("utf-8", errors="replace").strip()
+
+
+# Detection Server: Long-lived daemon answering detection requests on a Unix
+# socket and optionally on localhost TCP. Each connection has a reader that
+# parses requests into a bounded queue and a writer that answers them in order,
+# so clients may pipeline as many requests as they like on one connection.
+class DetectionServer:
+    def __init__(self, unix_path=SOCKET_PATH, tcp_port=None, host="127.0.0.1",
+                 engine=None, max_workers=4, queue_size=CONNECTION_QUEUE_SIZE,
+                 allow_remote=False):
+        # Secure Coding: The protocol has no authentication, so stay on loopback
+        # unless the operator explicitly asks otherwise
+        if tcp_port is not None and not allow_remote and not is_loopback(host):
+            raise ValueError(f"[SECURITY] Refusing to listen on non-loopback address {host} "
+                             "without allow_remote (--allow-remote)")
+        self.unix_path = unix_path
+        self.tcp_port = tcp_port
+        self.host = host
+        self.engine = engine or get_engine()
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detector")
+        self._servers = []
+        self._connections = {}       # writer -> handler task
+        self._stop = None
+
+        self.requests = 0
+        self.commands = 0
+
+    async def start(self):
+        self._stop = asyncio.Event()
+        self.engine.start_watcher()
+
+        if self.unix_path:
+            self._remove_stale_socket()
+            os.makedirs(os.path.dirname(self.unix_path) or ".", exist_ok=True)
+            # Secure Coding: Only the owning user may talk to the detector; the
+            # socket is created 0600, so there is no window where others can connect
+            old_umask = os.umask(0o177)
+            try:
+                server = await asyncio.start_unix_server(self._handle, path=self.unix_path,
+                                                         limit=MAX_LINE_BYTES)
+            finally:
+                os.umask(old_umask)
+            self._servers.append(server)
+        if self.tcp_port is not None:
+            server = await asyncio.start_server(self._handle, self.host, self.tcp_port,
+                                                limit=MAX_LINE_BYTES)
+            self._servers.append(server)
+        if not self._servers:
+            raise ValueError("DetectionServer needs a Unix socket path or a TCP port")
+
+    @property
+    def tcp_address(self):
+        """(host, port) actually bound for TCP, useful with tcp_port=0."""
+        for server in self._servers:
+            for sock in server.sockets:
+                if sock.family in (socket.AF_INET, socket.AF_INET6):
+                    return sock.getsockname()[:2]
+        return None
+
+    def _remove_stale_socket(self):
+        try:
+            mode = os.lstat(self.unix_path).st_mode
+        except FileNotFoundError:
+            return
+        # Secure Coding: Never delete a regular file that happens to sit at the path
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"[SECURITY] {self.unix_path} exists and is not a socket")
+        os.remove(self.unix_path)
+
+    async def serve_forever(self, ready=None):
+        await self.start()
+        if ready is not None:
+            ready.set()
+        try:
+            await self._stop.wait()
+        finally:
+            await self.close()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        # Closing the transports ends each handler's read loop; wait for them to finish
+        handlers = list(self._connections.values())
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        self._servers = []
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+        self._executor.shutdown(wait=True)
+
+    async def _handle(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        responder = asyncio.create_task(self._respond(queue, writer))
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ProtocolError, asyncio.IncompleteReadError) as e:
+                    # Secure Coding: Report the problem, then drop the malformed connection
+                    await queue.put(("error", str(e) or "truncated request"))
+                    break
+                if request is None:
+                    break
+                if request == ("line", ""):
+                    continue
+                # Backpressure: waits here while this connection's queue is full
+                await queue.put(request)
+        except ConnectionError:
+            pass
+        finally:
+            await queue.put(CLOSED)
+            await responder
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _respond(self, queue, writer):
+        held = None
+        while True:
+            request = held or await queue.get()
+            held = None
+            kind, payload = request
+            if kind == "closed":
+                return
+            if kind == "error":
+                writer.write(json.dumps({"error": payload}).encode() + b"\n")
+            elif kind == "frame":
+                records = await self._analyze(payload)
+                writer.write(encode_frame(records))
+            else:
+                # Newline requests already queued are analyzed as one batch
+                cmds = [payload]
+                while len(cmds) < LINE_BATCH_SIZE and not queue.empty():
+                    request = queue.get_nowait()
+                    if request[0] != "line":
+                        held = request
+                        break
+                    cmds.append(request[1])
+                records = await self._analyze(cmds)
+                writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in records))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                # Client went away: keep consuming so the reader never blocks on a full queue
+                while held != CLOSED and (await queue.get()) != CLOSED:
+                    held = None
+                return
+
+    async def _analyze(self, cmds):
+        loop = asyncio.get_running_loop()
+        try:
+            records = await loop.run_in_executor(self._executor, analyze_batch, self.engine, cmds)
+        except Exception as e:
+            # Secure Coding: One answer per command even when detection fails
+            print(f"[ERROR] Detection failed for {len(cmds)} commands: {e}")
+            records = [{"command": cmd, "error": "detection failed"} for cmd in cmds]
+        self.requests += 1
+        self.commands += len(cmds)
+        return records
+
+
+def serve(unix_path=SOCKET_PATH, tcp_port=None, host="127.0.0.1", **options):
+    """Blocking entry point: run the detection daemon until Ctrl+C / SIGTERM."""
+    server = DetectionServer(unix_path, tcp_port, host, **options)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, server.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        ready = asyncio.Event()
+        task = asyncio.create_task(server.serve_forever(ready))
+        await ready.wait()
+        where = [unix_path] if unix_path else []
+        if tcp_port is not None:
+            where.append("%s:%s" % server.tcp_address)
+        print(f"Detection service listening on {', '.join(where)}\n")
+        await task
+
+    asyncio.run(main())
+    return server
+
+
+# Entry point: python service.py [--socket PATH] [--tcp PORT]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MalCommandGuard detection service")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path ('' to disable)")
+    parser.add_argument("--tcp", type=int, default=None, help="also listen on this localhost TCP port")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address (loopback only by default)")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow a non-loopback --host; the service has no authentication")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    try:
+        serve(args.socket or None, args.tcp, args.host, max_workers=args.workers,
+              allow_remote=args.allow_remote)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        raise SystemExit(2)
+    print("\n[!] Detection service stopped.")
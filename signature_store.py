@@ -0,0 +1,271 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+# On-disk formats: a small header followed by raw data, so files can be
+# memory-mapped and shared read-only between processes
+INDEX_MAGIC = b"MCGHASH1"
+INDEX_HEADER = struct.Struct("<8sIQ")     # magic, digest size, record count
+BLOOM_MAGIC = b"MCGBLOOM"
+BLOOM_HEADER = struct.Struct("<8sIQ")     # magic, hash count, bit count
+DIGEST_SIZE = 16                          # MD5, as produced by utils.hash_command
+
+MANIFEST_NAME = "manifest.json"
+SIGNATURE_LISTS = ("malicious_hashes", "suspicious_hashes")
+
+# Feeds up to this many signatures are held in a hash set, even when a mapped
+# index exists: set lookups are faster and the memory is small. Larger feeds
+# are binary-searched in the shared mapping instead.
+MEMORY_SIGNATURE_LIMIT = 50000
+
+
+def file_sha256(path):
+    """Content hash of a file, used to detect stale indexes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_hash(cmd_hash):
+    """Hex digests compare case-insensitively; every index stores and looks up lowercase."""
+    return cmd_hash.strip().lower()
+
+
+# In-memory index: a hashed set for feeds that comfortably fit in RAM
+class MemoryHashIndex:
+    def __init__(self, hashes):
+        self._hashes = frozenset(normalize_hash(h) for h in hashes)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, cmd_hash):
+        # Already normalized by SignatureStore.lookup
+        return cmd_hash in self._hashes
+
+
+# Bloom filter: answers "definitely absent" without touching the sorted index.
+# MD5 digests are already uniformly distributed, so bit positions are derived
+# from the digest itself with double hashing.
+class BloomFilter:
+    def __init__(self, bits, num_bits, num_hashes):
+        self._bits = bits
+        self._num_bits = num_bits
+        self._num_hashes = num_hashes
+
+    @classmethod
+    def build(cls, digests, bits_per_entry=10):
+        count = max(len(digests), 1)
+        num_bits = max(count * bits_per_entry, 64)
+        num_hashes = max(1, round(bits_per_entry * math.log(2)))
+        bloom = cls(bytearray((num_bits + 7) // 8), num_bits, num_hashes)
+        for digest in digests:
+            for pos in bloom._positions(digest):
+                bloom._bits[pos >> 3] |= 1 << (pos & 7)
+        return bloom
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self._num_hashes):
+            yield (h1 + i * h2) % self._num_bits
+
+    def might_contain(self, digest):
+        bits = self._bits
+        for pos in self._positions(digest):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def write(self, path):
+        with open(path, "wb") as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self._num_hashes, self._num_bits))
+            f.write(self._bits)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_hashes, num_bits = BLOOM_HEADER.unpack_from(mm, 0)
+        if magic != BLOOM_MAGIC or len(mm) < BLOOM_HEADER.size + (num_bits + 7) // 8:
+            raise ValueError(f"[SECURITY] Corrupt bloom filter: {path}")
+        bits = memoryview(mm)[BLOOM_HEADER.size:]
+        return cls(bits, num_bits, num_hashes)
+
+
+# Memory-mapped index: sorted fixed-size binary digests, searched in O(log n)
+# without materialising a Python string per signature
+class MappedHashIndex:
+    def __init__(self, buffer, offset, count, bloom=None):
+        self._buf = buffer
+        self._offset = offset
+        self._count = count
+        self._bloom = bloom
+
+    @classmethod
+    def open(cls, path, bloom_path=None):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, digest_size, count = INDEX_HEADER.unpack_from(mm, 0)
+        # Secure Coding: Validate the header before trusting any offsets
+        if (magic != INDEX_MAGIC or digest_size != DIGEST_SIZE
+                or len(mm) != INDEX_HEADER.size + count * DIGEST_SIZE):
+            raise ValueError(f"[SECURITY] Corrupt signature index: {path}")
+        bloom = None
+        if bloom_path and os.path.exists(bloom_path):
+            bloom = BloomFilter.open(bloom_path)
+        return cls(mm, INDEX_HEADER.size, count, bloom)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, cmd_hash):
+        try:
+            digest = bytes.fromhex(cmd_hash)
+        except (TypeError, ValueError):
+            return False
+        if len(digest) != DIGEST_SIZE:
+            return False
+        if self._bloom is not None and not self._bloom.might_contain(digest):
+            return False
+
+        buf, base = self._buf, self._offset
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * DIGEST_SIZE
+            probe = buf[start:start + DIGEST_SIZE]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+
+def write_hash_index(hashes, path):
+    """Write hex MD5 strings as a sorted, de-duplicated binary index."""
+    digests = sorted({bytes.fromhex(h.strip()) for h in hashes})
+    for digest in digests:
+        if len(digest) != DIGEST_SIZE:
+            raise ValueError(f"Not an MD5 digest: {digest.hex()}")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, DIGEST_SIZE, len(digests)))
+        for digest in digests:
+            f.write(digest)
+    os.replace(tmp_path, path)
+    return digests
+
+
+# Signature Store: malicious and suspicious hash lists behind one lookup
+class SignatureStore:
+    def __init__(self, malicious, suspicious):
+        self.malicious = malicious
+        self.suspicious = suspicious
+
+    def lookup(self, cmd_hash):
+        """Return "malicious", "suspicious" or None for a command hash (any case)."""
+        if not isinstance(cmd_hash, str):
+            return None
+        cmd_hash = normalize_hash(cmd_hash)
+        if cmd_hash in self.malicious:
+            return "malicious"
+        if cmd_hash in self.suspicious:
+            return "suspicious"
+        return None
+
+    @classmethod
+    def from_json(cls, json_path):
+        with open(json_path) as f:
+            signatures = json.load(f)
+        return cls(
+            MemoryHashIndex(signatures.get("malicious_hashes", [])),
+            MemoryHashIndex(signatures.get("suspicious_hashes", [])),
+        )
+
+    @classmethod
+    def from_index(cls, index_dir):
+        indexes = []
+        for name in SIGNATURE_LISTS:
+            base = os.path.join(index_dir, name)
+            indexes.append(MappedHashIndex.open(base + ".idx", base + ".bloom"))
+        return cls(*indexes)
+
+
+def convert_signatures(json_path, index_dir, bloom_bits_per_entry=10):
+    """Build the memory-mapped index (and Bloom filters) from signatures.json."""
+    with open(json_path) as f:
+        signatures = json.load(f)
+
+    os.makedirs(index_dir, exist_ok=True)
+    counts = {}
+    for name in SIGNATURE_LISTS:
+        base = os.path.join(index_dir, name)
+        digests = write_hash_index(signatures.get(name, []), base + ".idx")
+        if bloom_bits_per_entry:
+            BloomFilter.build(digests, bloom_bits_per_entry).write(base + ".bloom")
+        elif os.path.exists(base + ".bloom"):
+            os.remove(base + ".bloom")
+        counts[name] = len(digests)
+
+    manifest = {"source": os.path.basename(json_path),
+                "source_sha256": file_sha256(json_path),
+                "counts": counts}
+    with open(os.path.join(index_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return counts
+
+
+def read_manifest(index_dir):
+    """Manifest of a converted index directory, or None when there is none."""
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME) if index_dir else None
+    if not manifest_path or not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def wants_mapped_index(index_dir, memory_limit=MEMORY_SIGNATURE_LIMIT):
+    """True if index_dir holds an index for a feed too large for the hash sets."""
+    manifest = read_manifest(index_dir)
+    return manifest is not None and sum(manifest.get("counts", {}).values()) > memory_limit
+
+
+def load_signature_store(json_path, index_dir=None, memory_limit=MEMORY_SIGNATURE_LIMIT):
+    """
+    Pick the signature backend by feed size.
+
+    The memory-mapped index is used when it exists, matches the JSON and holds
+    more than `memory_limit` signatures; otherwise the JSON lists go into sets.
+    """
+    if wants_mapped_index(index_dir, memory_limit):
+        manifest = read_manifest(index_dir)
+        # An index converted from an older signatures.json must not shadow it
+        if not os.path.exists(json_path) or manifest.get("source_sha256") == file_sha256(json_path):
+            return SignatureStore.from_index(index_dir)
+        print(f"[!] Signature index {index_dir} is stale; using {json_path}")
+    return SignatureStore.from_json(json_path)
+
+
+# Entry point: convert signatures.json into a memory-mapped index
+if __name__ == "__main__":
+    # Secure Coding: Checks for command-line argument presence to avoid index error
+    if len(sys.argv) < 3:
+        print("Usage: python signature_store.py <signatures.json> <index_dir> [--no-bloom]")
+        sys.exit(1)
+    bits = 0 if "--no-bloom" in sys.argv[3:] else 10
+    counts = convert_signatures(sys.argv[1], sys.argv[2], bloom_bits_per_entry=bits)
+    for name, count in counts.items():
+        print(f"[+] {name}: {count} signatures indexed")
@@ -0,0 +1,212 @@
+import argparse
+import json
+import re
+import sys
+import zlib
+
+import numpy as np
+
+# Optional near-duplicate index built by `python similarity.py <labeled.csv>`
+SIMILARITY_INDEX_FILE = "data/similarity_index.npz"
+
+# Minimum Jaccard similarity of shingle sets for a near-duplicate match
+DEFAULT_THRESHOLD = 0.8
+
+# MinHash parameters; an index can only be queried with the values it was built with
+NUM_PERM = 128
+SHINGLE_SIZE = 4
+SEED = 1
+
+# Shingles hashed per step; bounds the num_perm x chunk temporary (~1 MB) no
+# matter how long a command from the feed is
+SIGNATURE_CHUNK = 1024
+
+# Universal hashing modulus (Mersenne prime 2^31 - 1); keeps a*h+b inside uint64
+_PRIME = (1 << 31) - 1
+
+# Normalization: variable parts of a command are replaced by placeholders so
+# a changed address, number or encoded payload still looks the same
+_IP = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b")
+_BLOB = re.compile(r"[a-z0-9+/=]{24,}")
+_NUMBER = re.compile(r"\d+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(cmd):
+    """Lowercase, collapse whitespace and mask IPs, numbers and long payloads."""
+    text = cmd.lower()
+    text = _IP.sub("<ip>", text)
+    text = _BLOB.sub("<blob>", text)
+    text = _NUMBER.sub("0", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def shingles(cmd, size=SHINGLE_SIZE):
+    """Set of overlapping character n-grams of the normalized command."""
+    text = normalize(cmd)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def shingle_hashes(cmd, size=SHINGLE_SIZE):
+    """CRC32 of each shingle; the form both MinHash and the index keep them in."""
+    return frozenset(zlib.crc32(s.encode("utf-8")) for s in shingles(cmd, size))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def lsh_parameters(threshold, num_perm=NUM_PERM):
+    """Pick (bands, rows) so pairs at the threshold almost always share a band."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        # Similarity at which a pair has a 50% chance of becoming a candidate;
+        # kept below the threshold so near matches are not missed
+        if (1 / bands) ** (1 / rows) <= threshold * 0.9:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, hash_set):
+        hashes = np.fromiter(hash_set, dtype=np.uint64, count=len(hash_set)) % _PRIME
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        # Secure Coding: Fold the minimum over fixed-size chunks so an oversized
+        # command cannot make one lookup allocate memory in proportion to its length
+        for start in range(0, len(hashes), SIGNATURE_CHUNK):
+            chunk = hashes[start:start + SIGNATURE_CHUNK]
+            values = (self.a[:, None] * chunk[None, :] + self.b[:, None]) % _PRIME
+            np.minimum(signature, values.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+
+# Similarity Index: MinHash signatures of known malicious/suspicious commands,
+# bucketed by LSH bands. A lookup only compares the command against entries
+# sharing at least one band, then confirms with the exact Jaccard similarity.
+# Shingle hashes of the known commands are kept so lookups never re-shingle them.
+class SimilarityIndex:
+    def __init__(self, signatures, commands, verdicts, threshold=DEFAULT_THRESHOLD,
+                 num_perm=NUM_PERM, seed=SEED, shingle_size=SHINGLE_SIZE, shingle_sets=None):
+        self.signatures = signatures
+        self.commands = commands
+        self.verdicts = verdicts
+        self.threshold = threshold
+        self.seed = seed
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm, seed)
+        if shingle_sets is None:
+            shingle_sets = [shingle_hashes(cmd, shingle_size) for cmd in commands]
+        self.shingle_sets = shingle_sets
+
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        for i, signature in enumerate(signatures):
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(i)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def _band_keys(self, signature):
+        raw = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [raw[band * width:(band + 1) * width] for band in range(self.bands)]
+
+    @classmethod
+    def build(cls, entries, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, seed=SEED,
+              shingle_size=SHINGLE_SIZE):
+        """Build from (command, verdict) pairs; near-identical duplicates are kept once."""
+        hasher = MinHasher(num_perm, seed)
+        seen = set()
+        commands, verdicts, signatures, shingle_sets = [], [], [], []
+        for cmd, verdict in entries:
+            key = normalize(cmd)
+            if key in seen:
+                continue
+            seen.add(key)
+            commands.append(cmd)
+            verdicts.append(verdict)
+            shingle_sets.append(shingle_hashes(cmd, shingle_size))
+            signatures.append(hasher.signature(shingle_sets[-1]))
+        matrix = np.array(signatures, dtype=np.uint32).reshape(len(signatures), num_perm)
+        return cls(matrix, commands, verdicts, threshold, num_perm, seed, shingle_size,
+                   shingle_sets)
+
+    def lookup(self, cmd):
+        """Return (similarity, known command, verdict) of the closest match, or None."""
+        query = shingle_hashes(cmd, self.shingle_size)
+        signature = self.hasher.signature(query)
+
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+
+        best = None
+        for i in candidates:
+            score = jaccard(query, self.shingle_sets[i])
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, self.commands[i], self.verdicts[i])
+        return best
+
+    def save(self, path):
+        # Secure Coding: Plain arrays and JSON only, so loading never unpickles
+        meta = json.dumps({
+            "commands": self.commands,
+            "verdicts": self.verdicts,
+            "num_perm": self.hasher.num_perm,
+            "seed": self.seed,
+            "shingle_size": self.shingle_size,
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            np.savez_compressed(f, signatures=self.signatures,
+                                meta=np.frombuffer(meta, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path, threshold=DEFAULT_THRESHOLD):
+        with np.load(path, allow_pickle=False) as data:
+            signatures = data["signatures"]
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+        return cls(signatures, meta["commands"], meta["verdicts"], threshold,
+                   meta["num_perm"], meta["seed"], meta["shingle_size"])
+
+
+def build_from_csv(csv_path, index_path=SIMILARITY_INDEX_FILE, threshold=DEFAULT_THRESHOLD):
+    """Index every malicious/suspicious command of a labeled CSV (prompt, Label)."""
+    import pandas as pd
+    df = pd.read_csv(csv_path).dropna(subset=["prompt", "Label"])
+    labels = df["Label"].str.lower().str.strip()
+    known = df[labels.isin(["malicious", "suspicious"])]
+    index = SimilarityIndex.build(zip(known["prompt"].astype(str), labels[known.index]),
+                                  threshold=threshold)
+    index.save(index_path)
+    return index
+
+
+# Entry point: python similarity.py <labeled.csv> [index_path]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the near-duplicate signature index")
+    parser.add_argument("csv_path", help="labeled CSV with prompt and Label columns")
+    parser.add_argument("index_path", nargs="?", default=SIMILARITY_INDEX_FILE)
+    args = parser.parse_args()
+    try:
+        index = build_from_csv(args.csv_path, args.index_path)
+    except (OSError, KeyError) as e:
+        print(f"[ERROR] Could not build similarity index: {e}")
+        sys.exit(1)
+    print(f"[+] Indexed {len(index)} known commands into {args.index_path} "
+          f"({index.bands} bands x {index.rows} rows)")
@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+import scoring
+from ruleset import CompiledRuleset
+from scoring import KeywordScorer
+from signature_store import (SignatureStore, MemoryHashIndex, MappedHashIndex, SIGNATURE_LISTS, DIGEST_SIZE,
+                             MEMORY_SIGNATURE_LIMIT, file_sha256)
+
+# Precompiled config: everything detector needs from data/*.json in one file
+SNAPSHOT_FILE = "data/config.snapshot"
+
+# Layout: header, JSON metadata (config, rule literals, section table), the
+# compiled rule prefilter and keyword automaton, then the sorted 16-byte
+# digests of each signature list. The checksum covers everything after the header;
+# it is checked on --verify and after every build, not on each load.
+SNAPSHOT_MAGIC = b"MCGSNAP1"
+# Bump when the layout or the way tables are compiled changes
+SNAPSHOT_VERSION = 3
+
+# Compiled tables are stored with marshal (plain lists/dicts/tuples only, no
+# pickle), whose format is tied to the Python version that wrote it
+COMPILED_FORMAT = f"marshal-{marshal.version}-py{sys.version_info[0]}.{sys.version_info[1]}"
+SNAPSHOT_HEADER = struct.Struct("<8sI32sQ")     # magic, version, sha256 of body, metadata length
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# (path, checksum) of snapshots already reported as unusable, so each one is
+# reported once per process instead of on every config reload
+_reported = set()
+
+
+def source_stamps(config_files):
+    """(size, mtime_ns) of every config file, a cheap check that it is unchanged."""
+    stamps = {}
+    for name, path in config_files.items():
+        st = os.stat(path)
+        stamps[name] = [st.st_size, st.st_mtime_ns]
+    return stamps
+
+
+def code_key():
+    """Code-side settings the compiled tables depend on, besides the JSON."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "compiled_format": COMPILED_FORMAT,
+        "benign_discount": scoring.BENIGN_DISCOUNT,
+    }
+
+
+def build_snapshot(config_files, path=SNAPSHOT_FILE):
+    """Compile the JSON configs into a snapshot file; returns the source hashes."""
+    # Stamped before reading, so an edit during the build makes the snapshot look stale
+    stamps = source_stamps(config_files)
+    hashes, configs = {}, {}
+    for name, config_path in config_files.items():
+        with open(config_path, "rb") as f:
+            raw = f.read()
+        # Hashed and parsed from the same bytes, so the two always agree
+        hashes[name] = hashlib.sha256(raw).hexdigest()
+        configs[name] = json.loads(raw)
+    rules = configs["rules"]
+    behavior_scores = configs["behavior"]
+    benign_keywords = configs["benign"]
+    signatures = configs["signatures"]
+
+    # Compiling here also validates every regex; loaders skip all of this work
+    ruleset = CompiledRuleset(rules)
+    scorer = KeywordScorer(behavior_scores, benign_keywords)
+    compiled = marshal.dumps((ruleset.tables(), scorer.tables()))
+
+    sections = [("compiled", compiled)]
+    for name in SIGNATURE_LISTS:
+        digests = sorted({bytes.fromhex(h.strip()) for h in signatures.get(name, [])})
+        if any(len(digest) != DIGEST_SIZE for digest in digests):
+            raise SnapshotError(f"{name} contains a value that is not an MD5 digest")
+        sections.append((name, b"".join(digests)))
+
+    # Offsets and lengths (in bytes) are relative to the end of the metadata
+    table, position = {}, 0
+    for name, data in sections:
+        table[name] = [position, len(data)]
+        position += len(data)
+
+    meta = json.dumps({
+        "sources": hashes,
+        "stamps": stamps,
+        "code": code_key(),
+        "rules": rules,
+        "literals": [rule.literals for rule in ruleset.rules],
+        "behavior": behavior_scores,
+        "benign": benign_keywords,
+        "sections": table,
+    }).encode("utf-8")
+    body = meta + b"".join(data for _, data in sections)
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                  hashlib.sha256(body).digest(), len(meta))
+
+    # Written to a temporary name and renamed, so readers never see half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, path)
+    return hashes
+
+
+# Config Snapshot: A validated, memory-mapped view of a snapshot file. The
+# signature digests are searched in place, so every process mapping the same
+# file shares one copy through the page cache. Loading only reads the metadata
+# and the compiled tables; `verify` also checks the body against its checksum.
+class ConfigSnapshot:
+    def __init__(self, path, verify=False):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Secure Coding: Validate magic, version and bounds before trusting any offsets
+        if len(mm) < SNAPSHOT_HEADER.size:
+            raise SnapshotError(f"[SECURITY] Truncated config snapshot: {path}")
+        magic, version, checksum, meta_length = SNAPSHOT_HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"[SECURITY] Unsupported config snapshot: {path}")
+        if verify and hashlib.sha256(memoryview(mm)[SNAPSHOT_HEADER.size:]).digest() != checksum:
+            raise SnapshotError(f"[SECURITY] Config snapshot checksum mismatch: {path}")
+
+        meta_end = SNAPSHOT_HEADER.size + meta_length
+        if meta_end > len(mm):
+            raise SnapshotError(f"[SECURITY] Truncated config snapshot: {path}")
+        meta = json.loads(mm[SNAPSHOT_HEADER.size:meta_end])
+        if meta.get("code", {}).get("compiled_format") != COMPILED_FORMAT:
+            raise SnapshotError(f"config snapshot {path} was written by another Python version")
+        self.path = path
+        self.checksum = checksum.hex()
+        self.sources = meta["sources"]
+        self.stamps = meta["stamps"]
+        self.code = meta["code"]
+        self.rules = meta["rules"]
+        self.literals = meta["literals"]
+        self.behavior_scores = meta["behavior"]
+        self.benign_keywords = meta["benign"]
+
+        sections = {}
+        for name, (offset, length) in meta["sections"].items():
+            start = meta_end + offset
+            if start + length > len(mm):
+                raise SnapshotError(f"[SECURITY] Corrupt config snapshot section {name}: {path}")
+            sections[name] = (start, length)
+
+        start, length = sections["compiled"]
+        try:
+            self.ruleset_tables, self.scorer_tables = marshal.loads(mm[start:start + length])
+        except (EOFError, TypeError, ValueError):
+            raise SnapshotError(f"[SECURITY] Corrupt config snapshot section compiled: {path}")
+
+        indexes = []
+        for name in SIGNATURE_LISTS:
+            start, length = sections[name]
+            count = length // DIGEST_SIZE
+            if count <= MEMORY_SIGNATURE_LIMIT:
+                data = mm[start:start + length]
+                indexes.append(MemoryHashIndex(
+                    data[i:i + DIGEST_SIZE].hex() for i in range(0, length, DIGEST_SIZE)))
+            else:
+                indexes.append(MappedHashIndex(mm, start, count))
+        self.signature_store = SignatureStore(*indexes)
+
+
+    def is_current(self, config_files):
+        """True if built by this code from the current content of `config_files`."""
+        if self.code != code_key() or set(self.sources) != set(config_files):
+            return False
+        stamps = source_stamps(config_files)
+        for name, path in config_files.items():
+            # Untouched files are trusted; touched ones are compared by content
+            if stamps[name] != self.stamps.get(name) and file_sha256(path) != self.sources[name]:
+                return False
+        return True
+
+
+def _report_once(path, checksum, message):
+    if (path, checksum) not in _reported:
+        _reported.add((path, checksum))
+        print(message)
+
+
+def load_snapshot(config_files, path=SNAPSHOT_FILE, rebuild=True, verify=False):
+    """
+    Return a ConfigSnapshot matching the current JSON files, or None.
+
+    Freshness is judged from the source stamps and hashes stored in the
+    snapshot, without hashing its body unless `verify` is set. A missing,
+    stale or unreadable snapshot is rebuilt (and the new one checksummed);
+    without `rebuild`, or if that fails, the caller falls back to the JSON.
+    """
+    checksum = None
+    if os.path.exists(path):
+        try:
+            snapshot = ConfigSnapshot(path, verify=verify)
+            if snapshot.is_current(config_files):
+                return snapshot
+            checksum = snapshot.checksum
+            if not rebuild:
+                _report_once(path, checksum, f"[!] Config snapshot {path} is out of date; "
+                                             f"rebuild it with: python snapshot.py")
+        except (OSError, ValueError, KeyError) as e:
+            _report_once(path, checksum, f"[!] Ignoring config snapshot {path}: {e}")
+    if not rebuild:
+        return None
+
+    try:
+        build_snapshot(config_files, path)
+        snapshot = ConfigSnapshot(path, verify=True)
+    except (OSError, ValueError, KeyError) as e:
+        _report_once(path, checksum, f"[!] Could not rebuild config snapshot {path}: {e}")
+        return None
+    # The JSON may have changed again while we were building
+    return snapshot if snapshot.is_current(config_files) else None
+
+
+# Entry point: python snapshot.py [--verify] [snapshot_path]
+if __name__ == "__main__":
+    from detector import CONFIG_FILES
+    parser = argparse.ArgumentParser(description="Build or verify the config snapshot")
+    parser.add_argument("path", nargs="?", default=SNAPSHOT_FILE)
+    parser.add_argument("--verify", action="store_true",
+                        help="check the existing snapshot's checksum and freshness instead of building")
+    args = parser.parse_args()
+
+    try:
+        if args.verify:
+            snapshot = ConfigSnapshot(args.path, verify=True)
+            if not snapshot.is_current(CONFIG_FILES):
+                print(f"[!] {args.path} is intact but out of date with the JSON config")
+                sys.exit(1)
+            print(f"[+] {args.path} is intact and up to date")
+            sys.exit(0)
+        build_snapshot(CONFIG_FILES, args.path)
+        snapshot = ConfigSnapshot(args.path, verify=True)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] Config snapshot {args.path}: {e}")
+        sys.exit(1)
+    print(f"[+] {len(snapshot.rules)} rules, {len(snapshot.behavior_scores)} keywords and "
+          f"{len(snapshot.signature_store.malicious) + len(snapshot.signature_store.suspicious)} "
+          f"signatures compiled into {args.path}")
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Stages timed inside analyze_command, in evaluation order
+STAGES = ("rule", "signature", "similarity", "behavior")
+
+# Latency histogram bucket upper bounds in microseconds; the last bucket is open-ended
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 20000)
+_BUCKET_BOUNDS_NS = tuple(bound * 1000 for bound in LATENCY_BUCKETS_US)
+
+# Secure Coding: Cap distinct keys so attacker-chosen input cannot grow the counters forever
+MAX_TRACKED_KEYS = 10000
+
+
+def stage_of(result):
+    """Which stage produced a verdict, read from its reason prefix."""
+    reason = result.get("reason", "")
+    if reason.startswith("Rule-Based"):
+        return "rule"
+    if reason.startswith("Signature-Based"):
+        return "signature"
+    if reason.startswith("Similarity-Based"):
+        return "similarity"
+    return "behavior"
+
+
+class LatencyStats:
+    __slots__ = ("calls", "total_ns", "max_ns", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * (len(_BUCKET_BOUNDS_NS) + 1)
+
+    def add(self, elapsed_ns):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.histogram[bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+
+    def snapshot(self):
+        labels = [f"<={bound}us" for bound in LATENCY_BUCKETS_US] + [f">{LATENCY_BUCKETS_US[-1]}us"]
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "mean_us": round(self.total_ns / self.calls / 1000, 3) if self.calls else 0.0,
+            "max_us": round(self.max_ns / 1000, 3),
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+# Detector Stats: Counters filled in by the engine. Each analysis reports
+# everything in one record() call, so the lock is taken once per command.
+# When disabled the engine skips timing entirely.
+class DetectorStats:
+    def __init__(self, enabled=False, max_keys=MAX_TRACKED_KEYS):
+        self.enabled = enabled
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.analyze = LatencyStats()
+            self.stages = {stage: LatencyStats() for stage in STAGES}
+            self.final_stage = Counter()
+            self.verdicts = Counter()
+            self.cache_hits = 0
+            self.rule_hits = Counter()
+            self.signature_hits = Counter()
+            self.keyword_hits = Counter()
+
+    def _count(self, counter, key):
+        if key in counter or len(counter) < self.max_keys:
+            counter[key] += 1
+
+    def record(self, total_ns, result, trace=(), cached=False):
+        """Record one analyze_command call.
+
+        Args:
+            total_ns: Wall time of the whole call
+            result: Verdict dict returned to the caller
+            trace: (stage, elapsed ns, what matched) for each stage that ran;
+                   the matched rule pattern, signature list or keyword hits
+            cached: True when the verdict came from the cache
+        """
+        with self._lock:
+            self.analyze.add(total_ns)
+            for stage, elapsed, detail in trace:
+                self.stages[stage].add(elapsed)
+                if detail is None:
+                    continue
+                if stage == "rule":
+                    self._count(self.rule_hits, detail)
+                elif stage == "signature":
+                    self._count(self.signature_hits, detail)
+                elif stage == "behavior":
+                    for keyword in detail:
+                        self._count(self.keyword_hits, keyword)
+            self.final_stage[stage_of(result)] += 1
+            self.verdicts[result.get("verdict", "unknown")] += 1
+            if cached:
+                self.cache_hits += 1
+
+    def snapshot(self):
+        """Point-in-time copy of every counter as plain JSON-serializable data."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "analyze": self.analyze.snapshot(),
+                "stages": {stage: stats.snapshot() for stage, stats in self.stages.items()},
+                "final_stage": dict(self.final_stage),
+                "verdicts": dict(self.verdicts),
+                "cache_hits": self.cache_hits,
+                "rule_hits": dict(self.rule_hits.most_common()),
+                "signature_hits": dict(self.signature_hits),
+                "keyword_hits": dict(self.keyword_hits.most_common()),
+            }
+
+
+def write_snapshot(snapshot, path):
+    """Write a stats snapshot as JSON, replacing the previous one atomically."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def start_periodic_dump(get_snapshot, interval, path):
+    """Dump get_snapshot() to `path` every `interval` seconds; returns a stop Event."""
+    stop = threading.Event()
+
+    def dump():
+        while not stop.wait(interval):
+            try:
+                write_snapshot(get_snapshot(), path)
+            except OSError as e:
+                print(f"[ERROR] Could not write detector stats to {path}: {e}")
+
+    threading.Thread(target=dump, name="stats-dump", daemon=True).start()
+    return stop
@@ -0,0 +1,292 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, name length
+READ_SIZE = 1 << 16                    # bytes drained per read() call
+
+
+# inotify Watcher: Sleeps in select() until the kernel reports activity on
+# the watched file. Watches the parent directory so renames and re-creation
+# (log rotation) wake us up too.
+class InotifyWatcher:
+    def __init__(self, path):
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        wd = libc.inotify_add_watch(self._fd, directory.encode(), WATCH_MASK)
+        if wd < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._name = os.path.basename(path).encode()
+
+    def wait(self, timeout):
+        """Block until the watched file changes or `timeout` seconds pass."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+
+        # Drain every queued event; only events for our file count as activity
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + EVENT_HEADER.size <= len(data):
+                _, _, _, name_len = EVENT_HEADER.unpack_from(data, pos)
+                pos += EVENT_HEADER.size
+                name = data[pos:pos + name_len].rstrip(b"\0")
+                pos += name_len
+                if name == self._name:
+                    relevant = True
+        return relevant
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# Polling Watcher: Fallback where inotify is unavailable (non-Linux, limits)
+class PollingWatcher:
+    def __init__(self, path, interval=0.05):
+        self._path = path
+        self._interval = interval
+        self._last = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self._path)
+            return (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._stat()
+            if current != self._last:
+                self._last = current
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self._interval, remaining))
+
+    def close(self):
+        pass
+
+
+def make_watcher(path):
+    """inotify when the platform supports it, polling otherwise."""
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError):
+        return PollingWatcher(path)
+
+
+# Log Tailer: Follows a growing log file, draining all available bytes at
+# once, surviving truncation and rename-rotation, and remembering its offset
+# across restarts. Only offsets the caller commit()s are saved, so lines read
+# but not yet handled are read again after a crash.
+class LogTailer:
+    def __init__(self, path, offset_file=None, start_at_end=True,
+                 checkpoint_interval=1.0, watcher=None):
+        self.path = path
+        self.offset_file = offset_file
+        self.start_at_end = start_at_end
+        self.checkpoint_interval = checkpoint_interval
+        self.rotations = 0
+        self.truncations = 0
+
+        self._watcher = watcher
+        self._file = None
+        self._inode = None
+        self._offset = 0           # byte offset just past the last complete line
+        self._partial = b""
+        self._committed = None     # (inode, offset) of the last handled line
+        self._commit_lock = threading.Lock()
+        self._next_checkpoint = 0.0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def position(self):
+        """(inode, offset) just past the last line returned; a token for commit()."""
+        return (self._inode, self._offset)
+
+    def open(self):
+        # Secure Coding: Ensure the log source file exists before reading
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"[SECURITY] Required log file not found: {self.path}")
+        if self._watcher is None:
+            self._watcher = make_watcher(self.path)
+
+        self._open_file()
+        st = os.fstat(self._file.fileno())
+        saved = self._load_offset()
+
+        if saved and saved.get("inode") == st.st_ino and saved.get("offset", 0) <= st.st_size:
+            # Same file as last run: resume exactly where we stopped
+            self._offset = saved["offset"]
+        elif saved:
+            # Rotated or truncated while we were down: everything in it is new
+            self._offset = 0
+        else:
+            self._offset = st.st_size if self.start_at_end else 0
+        self._file.seek(self._offset)
+        self._committed = self.position
+
+    def _open_file(self):
+        self._file = open(self.path, "rb")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+
+    def _load_offset(self):
+        if not self.offset_file or not os.path.exists(self.offset_file):
+            return None
+        try:
+            with open(self.offset_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Secure Coding: Ignore state that belongs to a different log source
+        if saved.get("path") != os.path.abspath(self.path):
+            return None
+        return saved
+
+    def commit(self, position=None, force=False):
+        """
+        Mark every line up to `position` as handled (default: all lines read so far).
+
+        Call it once the lines returned by read_lines() have been processed. The
+        offset file is written at most every checkpoint_interval seconds, unless
+        `force` is set. Safe to call from another thread than the reader.
+        """
+        with self._commit_lock:
+            self._committed = position or self.position
+            now = time.monotonic()
+            if force or now >= self._next_checkpoint:
+                self._save_offset(self._committed)
+                self._next_checkpoint = now + self.checkpoint_interval
+
+    def _save_offset(self, position):
+        if not self.offset_file or position is None:
+            return
+        inode, offset = position
+        state = {"path": os.path.abspath(self.path), "inode": inode, "offset": offset}
+        tmp_path = self.offset_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.offset_file)
+
+    def _drain(self, max_bytes=None):
+        lines = []
+        budget = max_bytes
+        while budget is None or budget > 0:
+            chunk = self._file.read(READ_SIZE if budget is None else min(READ_SIZE, budget))
+            if budget is not None:
+                budget -= len(chunk)
+            if not chunk:
+                break
+            data = self._partial + chunk
+            complete, newline, self._partial = data.rpartition(b"\n")
+            if newline:
+                self._offset += len(complete) + 1
+                lines.extend(complete.decode("utf-8", errors="replace").split("\n"))
+        return lines
+
+    def _truncated(self):
+        fd = self._file.fileno()
+        if os.fstat(fd).st_size < self._offset + len(self._partial):
+            return True
+        # Truncated and rewritten past our offset: the byte before it is no
+        # longer the newline that ended the last line we read
+        return self._offset > 0 and os.pread(fd, 1, self._offset - 1) != b"\n"
+
+    def read_lines(self, max_bytes=None):
+        """Return complete lines appended since the last call (non-blocking).
+
+        With `max_bytes`, at most that much is read per call and the rest is
+        left on disk, which lets callers apply backpressure. Nothing is saved
+        here; commit() the lines once they are handled.
+        """
+        if self._file is None:
+            self.open()
+
+        lines = []
+        if self._truncated():
+            # Truncated in place (e.g. `> live_commands.log`): start over
+            self.truncations += 1
+            self._file.seek(0)
+            self._offset = 0
+            self._partial = b""
+        lines.extend(self._drain(max_bytes))
+
+        try:
+            current_inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current_inode = None   # renamed away; the new file is not there yet
+        if current_inode is not None and current_inode != self._inode:
+            # Rename-rotation: finish the old file, then follow the new one from the start
+            lines.extend(self._drain())
+            self._file.close()
+            self._open_file()
+            self._offset = 0
+            self.rotations += 1
+            lines.extend(self._drain())
+        return lines
+
+    def follow(self, idle_timeout=1.0, stop=None):
+        """Yield batches of new lines as they arrive; waits on the watcher when idle.
+
+        With a `stop` Event, returns once it is set (checked at least every idle_timeout).
+        """
+        while stop is None or not stop.is_set():
+            lines = self.read_lines()
+            if lines:
+                yield lines
+                continue
+            self._watcher.wait(idle_timeout)
+
+    def close(self):
+        if self._file is not None:
+            # Only what was committed; uncommitted lines are read again next time
+            with self._commit_lock:
+                self._save_offset(self._committed)
+            self._file.close()
+            self._file = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
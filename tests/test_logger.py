@@ -0,0 +1,73 @@
+import gzip
+import os
+import threading
+from logger import AlertWriter, format_entry
+
+
+def test_format_entry_truncates_long_commands():
+    entry = format_entry("a" * 300, {"verdict": "malicious", "reason": "test"})
+    assert "[MALICIOUS] Command: " + "a" * 200 + "...[TRUNCATED] | Reason: test" in entry
+
+
+def test_writer_flushes_everything_on_close(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = AlertWriter(path, flush_batch=1000, flush_interval=60)
+    for i in range(500):
+        writer.write(format_entry(f"cmd {i}", {"verdict": "suspicious", "reason": "r"}))
+    writer.close()
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) == 500
+    assert "Command: cmd 499 |" in lines[-1]
+
+
+def test_writer_rotates_and_compresses(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = AlertWriter(path, flush_batch=1, max_bytes=400, backup_count=2, compress=True)
+    for i in range(30):
+        writer.write(format_entry(f"cmd {i}", {"verdict": "malicious", "reason": "r"}))
+    writer.close()
+
+    assert os.path.getsize(path) <= 400
+    assert os.path.exists(path + ".1.gz") and os.path.exists(path + ".2.gz")
+    assert not os.path.exists(path + ".3.gz")
+    with gzip.open(path + ".1.gz", "rt") as f:
+        assert "[MALICIOUS]" in f.read()
+
+
+def test_writer_after_close_does_not_block_or_raise(tmp_path):
+    writer = AlertWriter(str(tmp_path / "alerts.log"))
+    assert writer.write(format_entry("cmd", {"verdict": "malicious", "reason": "r"}))
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert writer.flush(timeout=1)
+    assert not writer.write(format_entry("late", {"verdict": "malicious", "reason": "r"}))
+    assert writer.dropped == 1
+
+
+def test_every_accepted_entry_is_written_when_close_races_writers(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    writer = AlertWriter(path, max_queue=4)
+    accepted = []
+
+    def produce(n):
+        for i in range(500):
+            if writer.write(format_entry(f"cmd-{n}-{i}", {"verdict": "malicious", "reason": "r"})):
+                accepted.append(f"cmd-{n}-{i} ")
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    writer.close()
+    for t in threads:
+        t.join(10)
+        assert not t.is_alive(), "a writer blocked after close"
+
+    written = ""
+    if os.path.exists(path):
+        with open(path) as f:
+            written = f.read()
+    assert len(accepted) + writer.dropped == 2000
+    assert written.count("\n") == len(accepted)
+    assert all(cmd in written for cmd in accepted)
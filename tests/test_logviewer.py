@@ -0,0 +1,79 @@
+import os
+from logviewer import LogIndex, query_logs
+
+
+def write_alerts(path, entries, mode="a"):
+    with open(path, mode) as f:
+        for timestamp, verdict, cmd in entries:
+            f.write(f"[{timestamp}] [{verdict.upper()}] Command: {cmd} | Reason: test\n")
+
+
+def test_query_by_verdict_time_and_tail(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    write_alerts(path, [
+        ("2025-07-29 03:07:24", "malicious", "powershell -enc a"),
+        ("2025-07-29 03:30:00", "suspicious", "wmic process"),
+        ("2025-07-29 05:01:00", "malicious", "certutil http"),
+        ("2025-07-30 10:00:00", "suspicious", "schtasks /create"),
+    ])
+
+    assert [r.details.split(" |")[0] for r in query_logs(verdict="malicious", path=path)] == \
+        ["Command: powershell -enc a", "Command: certutil http"]
+    in_range = query_logs(start="2025-07-29 03:10:00", end="2025-07-29 23:59:59", path=path)
+    assert [r.timestamp for r in in_range] == ["2025-07-29 03:30:00", "2025-07-29 05:01:00"]
+    assert [r.timestamp for r in query_logs(tail=2, path=path)] == \
+        ["2025-07-29 05:01:00", "2025-07-30 10:00:00"]
+    assert query_logs(verdict="suspicious", tail=1, path=path)[0].timestamp == "2025-07-30 10:00:00"
+
+
+def test_index_is_incremental_and_rebuilds_after_rotation(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    write_alerts(path, [("2025-07-29 03:07:24", "malicious", "a")])
+    index = LogIndex(path)
+    assert index.refresh() == 1
+
+    write_alerts(path, [("2025-07-29 03:08:00", "suspicious", "b")])
+    reopened = LogIndex(path)
+    assert reopened.refresh() == 1           # only the appended line is scanned
+    assert len(reopened.offsets["malicious"]) == 1
+
+    os.rename(path, path + ".1")
+    write_alerts(path, [("2025-07-29 04:00:00", "suspicious", "c")], mode="w")
+    assert [r.timestamp for r in query_logs(path=path)] == ["2025-07-29 04:00:00"]
+    rebuilt = LogIndex(path)
+    rebuilt.refresh()
+    assert set(rebuilt.offsets) == {"suspicious"}
+
+
+def test_index_recovers_from_partial_save_and_clock_going_back(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    write_alerts(path, [("2025-07-29 05:00:00", "malicious", "a")])
+    LogIndex(path).refresh()
+    # A save that wrote offsets but died before the metadata
+    with open(path + ".idx.malicious", "ab") as f:
+        f.write(b"\xff" * 8)
+
+    write_alerts(path, [("2025-07-29 03:00:00", "malicious", "b"),
+                        ("2025-07-29 04:00:00", "suspicious", "c")])
+    for _ in range(2):   # the second query reads the saved offsets back
+        assert [r.details.split(" |")[0] for r in query_logs(verdict="malicious", path=path)] == \
+            ["Command: a", "Command: b"]
+    # Timestamps went backwards, so the time range falls back to a scan
+    assert [r.timestamp for r in query_logs(end="2025-07-29 03:30:00", path=path)] == \
+        ["2025-07-29 03:00:00"]
+
+
+def test_date_only_end_covers_the_whole_day(tmp_path):
+    path = str(tmp_path / "alerts.log")
+    write_alerts(path, [
+        ("2024-12-31 23:00:00", "suspicious", "a"),
+        ("2025-01-01 09:00:00", "malicious", "b"),
+        ("2025-01-01 10:00:00", "malicious", "c"),
+        ("2025-01-02 00:30:00", "malicious", "d"),
+    ])
+    day = ["2025-01-01 09:00:00", "2025-01-01 10:00:00"]
+    assert [r.timestamp for r in query_logs(start="2025-01-01", end="2025-01-01", path=path)] == day
+    assert [r.timestamp for r in query_logs(start="2025-01-01", end="2025-01-01",
+                                            verdict="malicious", path=path)] == day
+    assert [r.timestamp for r in query_logs(end="2025-01-01 1", path=path)][-1] == "2025-01-01 10:00:00"
+    assert len(query_logs(end="2025-01-01", verdict="malicious", path=path)) == 2
@@ -0,0 +1,27 @@
+import json
+
+import pandas as pd
+from main import run_csv_simulation
+
+DATASET = "data/cmd_huge_known_commented_updated.csv"
+
+
+def test_csv_replay_streams_chunks_to_jsonl(tmp_path):
+    output = tmp_path / "verdicts.jsonl"
+    rows, counts = run_csv_simulation(DATASET, str(output), quiet=True, chunk_size=100)
+
+    expected = len(pd.read_csv(DATASET).dropna(subset=["prompt", "Label"]))
+    lines = output.read_text().splitlines()
+    assert rows == expected == len(lines) == sum(counts.values())
+
+    first = json.loads(lines[0])
+    assert set(first) == {"command", "label", "verdict", "reason", "stage", "score"}
+
+
+def test_csv_replay_writes_csv(tmp_path):
+    output = tmp_path / "verdicts.csv"
+    rows, counts = run_csv_simulation(DATASET, str(output), quiet=True, chunk_size=250)
+
+    results = pd.read_csv(output)
+    assert len(results) == rows
+    assert results["verdict"].value_counts().to_dict() == counts
